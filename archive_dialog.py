@@ -0,0 +1,156 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QPushButton, QComboBox,
+    QDoubleSpinBox, QProgressBar, QListWidget
+)
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from gta.archive import ArchiveJob
+
+MODE_LABELS = {"bucket": "One fix per time bucket", "simplify": "Simplify within a tolerance"}
+
+
+def _mb(n):
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+class ArchiveWorker(QThread):
+    """Drives an ``ArchiveJob`` off the GUI thread and reports each archived session."""
+
+    session_done = pyqtSignal(str, object, int)  # summary, bytes reclaimed (-1 on error), sessions in the run
+    archive_failed = pyqtSignal(str)
+
+    def __init__(self, job, parent=None):
+        super().__init__(parent)
+        self.job = job
+
+    def run(self):
+        try:
+            for result in self.job.run():
+                self.session_done.emit(str(result), -1 if result.error else result.reclaimed, self.job.total)
+        except Exception as e:
+            self.archive_failed.emit(str(e))
+
+
+class ArchiveDialog(QDialog):
+    def __init__(self, parent, project_name, taxonomy, catalog_factory, index_factories=()):
+        super().__init__(parent)
+        self.setWindowTitle(f"Archive Old Routes - {project_name}")
+        self.project_name = project_name
+        self.taxonomy = taxonomy
+        self.catalog_factory = catalog_factory
+        self.index_factories = index_factories
+        self.worker = None
+        self.job = None
+
+        self.age_input = QDoubleSpinBox()
+        self.age_input.setRange(0.0, 3650.0)
+        self.age_input.setValue(30.0)
+        self.age_input.setSuffix(" days")
+        self.mode_combo = QComboBox()
+        for mode, label in MODE_LABELS.items():
+            self.mode_combo.addItem(label, mode)
+        self.bucket_input = QDoubleSpinBox()
+        self.bucket_input.setRange(0.1, 3600.0)
+        self.bucket_input.setValue(10.0)
+        self.bucket_input.setSuffix(" s")
+        self.tolerance_input = QDoubleSpinBox()
+        self.tolerance_input.setRange(0.1, 1000.0)
+        self.tolerance_input.setValue(5.0)
+        self.tolerance_input.setSuffix(" m")
+        self.mode_combo.currentIndexChanged.connect(self.update_mode)
+
+        form = QFormLayout()
+        form.addRow("Routes older than:", self.age_input)
+        form.addRow("Downsampling:", self.mode_combo)
+        form.addRow("Bucket size:", self.bucket_input)
+        form.addRow("Tolerance:", self.tolerance_input)
+
+        self.progress = QProgressBar()
+        self.progress.setValue(0)
+        self.status_label = QLabel("Ticks with metadata are always kept. An interrupted run resumes where it stopped.")
+        self.status_label.setWordWrap(True)
+        self.results = QListWidget()
+
+        self.start_btn = QPushButton("Archive")
+        self.start_btn.clicked.connect(self.start_archive)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_archive)
+        self.cancel_btn.setEnabled(False)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.reject)
+        buttons = QHBoxLayout()
+        buttons.addStretch(1)
+        buttons.addWidget(self.start_btn)
+        buttons.addWidget(self.cancel_btn)
+        buttons.addWidget(close_btn)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.results)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.update_mode()
+        self.resize(600, 400)
+
+    def update_mode(self):
+        bucket = self.mode_combo.currentData() == "bucket"
+        self.bucket_input.setEnabled(bucket)
+        self.tolerance_input.setEnabled(not bucket)
+
+    def start_archive(self):
+        self.results.clear()
+        self.progress.setRange(0, 0)  # busy until the first session reports the run's size
+        self.reclaimed = 0
+        self.failed = 0
+        self.job = ArchiveJob(self.project_name, self.catalog_factory, self.age_input.value() * 86400.0,
+                              mode=self.mode_combo.currentData(), bucket_s=self.bucket_input.value(),
+                              tolerance_m=self.tolerance_input.value(), taxonomy=self.taxonomy,
+                              index_factories=self.index_factories)
+        self.worker = ArchiveWorker(self.job, self)
+        self.worker.session_done.connect(self.on_session_done)
+        self.worker.archive_failed.connect(lambda msg: self.status_label.setText(f"Archiving failed: {msg}"))
+        self.worker.finished.connect(self.on_finished)
+        self.start_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.status_label.setText("Archiving…")
+        self.worker.start()
+
+    def cancel_archive(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("Cancelling…")
+
+    def on_session_done(self, summary, reclaimed, total):
+        if self.progress.maximum() == 0:
+            self.progress.setRange(0, total)
+        self.progress.setValue(self.progress.value() + 1)
+        if reclaimed < 0:
+            self.failed += 1
+        else:
+            self.reclaimed += reclaimed
+        self.results.addItem(summary)
+        self.results.scrollToBottom()
+
+    def on_finished(self):
+        self.start_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        if self.progress.maximum() == 0:
+            self.progress.setRange(0, 1)
+            self.progress.setValue(1)
+        if self.status_label.text().startswith("Archiving failed"):
+            return
+        archived, kept, before, after = self.job.state.totals(self.project_name)
+        failed = f", {self.failed} failed" if self.failed else ""
+        kept = f", {kept} kept as is" if kept else ""
+        prefix = "Archiving cancelled; run again to resume. " if self.job.cancelled else ""
+        self.status_label.setText(f"{prefix}Reclaimed {_mb(self.reclaimed)}{failed}. "
+                                  f"{archived} sessions archived so far: {_mb(before)} -> {_mb(after)}{kept}")
+
+    def done(self, result):
+        if self.worker is not None and self.worker.isRunning():
+            self.cancel_archive()
+            self.worker.wait()
+        super().done(result)
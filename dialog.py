@@ -1,15 +1,30 @@
-import os
+import copy
 import json
 import time
-from random import random
+
+from collections import deque
 
 from PyQt5.QtWidgets import (
-    QFormLayout, QDialog, QVBoxLayout, QLabel, QListWidget, QPushButton, QLineEdit,
-    QHBoxLayout, QMessageBox, QDialogButtonBox, QInputDialog
+    QFormLayout, QDialog, QVBoxLayout, QLabel, QListWidget, QListView, QPushButton, QLineEdit,
+    QHBoxLayout, QMessageBox, QDialogButtonBox, QInputDialog, QGroupBox
 )
 
 from PyQt5.QtGui import QIntValidator
-from PyQt5.QtCore import QTimer
+from PyQt5.QtCore import Qt, QTimer, QAbstractListModel, QModelIndex
+
+from gta.projects import write_json_atomic
+from gta.session import RouteSession
+from gta.taxonomy import migration_from_edits, normalize_taxonomy, record_migration
+
+LOG_VIEW_ENTRIES = 500
+
+
+def _percentiles(hist, unit="ms"):
+    if not hist.count:
+        return "–"
+    return (f"p50 {hist.percentile(50):.1f} · p99 {hist.percentile(99):.1f} · "
+            f"max {hist.max:.1f} {unit}")
+
 
 class ProjectDialog(QDialog):
     def __init__(self, parent=None):
@@ -94,18 +109,26 @@ class ProjectDialog(QDialog):
         return self.name_input.text().strip(), int(self.freq_input.text()), self.taxonomy
 
 class EditProjectDialog(QDialog):
-    def __init__(self, parent=None, project_path=None):
+    def __init__(self, parent=None, project_path=None, repository=None):
         super().__init__(parent)
         self.setWindowTitle("Edit Project")
         self.setMinimumWidth(400)
         self.project_path = project_path
+        self.repository = repository
 
-        with open(self.project_path, "r") as f:
-            self.project_data = json.load(f)
+        if repository is not None and repository.get(project_path) is not None:
+            self.project_data = copy.deepcopy(repository.get(project_path))
+        else:
+            with open(self.project_path, "r") as f:
+                self.project_data = json.load(f)
 
         self.name = self.project_data["projectName"]
         self.freq_input = QLineEdit(str(self.project_data["gpsFrequency"]))
         self.taxonomy = self.project_data.get("taxonomy", [])
+        # Where each class came from, so edits can be carried over to existing routes
+        self.original_taxonomy = copy.deepcopy(self.taxonomy)
+        self.origins = list(range(len(self.taxonomy)))
+        self.retag_requested = False
 
         self.tax_class_input = QLineEdit()
         self.tax_class_input.setPlaceholderText("Enter Name of Class")
@@ -188,6 +211,7 @@ class EditProjectDialog(QDialog):
                 "className": class_name,
                 "attributes": attrs
             })
+            self.origins.append(None)
             self.refresh_taxonomy_view()
             self.tax_class_input.clear()
             self.tax_attr_input.clear()
@@ -196,6 +220,7 @@ class EditProjectDialog(QDialog):
         selected = self.tax_list.currentRow()
         if selected >= 0:
             del self.taxonomy[selected]
+            del self.origins[selected]
             self.refresh_taxonomy_view()
 
     def save_changes(self):
@@ -219,35 +244,74 @@ class EditProjectDialog(QDialog):
                     QMessageBox.warning(self, "Missing Attributes", f"Class '{entry['className']}' must have at least one attribute.")
                     return
             
-            self.project_data["gpsFrequency"] = freq
-            self.project_data["taxonomy"] = self.taxonomy
+            migration = migration_from_edits(self.original_taxonomy, self.taxonomy, self.origins)
+            retag = False
+            if migration:
+                answer = QMessageBox.question(
+                    self, "Update Existing Routes",
+                    "Routes logged so far use the old taxonomy:\n\n" + "\n".join(migration.describe())
+                    + "\n\nRewrite them to match? Dropped classes and attributes are removed from the routes.",
+                    QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel
+                )
+                if answer == QMessageBox.Cancel:
+                    return
+                retag = answer == QMessageBox.Yes
+
+            data = copy.deepcopy(self.project_data)  # left untouched if saving fails
+            data["gpsFrequency"] = freq
+            data["taxonomy"] = normalize_taxonomy(self.taxonomy)  # renames may have merged some
+            if retag:
+                record_migration(data, migration, data["taxonomy"])
 
-            with open(self.project_path, "w") as f:
-                json.dump(self.project_data, f, indent=2)
+            if self.repository is not None:
+                self.repository.save(data, self.project_path)
+            else:
+                write_json_atomic(self.project_path, data)
+            self.project_data = data
+            self.retag_requested = retag
 
             QMessageBox.information(self, "Saved", "Project updated successfully.")
             self.accept()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to save changes: {e}")
     
+class RecentEntriesModel(QAbstractListModel):
+    """The last ``capacity`` logged entries; older ones drop off the top."""
+
+    def __init__(self, capacity=500, parent=None):
+        super().__init__(parent)
+        self.entries = deque(maxlen=capacity)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.entries)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.DisplayRole:
+            return self.entries[index.row()]
+        return None
+
+    def append(self, text):
+        if len(self.entries) == self.entries.maxlen:
+            self.beginRemoveRows(QModelIndex(), 0, 0)
+            self.entries.popleft()
+            self.endRemoveRows()
+        row = len(self.entries)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.entries.append(text)
+        self.endInsertRows()
+
+
 class RouteLoggerDialog(QDialog):
-    def __init__(self, parent, project_data, project_path):
+    def __init__(self, parent, project_data, project_path, catalog=None, indexes=()):
         super().__init__(parent)
         self.setWindowTitle(f"Route Logger – {project_data['projectName']}")
 
-        self.freq = project_data["gpsFrequency"] * 1000  # ms for QTimer
+        self.freq = project_data["gpsFrequency"] * 1000  # ms for QTimer (metadata ticks)
         self.taxonomy = project_data["taxonomy"]
-        self.meta_stack = []
-        self.current_lat, self.current_lon = None, None
-
-        ts = int(time.time())
-        route_dir = os.path.join("app_data", "routes")
-        os.makedirs(route_dir, exist_ok=True)
-        self.current_route_file = os.path.join(
-            route_dir,
-            f"route_{project_data['projectName']}_{ts}.jsonl"
-        )
-        open(self.current_route_file, "a").close()  # create file if not exists
+        self.session = RouteSession(project_data, catalog=catalog, indexes=indexes)
+        self.current_route_file = self.session.route_file
 
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.do_tick)
@@ -258,7 +322,10 @@ class RouteLoggerDialog(QDialog):
         self.stop_btn = QPushButton("Stop Logging")
         self.stop_btn.setEnabled(False)
 
-        self.log_view = QListWidget()
+        self.log_model = RecentEntriesModel(LOG_VIEW_ENTRIES, self)
+        self.log_view = QListView()
+        self.log_view.setModel(self.log_model)
+        self.log_view.setUniformItemSizes(True)
         self.meta_form = {}
         self.selected_attrs = {}
 
@@ -287,10 +354,23 @@ class RouteLoggerDialog(QDialog):
         btn_layout.addWidget(self.start_btn)
         btn_layout.addWidget(self.stop_btn)
 
+        # Live tick timing and write I/O, from the session's TickMetrics
+        self.timing_labels = {}
+        timing_form = QFormLayout()
+        for key, title in (("lag", "Tick lag:"), ("period", "Tick period:"), ("ticks", "Ticks:"),
+                           ("tick", "Tick / display:"), ("io", "Encode / write:"),
+                           ("flush", "Flush:"), ("queue", "Writer queue:")):
+            label = QLabel("–")
+            self.timing_labels[key] = label
+            timing_form.addRow(title, label)
+        timing_box = QGroupBox("Timing")
+        timing_box.setLayout(timing_form)
+
         main_layout = QVBoxLayout()
         main_layout.addLayout(btn_layout)
         main_layout.addLayout(self.meta_layout)
-        main_layout.addWidget(QLabel("Logged Entries:"))
+        main_layout.addWidget(timing_box)
+        main_layout.addWidget(QLabel(f"Logged Entries (latest {LOG_VIEW_ENTRIES}):"))
         main_layout.addWidget(self.log_view)
         self.setLayout(main_layout)
 
@@ -316,18 +396,12 @@ class RouteLoggerDialog(QDialog):
             self.update_submit_button_state()
 
     def submit_meta(self):
-        submitted_at = int(time.time())
         meta_data = {
             cls: attr
             for cls, attr in self.selected_attrs.items()
             if attr is not None
         }
-
-        if meta_data:
-            self.meta_stack.append({
-                "submitted_at": submitted_at,
-                "meta_data": meta_data
-            })
+        self.session.submit_meta(meta_data)
 
         # Clear selections
         for class_name, label in self.meta_form.items():
@@ -339,52 +413,77 @@ class RouteLoggerDialog(QDialog):
         QMessageBox.information(self, "Meta Submitted", "Your meta data has been recorded.")
 
     def start_logging(self):
-        open(self.current_route_file, "a").close()
+        try:
+            self.session.start()
+        except (KeyError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Invalid location source: {e}")
+            return
+
         self.is_logging = True
         self.timer.start(self.freq)
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         self.update_submit_button_state()
 
-    def update_location(self, lat, lon):
-        self.current_lat = lat
-        self.current_lon = lon
-
     def stop_logging(self):
-        self.is_logging = False
-        self.timer.stop()
+        self.finish_logging()
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.update_submit_button_state()
         QMessageBox.information(self, "Logging stopped",
                                 f"Logs saved to {self.current_route_file}")
 
-    def do_tick(self):
-        lat, lon = self.get_current_location()
-        tick_ts = int(time.time())
-
-        if self.meta_stack:
-            meta = self.meta_stack.pop(0)
-            log = {
-                "tick_timestamp": tick_ts,
-                "meta_submitted_at": meta["submitted_at"],
-                "latitude": lat,
-                "longitude": lon,
-                "meta_data": meta["meta_data"]
-            }
-        else:
-            log = {
-                "tick_timestamp": tick_ts,
-                "latitude": lat,
-                "longitude": lon,
-                "meta_data": {}
-            }
+    def finish_logging(self):
+        # Stop ticking and drain the writer so no queued ticks are lost
+        self.is_logging = False
+        self.timer.stop()
+        error = self.session.stop()
+        self.update_timing()
+        if error is not None:
+            QMessageBox.critical(self, "Error", f"Failed to write route log: {error}")
 
-        with open(self.current_route_file, "a") as f:
-            f.write(json.dumps(log) + "\n")
+    def done(self, result):
+        self.finish_logging()
+        super().done(result)
 
-        self.log_view.addItem(f"{log['tick_timestamp']}: {log['meta_data']}")
+    def do_tick(self):
+        try:
+            log = self.session.tick()
+        except Exception:
+            # The writer has failed; stop rather than report ticks nothing writes
+            self.finish_logging()
+            self.start_btn.setEnabled(True)
+            self.stop_btn.setEnabled(False)
+            self.update_submit_button_state()
+            return
+        if log is None:
+            self.update_timing()
+            return  # no fix yet; submissions wait for the first one
+
+        started = time.monotonic()
+        for rec in self.session.take_tagged():
+            self.log_model.append(f"{rec['tick_timestamp']}: {rec['meta_data']}")
+        self.log_model.append(f"{log['tick_timestamp']}: {log['meta_data']}")
+        self.log_view.scrollToBottom()
+        self.session.metrics.record_ui(time.monotonic() - started)
+        self.update_timing()
+
+    def update_timing(self):
+        m = self.session.metrics
+        labels = self.timing_labels
+        labels["lag"].setText(_percentiles(m.lag))
+        period = f"mean {m.period.mean:.0f} ms" if m.period.count else "–"
+        drift = f" · drift {m.drift:+.1f} s" if m.drift is not None else ""
+        labels["period"].setText(f"{period} (every {m.interval * 1000:.0f} ms){drift}")
+        labels["ticks"].setText(f"{m.ticks} fired · {m.missed} missed in {m.coalesced} late ticks"
+                                f" · {m.no_fix} without a fix")
+        labels["tick"].setText(f"{_percentiles(m.tick)} / {_percentiles(m.ui)}")
+        labels["io"].setText(f"{_percentiles(m.encode)} / {_percentiles(m.write)}")
+        labels["flush"].setText(_percentiles(m.flush))
+        queue = f"max {m.queue_depth.max:.0f}" if m.queue_depth.count else "–"
+        batch = f" · {m.batch_records.mean:.1f} records per batch" if m.batch_records.count else ""
+        labels["queue"].setText(f"{queue}{batch} · {m.records_written} written")
 
     def get_current_location(self):
-        # Simulated coordinates around a central point (Delhi)
-        return 28.6448 + random() * 0.001, 77.2167 + random() * 0.001
+        # Latest fix pushed by the location provider
+        return self.session.current_location
@@ -0,0 +1,139 @@
+import os
+
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QLineEdit, QPushButton, QComboBox,
+    QSpinBox, QProgressBar, QListWidget, QFileDialog
+)
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from gta.export import FORMATS, BulkExporter
+
+FORMAT_LABELS = {"gpx": "GPX", "geojson": "GeoJSON", "csv": "CSV"}
+
+
+class ExportWorker(QThread):
+    """Drives a ``BulkExporter`` off the GUI thread and reports each finished file."""
+
+    file_done = pyqtSignal(str, str, int, str)  # name, dst, records, error ("" if none)
+    export_failed = pyqtSignal(str)
+
+    def __init__(self, exporter, parent=None):
+        super().__init__(parent)
+        self.exporter = exporter
+
+    def run(self):
+        try:
+            for result in self.exporter.run():
+                self.file_done.emit(result.name, result.dst or "", result.count, result.error or "")
+        except Exception as e:
+            self.export_failed.emit(str(e))
+
+
+class ExportDialog(QDialog):
+    def __init__(self, parent, routes, taxonomy=None, out_dir=""):
+        # routes: route files and/or lists of session segments, one output file each
+        super().__init__(parent)
+        self.setWindowTitle(f"Export {len(routes)} Routes")
+        self.routes = routes
+        self.taxonomy = taxonomy
+        self.worker = None
+        self.exporter = None
+
+        self.format_combo = QComboBox()
+        for fmt in FORMATS:
+            self.format_combo.addItem(FORMAT_LABELS[fmt], fmt)
+        self.dir_input = QLineEdit(out_dir or os.path.abspath("exports"))
+        browse_btn = QPushButton("Browse…")
+        browse_btn.clicked.connect(self.choose_dir)
+        dir_row = QHBoxLayout()
+        dir_row.addWidget(self.dir_input, 1)
+        dir_row.addWidget(browse_btn)
+        self.workers_input = QSpinBox()
+        self.workers_input.setRange(1, max(1, os.cpu_count() or 1) * 2)
+        self.workers_input.setValue(os.cpu_count() or 1)
+
+        form = QFormLayout()
+        form.addRow("Format:", self.format_combo)
+        form.addRow("Output folder:", dir_row)
+        form.addRow("Worker processes:", self.workers_input)
+
+        self.progress = QProgressBar()
+        self.progress.setRange(0, len(routes))
+        self.progress.setValue(0)
+        self.status_label = QLabel(f"{len(routes)} routes selected")
+        self.results = QListWidget()
+
+        self.start_btn = QPushButton("Export")
+        self.start_btn.clicked.connect(self.start_export)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_export)
+        self.cancel_btn.setEnabled(False)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.reject)
+        buttons = QHBoxLayout()
+        buttons.addStretch(1)
+        buttons.addWidget(self.start_btn)
+        buttons.addWidget(self.cancel_btn)
+        buttons.addWidget(close_btn)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.results)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.resize(600, 400)
+
+    def choose_dir(self):
+        path = QFileDialog.getExistingDirectory(self, "Export To", self.dir_input.text())
+        if path:
+            self.dir_input.setText(path)
+
+    def start_export(self):
+        self.results.clear()
+        self.progress.setValue(0)
+        self.failed = 0
+        self.records = 0
+        self.exporter = BulkExporter(self.routes, self.dir_input.text(), self.format_combo.currentData(),
+                                     self.taxonomy, self.workers_input.value())
+        self.worker = ExportWorker(self.exporter, self)
+        self.worker.file_done.connect(self.on_file_done)
+        self.worker.export_failed.connect(lambda msg: self.status_label.setText(f"Export failed: {msg}"))
+        self.worker.finished.connect(self.on_finished)
+        self.start_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.status_label.setText("Exporting…")
+        self.worker.start()
+
+    def cancel_export(self):
+        if self.exporter is not None:
+            self.exporter.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("Cancelling…")
+
+    def on_file_done(self, name, dst, count, error):
+        self.progress.setValue(self.progress.value() + 1)
+        if error:
+            self.failed += 1
+            self.results.addItem(f"{name}: {error}")
+        else:
+            self.records += count
+            self.results.addItem(f"{os.path.basename(dst)} ({count} records)")
+        self.results.scrollToBottom()
+
+    def on_finished(self):
+        self.start_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        if self.exporter.cancelled:
+            self.status_label.setText("Export cancelled.")
+        elif not self.status_label.text().startswith("Export failed"):
+            done = self.progress.value() - self.failed
+            failed = f", {self.failed} failed" if self.failed else ""
+            self.status_label.setText(f"{done} files, {self.records} records written{failed}")
+
+    def done(self, result):
+        if self.worker is not None and self.worker.isRunning():
+            self.cancel_export()
+            self.worker.wait()
+        super().done(result)
@@ -0,0 +1,5 @@
+"""Core of the GPS Tracker Application: projects, route logging, storage and analytics.
+
+Nothing in this package depends on PyQt5, so it can be used from scripts and
+the ``python -m gta`` command line as well as from the desktop app.
+"""
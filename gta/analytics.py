@@ -0,0 +1,391 @@
+import re
+import time
+
+import numpy as np
+
+from .location import EARTH_RADIUS_M
+from .records import decode_records, loads
+from .route_binary import BinaryRouteReader, is_binary_route
+from .route_segments import open_segment
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+_NUMBER = rb"(-?[0-9][0-9.eE+-]*)"
+_TS_RE = re.compile(rb'"tick_timestamp":\s*' + _NUMBER)
+_LAT_RE = re.compile(rb'"latitude":\s*' + _NUMBER)
+_LON_RE = re.compile(rb'"longitude":\s*' + _NUMBER)
+_META_RE = re.compile(rb'"meta_data":\s*\{\s*"')
+
+
+class RouteArrays:
+    """Columnar view of a route: parallel timestamp/lat/lon arrays plus sparse tags.
+
+    ``tag_rows[i]`` is the row that carried ``tags[i]`` (its ``meta_data``).
+    """
+
+    def __init__(self, ts, lat, lon, tag_rows, tags):
+        self.ts = ts
+        self.lat = lat
+        self.lon = lon
+        self.tag_rows = tag_rows
+        self.tags = tags
+
+    def __len__(self):
+        return len(self.ts)
+
+    def sorted_by_time(self):
+        order = np.argsort(self.ts, kind="stable")
+        if len(order) and np.all(order[1:] > order[:-1]):
+            return self
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        tag_rows = position[self.tag_rows]
+        tag_order = np.argsort(tag_rows, kind="stable")
+        return RouteArrays(
+            self.ts[order], self.lat[order], self.lon[order],
+            tag_rows[tag_order], [self.tags[i] for i in tag_order]
+        )
+
+
+# Compact lines with no tag, as the route writers produce them. With every
+# byte but digits, signs, points and commas deleted, such a line reads
+# "ts,lat,lon," and a whole chunk of them parses in one call.
+_PLAIN_KEYS = (b'{"tick_timestamp":', b',"meta_data":{}}')  # first and last key of every line
+_NOT_NUMERIC = bytes(c for c in range(256) if c not in b"0123456789.-,")
+
+
+def _parse_numbers(matches):
+    if not matches:
+        return np.empty(0)
+    return np.fromstring(b" ".join(matches), sep=" ")
+
+
+def _parse_plain(data, lines):
+    """``(ts, lat, lon)`` of untagged compact lines in one pass, or ``None`` if any line differs."""
+    if not lines:
+        empty = np.empty(0)
+        return empty, empty, empty
+    if any(data.count(key) != lines for key in _PLAIN_KEYS):
+        return None
+    if b"e-" in data:
+        return None  # an exponent would lose its "e"
+    try:
+        values = np.fromstring(data.translate(None, _NOT_NUMERIC).rstrip(b","), sep=",")
+    except ValueError:
+        return None
+    if len(values) != 3 * lines:
+        return None
+    values = values.reshape(-1, 3).T
+    return values[0].copy(), values[1].copy(), values[2].copy()
+
+
+def _parse_chunk_fast(data, row_base):
+    # Lines with metadata are decoded one by one; all the others are read at
+    # once by _parse_plain, or else a column at a time with one regex pass
+    # each, which is only valid when every line carries exactly one numeric
+    # value for each key.
+    lines = data.count(b"\n") + (0 if data.endswith(b"\n") else 1)
+    tag_rows, tags, tagged = [], [], []
+    plain = []
+    row, pos, copied = 0, 0, 0
+    for m in _META_RE.finditer(data):
+        start = data.rfind(b"\n", 0, m.start()) + 1
+        if start < copied:
+            continue  # another match on a line already read
+        row += data.count(b"\n", pos, start)
+        pos = start
+        end = data.find(b"\n", m.end())
+        end = len(data) if end < 0 else end
+        try:
+            rec = loads(data[start:end])
+            meta = rec["meta_data"]
+            tagged.append((row, float(rec["tick_timestamp"]), float(rec["latitude"]), float(rec["longitude"])))
+        except (ValueError, KeyError, TypeError):
+            return None
+        if meta:
+            tag_rows.append(row_base + row)
+            tags.append(meta)
+        plain.append(data[copied:start])
+        copied = end + 1
+    plain.append(data[copied:])
+
+    columns = _parse_plain(b"".join(plain), lines - len(tagged)) if tagged else _parse_plain(data, lines)
+    if columns is not None:
+        if tagged:
+            rows, *values = zip(*tagged)
+            at = np.array(rows) - np.arange(len(rows))  # positions among the untagged lines
+            columns = [np.insert(column, at, value) for column, value in zip(columns, values)]
+        return (*columns, tag_rows, tags)
+
+    ts_m = _TS_RE.findall(data)
+    if len(ts_m) != lines:
+        return None
+    lat_m = _LAT_RE.findall(data)
+    if len(lat_m) != lines:
+        return None
+    lon_m = _LON_RE.findall(data)
+    if len(lon_m) != lines:
+        return None
+
+    ts, lat, lon = _parse_numbers(ts_m), _parse_numbers(lat_m), _parse_numbers(lon_m)
+    if not (len(ts) == len(lat) == len(lon) == lines):
+        return None
+    return ts, lat, lon, tag_rows, tags
+
+
+def _parse_chunk_slow(data, row_base):
+    ts, lat, lon, tag_rows, tags = [], [], [], [], []
+    records, _ = decode_records(data.split(b"\n"))  # blank, torn and incomplete lines are dropped
+    for rec in records:
+        if rec.meta_data:
+            tag_rows.append(row_base + len(ts))
+            tags.append(rec.meta_data)
+        ts.append(rec.tick_timestamp)
+        lat.append(rec.latitude)
+        lon.append(rec.longitude)
+    return np.array(ts, dtype=np.float64), np.array(lat), np.array(lon), tag_rows, tags
+
+
+def iter_route_chunks(path, chunk_size=CHUNK_SIZE):
+    """Yields ``RouteArrays`` for successive blocks of whole lines of a JSONL route."""
+    rows = 0
+    with open_segment(path) as f:
+        tail = b""
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                data, tail = tail, b""
+            else:
+                data = tail + block
+                cut = data.rfind(b"\n")
+                if cut < 0:
+                    tail = data
+                    continue
+                data, tail = data[:cut + 1], data[cut + 1:]
+            if data.strip():
+                parsed = _parse_chunk_fast(data, rows) or _parse_chunk_slow(data, rows)
+                ts, lat, lon, tag_rows, tags = parsed
+                rows += len(ts)
+                yield RouteArrays(ts, lat, lon, np.array(tag_rows, dtype=np.int64), tags)
+            if not block:
+                break
+
+
+def concat_arrays(parts):
+    if not parts:
+        empty = np.empty(0)
+        return RouteArrays(empty, empty, empty, np.empty(0, dtype=np.int64), [])
+    if len(parts) == 1:
+        return parts[0]
+    offsets = np.cumsum([0] + [len(p) for p in parts[:-1]])
+    return RouteArrays(
+        np.concatenate([p.ts for p in parts]),
+        np.concatenate([p.lat for p in parts]),
+        np.concatenate([p.lon for p in parts]),
+        np.concatenate([p.tag_rows + off for p, off in zip(parts, offsets)]),
+        [t for p in parts for t in p.tags],
+    )
+
+
+def read_route_arrays(path, chunk_size=CHUNK_SIZE):
+    """Reads a route file, a list of session segments or a ``Timeline`` into one ``RouteArrays``."""
+    from .timeline import Timeline
+    if isinstance(path, Timeline):
+        return path.arrays()
+    if not isinstance(path, str):
+        return concat_arrays([read_route_arrays(p, chunk_size) for p in path])
+    if is_binary_route(path):
+        # Columns are mapped straight from the file, no parsing needed
+        with BinaryRouteReader(path) as reader:
+            return RouteArrays(*reader.arrays())
+
+    # Chunk tag rows are already absolute, so they are joined without offsets
+    chunks = list(iter_route_chunks(path, chunk_size))
+    if not chunks:
+        return concat_arrays([])
+    return RouteArrays(
+        np.concatenate([c.ts for c in chunks]),
+        np.concatenate([c.lat for c in chunks]),
+        np.concatenate([c.lon for c in chunks]),
+        np.concatenate([c.tag_rows for c in chunks]),
+        [t for c in chunks for t in c.tags],
+    )
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres; accepts scalars or arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2.0) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _runs(mask):
+    """Returns ``(starts, ends)`` of runs of True in a boolean array (ends exclusive)."""
+    padded = np.concatenate(([False], mask, [False])).astype(np.int8)
+    edges = np.diff(padded)
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+class RouteAnalysis:
+    def __init__(self):
+        self.point_count = 0
+        self.start_ts = None
+        self.end_ts = None
+        self.duration = 0.0
+        self.distance_m = 0.0
+        self.bbox = None
+        self.segment_distance = np.empty(0)
+        self.segment_speed = np.empty(0)
+        self.max_speed = 0.0
+        self.mean_speed = 0.0
+        self.moving_time = 0.0
+        self.dwells = []
+        self.gaps = []
+        self.coverage = {}
+
+    def summary(self):
+        return {
+            "point_count": self.point_count,
+            "start_ts": self.start_ts,
+            "end_ts": self.end_ts,
+            "duration_s": self.duration,
+            "distance_m": self.distance_m,
+            "bbox": self.bbox,
+            "max_speed_mps": self.max_speed,
+            "mean_speed_mps": self.mean_speed,
+            "moving_time_s": self.moving_time,
+            "dwells": self.dwells,
+            "gaps": self.gaps,
+            "coverage": self.coverage,
+        }
+
+
+def _coverage(ts, tag_rows, tags, taxonomy):
+    # A tag holds from the tick that carries it until the next tag for the same
+    # class, or the end of the route.
+    coverage = {}
+    for entry in taxonomy or []:
+        coverage[entry["className"]] = {attr: 0.0 for attr in entry.get("attributes", [])}
+    if not len(ts) or not tags:
+        return coverage
+
+    per_class = {}
+    for row, meta in zip(tag_rows, tags):
+        for cls, attr in meta.items():
+            rows, attrs = per_class.setdefault(cls, ([], []))
+            rows.append(row)
+            attrs.append(str(attr))
+
+    end_ts = ts[-1]
+    for cls, (rows, attrs) in per_class.items():
+        starts = ts[np.asarray(rows)]
+        ends = np.append(starts[1:], end_ts)
+        durations = np.maximum(ends - starts, 0.0)
+        names, inverse = np.unique(np.asarray(attrs), return_inverse=True)
+        totals = np.bincount(inverse, weights=durations, minlength=len(names))
+        bucket = coverage.setdefault(cls, {})
+        for name, total in zip(names, totals):
+            bucket[str(name)] = bucket.get(str(name), 0.0) + float(total)
+    return coverage
+
+
+def analyze_arrays(arrays, taxonomy=None, stop_speed=0.5, min_dwell=60.0, gap_threshold=30.0):
+    """Computes distance, speed, dwell, bbox, gap and tag coverage figures.
+
+    ``stop_speed`` (m/s) and ``min_dwell`` (s) define a dwell; any interval
+    between consecutive points longer than ``gap_threshold`` (s) is a gap.
+    """
+    arrays = arrays.sorted_by_time()
+    ts, lat, lon = arrays.ts, arrays.lat, arrays.lon
+    result = RouteAnalysis()
+    result.point_count = len(ts)
+    if not len(ts):
+        result.coverage = _coverage(ts, arrays.tag_rows, arrays.tags, taxonomy)
+        return result
+
+    result.start_ts = float(ts[0])
+    result.end_ts = float(ts[-1])
+    result.duration = result.end_ts - result.start_ts
+    result.bbox = (float(lat.min()), float(lon.min()), float(lat.max()), float(lon.max()))
+
+    dist = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    dt = np.diff(ts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(dt > 0, dist / dt, np.nan)
+    result.segment_distance = dist
+    result.segment_speed = speed
+    result.distance_m = float(dist.sum())
+
+    valid = ~np.isnan(speed)
+    if valid.any():
+        result.max_speed = float(speed[valid].max())
+    moving = valid & (speed >= stop_speed)
+    result.moving_time = float(dt[moving].sum())
+    if result.moving_time > 0:
+        result.mean_speed = float(dist[moving].sum() / result.moving_time)
+
+    # Dwells: runs of consecutive slow segments lasting at least min_dwell
+    gap = dt > gap_threshold
+    slow = (np.nan_to_num(speed, nan=0.0) < stop_speed) & ~gap
+    starts, ends = _runs(slow)
+    if len(starts):
+        durations = ts[ends] - ts[starts]
+        keep = durations >= min_dwell
+        for s, e, d in zip(starts[keep], ends[keep], durations[keep]):
+            result.dwells.append({
+                "start_ts": float(ts[s]),
+                "end_ts": float(ts[e]),
+                "duration_s": float(d),
+                "latitude": float(lat[s:e + 1].mean()),
+                "longitude": float(lon[s:e + 1].mean()),
+            })
+
+    for i in np.flatnonzero(gap):
+        result.gaps.append({
+            "start_ts": float(ts[i]),
+            "end_ts": float(ts[i + 1]),
+            "duration_s": float(dt[i]),
+        })
+
+    result.coverage = _coverage(ts, arrays.tag_rows, arrays.tags, taxonomy)
+    return result
+
+
+def analyze_route(path, taxonomy=None, **kwargs):
+    return analyze_arrays(read_route_arrays(path), taxonomy, **kwargs)
+
+
+def _fmt_duration(seconds):
+    seconds = int(round(seconds))
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}h {m:02d}m {s:02d}s" if h else f"{m}m {s:02d}s"
+
+
+def format_analysis(result):
+    if not result.point_count:
+        return "No valid points in this route."
+
+    lines = [
+        f"Points: {result.point_count}",
+        f"Duration: {_fmt_duration(result.duration)}",
+        f"Distance: {result.distance_m / 1000.0:.3f} km",
+        f"Moving time: {_fmt_duration(result.moving_time)}",
+        f"Mean moving speed: {result.mean_speed * 3.6:.1f} km/h",
+        f"Max speed: {result.max_speed * 3.6:.1f} km/h",
+        "Bounding box: {:.6f}, {:.6f} – {:.6f}, {:.6f}".format(*result.bbox),
+        f"Dwells: {len(result.dwells)}",
+    ]
+    for d in result.dwells[:20]:
+        lines.append(f"  {_fmt_duration(d['duration_s'])} at {d['latitude']:.6f}, {d['longitude']:.6f}")
+    lines.append(f"Time gaps: {len(result.gaps)}")
+    for g in result.gaps[:20]:
+        start = time.strftime("%H:%M:%S", time.localtime(g["start_ts"]))
+        lines.append(f"  {_fmt_duration(g['duration_s'])} from {start}")
+
+    lines.append("Metadata coverage:")
+    for cls, attrs in result.coverage.items():
+        parts = ", ".join(f"{attr} {_fmt_duration(secs)}" for attr, secs in attrs.items())
+        lines.append(f"  {cls}: {parts}")
+    return "\n".join(lines)
@@ -0,0 +1,366 @@
+import os
+import time
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from .projects import write_json_atomic
+from .records import RouteRecord, loads, read_records
+from .recovery import manifest_path
+from .retag import RETAG_STATE, RetagState
+from .route_binary import EXTENSION, BinaryRouteReader, BinaryRouteSink, is_binary_route
+from .route_catalog import RouteStats
+from .route_geometry import douglas_peucker_importance, project
+
+ARCHIVE_STATE = os.path.join("app_data", "archive.json")
+MODES = ("bucket", "simplify")
+WINDOW_RECORDS = 65536  # records downsampled at a time; bounds memory however long the route
+
+
+class ArchiveCancelled(Exception):
+    pass
+
+
+class ArchiveResult(namedtuple("ArchiveResult", ["session", "archive", "points_before", "points_after",
+                                                 "bytes_before", "bytes_after", "error"])):
+    __slots__ = ()
+
+    @property
+    def reclaimed(self):
+        return self.bytes_before - self.bytes_after
+
+    def __str__(self):
+        if self.error:
+            return f"{self.session}: {self.error}"
+        if self.archive is None:
+            return f"{self.session}: kept as is, an archive would not be smaller"
+        return (f"{self.session} -> {self.archive}: {self.points_before} -> {self.points_after} points, "
+                f"{self.bytes_before} -> {self.bytes_after} bytes")
+
+
+class ArchiveState:
+    """Journal of archived sessions, so an interrupted job picks up where it stopped.
+
+    A session is entered as ``"replacing"`` once its archive is completely
+    written (still under a temporary name) and as ``"done"`` once the
+    archive has replaced its files and the catalog has been updated.
+    """
+
+    def __init__(self, path=ARCHIVE_STATE):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                data = loads(f.read())
+        except (OSError, ValueError):
+            data = {}
+        sessions = data.get("sessions") if isinstance(data, dict) else None
+        self.sessions = sessions if isinstance(sessions, dict) else {}
+
+    def save(self):
+        write_json_atomic(self.path, {"sessions": self.sessions})
+
+    def set(self, session, entry):
+        self.sessions[session] = entry
+        self.save()
+
+    def totals(self, project_name=None):
+        """``(archived, kept, bytes_before, bytes_after)`` over the finished entries.
+
+        Sessions kept as is (an archive would not have been smaller) are
+        counted apart and left out of the byte totals.
+        """
+        done = [e for e in self.sessions.values()
+                if e.get("state") == "done" and project_name in (None, e.get("project"))]
+        archived = [e for e in done if e.get("archive") is not None]
+        return (len(archived), len(done) - len(archived), sum(e.get("bytes_before", 0) for e in archived),
+                sum(e.get("bytes_after", 0) for e in archived))
+
+
+def _binary_chunks(path):
+    with BinaryRouteReader(path) as reader:
+        for block in reader.blocks:
+            ts, lat, lon = (np.array(column) for column in reader.columns(block))
+            metas = {}
+            if block.meta_count:
+                submitted, rows, codes = reader.meta(block)
+                for sub, row, code in zip(submitted.tolist(), rows.tolist(), codes.tolist()):
+                    rec = metas.get(row)
+                    if rec is None:
+                        rec = metas[row] = RouteRecord(float(ts[row]), float(lat[row]), float(lon[row]), {},
+                                                       None if np.isnan(sub) else sub)
+                    cls, attr = reader.dictionary[code]
+                    rec.meta_data[cls] = attr
+            yield ts, lat, lon, metas
+
+
+def _jsonl_chunks(path):
+    for batch in read_records(path):  # torn or corrupt lines are skipped
+        ts = np.array([rec.tick_timestamp for rec in batch], dtype=np.float64)
+        lat = np.array([rec.latitude for rec in batch], dtype=np.float64)
+        lon = np.array([rec.longitude for rec in batch], dtype=np.float64)
+        metas = {i: rec for i, rec in enumerate(batch) if rec.meta_data or rec.is_tag}
+        yield ts, lat, lon, metas
+
+
+def iter_windows(paths, size=WINDOW_RECORDS):
+    """Yields ``(ts, lat, lon, metas)`` for runs of about ``size`` records of a session.
+
+    ``metas`` maps the rows of the window that carry metadata (tags, and
+    fixes with ``meta_data``) to their ``RouteRecord``.
+    """
+    parts, count = [], 0
+    for path in paths:
+        for chunk in (_binary_chunks if is_binary_route(path) else _jsonl_chunks)(path):
+            parts.append(chunk)
+            count += len(chunk[0])
+            if count >= size:
+                yield _join(parts)
+                parts, count = [], 0
+    if parts:
+        yield _join(parts)
+
+
+def _join(parts):
+    if len(parts) == 1:
+        return parts[0]
+    metas, offset = {}, 0
+    for ts, _, _, part_metas in parts:
+        metas.update((offset + row, rec) for row, rec in part_metas.items())
+        offset += len(ts)
+    ts, lat, lon = (np.concatenate([part[i] for part in parts]) for i in range(3))
+    return ts, lat, lon, metas
+
+
+class Downsampler:
+    """Picks the fixes of a route to keep, one window at a time.
+
+    ``bucket`` keeps the first fix of every ``bucket_s`` seconds (and the
+    route's last fix). ``simplify`` keeps the Douglas–Peucker subset that
+    stays within ``tolerance_m`` metres of the full track. Rows that carry
+    metadata are always kept and take no part in either.
+    """
+
+    def __init__(self, mode="bucket", bucket_s=10.0, tolerance_m=5.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown archive mode: {mode}")
+        if (bucket_s if mode == "bucket" else tolerance_m) <= 0:
+            raise ValueError("The bucket size and tolerance must be positive")
+        self.mode = mode
+        self.bucket_s = bucket_s
+        self.tolerance_m = tolerance_m
+        self._last_bucket = None
+
+    @property
+    def settings(self):
+        if self.mode == "bucket":
+            return {"mode": self.mode, "bucket_s": self.bucket_s}
+        return {"mode": self.mode, "tolerance_m": self.tolerance_m}
+
+    def keep(self, ts, lat, lon, fixes, last=False):
+        """Boolean mask of the rows to keep; ``fixes`` masks the rows without metadata."""
+        keep = ~fixes
+        rows = np.flatnonzero(fixes)
+        if not len(rows):
+            return keep
+        if self.mode == "bucket":
+            buckets = np.floor(ts[rows] / self.bucket_s)
+            first = np.empty(len(rows), dtype=bool)
+            first[0] = buckets[0] != self._last_bucket
+            first[1:] = buckets[1:] != buckets[:-1]
+            self._last_bucket = buckets[-1]
+            keep[rows[first]] = True
+            if last:
+                keep[rows[-1]] = True
+        else:
+            # Window ends are always kept, so the error bound holds across windows
+            x, y = project(lat[rows], lon[rows], (lat[rows[0]], lon[rows[0]]))
+            importance = douglas_peucker_importance(x, y, self.tolerance_m)
+            keep[rows[importance >= self.tolerance_m]] = True
+        return keep
+
+
+def _window_stats(ts, lat, lon):
+    stats = RouteStats()
+    stats.point_count = len(ts)
+    if len(ts):
+        stats.start_ts, stats.end_ts = float(ts.min()), float(ts.max())
+        stats.min_lat, stats.max_lat = float(lat.min()), float(lat.max())
+        stats.min_lon, stats.max_lon = float(lon.min()), float(lon.max())
+    return stats
+
+
+class ArchiveJob:
+    """Downsamples a project's sessions older than ``older_than`` seconds into ``.rbin`` archives.
+
+    Each session is streamed window by window into ``route_<project>_<ts>.rbin``
+    (written under a temporary name first), which then replaces the
+    session's files; the catalog and indexes are updated to match. Progress
+    is journaled in ``ArchiveState``, so a job that is interrupted, cancelled
+    or killed can simply be run again: finished sessions are skipped and a
+    session caught between writing its archive and replacing its files is
+    completed first. Sessions that are still being logged are left alone.
+    An archive takes over the taxonomy version its session's files were
+    journaled at in ``retag_state_path``; a session whose files are at
+    different versions (a retag run stopped part way) is not archived.
+
+    ``run`` yields an ``ArchiveResult`` per session and may be driven from a
+    background thread; ``cancel`` may be called from any thread. Catalog and
+    index connections come from the factories and are opened on the thread
+    that runs the job.
+    """
+
+    def __init__(self, project_name, catalog_factory, older_than, mode="bucket", bucket_s=10.0,
+                 tolerance_m=5.0, taxonomy=None, state_path=ARCHIVE_STATE, index_factories=(),
+                 retag_state_path=RETAG_STATE):
+        Downsampler(mode, bucket_s, tolerance_m)  # validates the settings up front
+        self.project_name = project_name
+        self.catalog_factory = catalog_factory
+        self.index_factories = list(index_factories)
+        self.older_than = older_than
+        self.mode = mode
+        self.bucket_s = bucket_s
+        self.tolerance_m = tolerance_m
+        self.taxonomy = taxonomy
+        self.state = ArchiveState(state_path)
+        self.retag_state_path = retag_state_path
+        self.total = None  # sessions this run will visit, known once it has started
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def candidates(self, catalog, now=None):
+        """Sessions of the project that ended before the cutoff and are not archived yet."""
+        cutoff = (time.time() if now is None else now) - self.older_than
+        sessions = []
+        for row in catalog.routes(self.project_name, descending=False):
+            session = row["session"]
+            if row["end_ts"] is None or row["end_ts"] >= cutoff:
+                continue
+            if self.state.sessions.get(session, {}).get("state") == "done":
+                continue
+            if os.path.exists(manifest_path(os.path.join(catalog.route_dir, session + EXTENSION))):
+                continue  # still being logged
+            sessions.append(session)
+        return sessions
+
+    def run(self):
+        catalog = self.catalog_factory()
+        indexes = [factory() for factory in self.index_factories]
+        try:
+            unfinished = [(session, entry) for session, entry in self.state.sessions.items()
+                          if entry.get("state") == "replacing" and entry.get("project") == self.project_name]
+            sessions = [s for s in self.candidates(catalog) if s not in dict(unfinished)]
+            self.total = len(unfinished) + len(sessions)
+            for session, entry in unfinished:
+                yield self._finish(session, entry, catalog, indexes)
+            for session in sessions:
+                if self.cancelled:
+                    return
+                try:
+                    yield self._archive(session, catalog, indexes)
+                except ArchiveCancelled:
+                    return
+                except (OSError, ValueError) as e:
+                    yield ArchiveResult(session, None, 0, 0, 0, 0, str(e))
+        finally:
+            catalog.close()
+            for index in indexes:
+                index.close()
+
+    def _archive(self, session, catalog, indexes):
+        route_dir = catalog.route_dir
+        paths = [path for path in catalog.session_paths(session) if os.path.exists(path)]
+        RetagState(self.retag_state_path).source_version([os.path.basename(path) for path in paths])
+        archive = os.path.join(route_dir, session + EXTENSION)
+        tmp = archive + ".tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)  # left by a run interrupted while writing; the sink would append to it
+        bytes_before = sum(os.path.getsize(path) for path in paths)
+        downsampler = Downsampler(self.mode, self.bucket_s, self.tolerance_m)
+        stats = RouteStats()
+        points_before = 0
+
+        sink = BinaryRouteSink(tmp, self.taxonomy, self.project_name,
+                               info={"archive": {**downsampler.settings, "archived_at": time.time()}})
+        try:
+            windows = iter_windows(paths)
+            window = next(windows, None)
+            while window is not None:
+                if self.cancelled:
+                    raise ArchiveCancelled()
+                following = next(windows, None)
+                ts, lat, lon, metas = window
+                fixes = np.ones(len(ts), dtype=bool)
+                fixes[list(metas)] = False
+                kept = np.flatnonzero(downsampler.keep(ts, lat, lon, fixes, last=following is None))
+                kts, klat, klon = ts[kept], lat[kept], lon[kept]
+                sink.write([metas.get(row) or RouteRecord(t, la, lo)
+                            for row, t, la, lo in zip(kept.tolist(), kts.tolist(), klat.tolist(), klon.tolist())])
+                stats.merge(_window_stats(kts, klat, klon))
+                points_before += len(ts)
+                window = following
+            sink.fsync()
+        except BaseException:
+            sink.close()
+            os.remove(tmp)
+            raise
+        sink.close()
+
+        bytes_after = os.path.getsize(tmp)
+        entry = {
+            "project": self.project_name,
+            "state": "replacing",
+            "archive": os.path.basename(archive),
+            "sources": [os.path.basename(path) for path in paths],
+            "points_before": points_before,
+            "points_after": stats.point_count,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            **downsampler.settings,
+        }
+        if bytes_after >= bytes_before:
+            # Already compact (e.g. a short binary route); the session keeps its files
+            os.remove(tmp)
+            entry.update(state="done", archive=None, points_after=points_before, bytes_after=bytes_before)
+            self.state.set(session, entry)
+            return self._result(session, entry)
+        self.state.set(session, entry)
+        stats.byte_size = bytes_after
+        return self._finish(session, entry, catalog, indexes, stats)
+
+    def _finish(self, session, entry, catalog, indexes, stats=None):
+        """Puts a written archive in place of its session's files; safe to repeat."""
+        route_dir = catalog.route_dir
+        archive = os.path.join(route_dir, entry["archive"])
+        if os.path.exists(archive + ".tmp"):
+            os.replace(archive + ".tmp", archive)
+        elif not os.path.exists(archive):
+            del self.state.sessions[session]  # lost along with its archive; archived again next run
+            self.state.save()
+            return ArchiveResult(session, None, 0, 0, 0, 0, "archive missing, will be redone")
+
+        RetagState(self.retag_state_path).carry_over(entry["sources"], entry["archive"])
+        for name in entry["sources"]:
+            if name != entry["archive"] and os.path.exists(os.path.join(route_dir, name)):
+                os.remove(os.path.join(route_dir, name))
+            catalog.forget(name)
+            for index in indexes:
+                index.forget(name)
+        catalog.update_route(archive, appended=stats)
+        for index in indexes:
+            index.update_route(archive)
+
+        entry["state"] = "done"
+        self.state.set(session, entry)
+        return self._result(session, entry)
+
+    @staticmethod
+    def _result(session, entry):
+        return ArchiveResult(session, entry["archive"], entry["points_before"], entry["points_after"],
+                             entry["bytes_before"], entry["bytes_after"], None)
@@ -0,0 +1,390 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .generate import generate_project, generate_route, make_taxonomy
+from .projects import ProjectStore
+
+VIEW_PAGE_ROWS = 50
+RECORD_BATCH = 10000
+
+
+class Sample:
+    """What one benchmark measured: ``ops`` done in ``seconds``, and per-op or per-batch latencies."""
+
+    def __init__(self, unit, ops, seconds, latencies, **extra):
+        self.unit = unit
+        self.ops = ops
+        self.seconds = seconds
+        self.latencies = latencies
+        self.extra = extra
+
+    def to_dict(self):
+        lat = np.array(self.latencies, dtype=np.float64) * 1000.0
+        result = {
+            "unit": self.unit,
+            "ops": self.ops,
+            "seconds": round(self.seconds, 6),
+            "throughput": round(self.ops / self.seconds, 3) if self.seconds > 0 else None,
+        }
+        if len(lat):
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+            result["latency_ms"] = {
+                "samples": len(lat),
+                "mean": round(float(lat.mean()), 6),
+                "p50": round(float(p50), 6),
+                "p90": round(float(p90), 6),
+                "p99": round(float(p99), 6),
+                "max": round(float(lat.max()), 6),
+            }
+        result.update(self.extra)
+        return result
+
+
+class Fixture:
+    """Synthetic data shared by every benchmark of a run, generated once up front."""
+
+    def __init__(self, workdir, points=100000, projects=200, classes=3, tag_density=0.01,
+                 shape="road", seed=0):
+        self.workdir = workdir
+        self.points = points
+        self.params = {"points": points, "projects": projects, "classes": classes,
+                       "tag_density": tag_density, "shape": shape, "seed": seed}
+        self.taxonomy = make_taxonomy(classes)
+        data_dir = os.path.join(workdir, "app_data")
+        _, (self.route,) = generate_project(data_dir, "Bench", routes=1, points=points, classes=classes,
+                                            tag_density=tag_density, shape=shape, seed=seed, catalog=False)
+        self.binary_route = os.path.join(data_dir, "routes", "route_BenchBin_0.rbin")
+        generate_route(self.binary_route, points, self.taxonomy, tag_density, "BenchBin",
+                       seed=seed, events=False, shape=shape, start_ts=0)
+
+        self.project_dir = os.path.join(workdir, "projects")
+        store = ProjectStore(self.project_dir)
+        for i in range(projects):
+            store.save({"projectName": f"Project{i:04d}", "gpsFrequency": 5 + i % 16,
+                        "taxonomy": make_taxonomy(1 + i % 6)})
+        self.tick_dir = os.path.join(workdir, "tick_routes")
+
+
+def _batched_latencies(records, batch):
+    """Consumes ``records``; returns ``(count, seconds, per-batch latencies)``."""
+    latencies = []
+    count = 0
+    start = last = time.perf_counter()
+    for _ in records:
+        count += 1
+        if count % batch == 0:
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+    return count, time.perf_counter() - start, latencies
+
+
+def bench_tick(fixture, ticks=20000, meta_every=10):
+    """``RouteSession.tick`` as the logger dialog's ``do_tick`` drives it, writer drain included."""
+    from .session import RouteSession
+
+    session = RouteSession({"projectName": "Tick", "gpsFrequency": 5, "taxonomy": fixture.taxonomy,
+                            "locationSource": {"type": "synthetic", "rateHz": 50}},
+                           route_dir=fixture.tick_dir)
+    session.start()
+    deadline = time.time() + 5.0
+    while session.current_location is None and time.time() < deadline:
+        time.sleep(0.01)
+    meta = {entry["className"]: entry["attributes"][0] for entry in fixture.taxonomy}
+    latencies = []
+    max_pending = 0
+    start = time.perf_counter()
+    for i in range(ticks):
+        if i % meta_every == 0:
+            session.submit_meta(meta)
+        t = time.perf_counter()
+        session.tick()
+        session.take_tagged()
+        latencies.append(time.perf_counter() - t)
+        if i % 256 == 0:
+            max_pending = max(max_pending, session.writer.pending())
+    t = time.perf_counter()
+    error = session.stop()
+    stop_seconds = time.perf_counter() - t
+    if error is not None:
+        raise error
+    return Sample("ticks", ticks, time.perf_counter() - start, latencies,
+                  stop_seconds=round(stop_seconds, 6), max_writer_queue=max_pending)
+
+
+def bench_write(fixture, records=200000):
+    """``RouteWriter`` appending records queued one at a time, until closed."""
+    from .generate import generate_records
+    from .route_writer import RouteWriter
+
+    batches = list(generate_records(records, fixture.taxonomy, 0.0, seed=1, start_ts=0))
+    writer = RouteWriter(os.path.join(fixture.workdir, "write_bench.jsonl"))
+    writer.start()
+    latencies = []
+    count = 0
+    start = time.perf_counter()
+    for batch in batches:
+        t = time.perf_counter()
+        for rec in batch:
+            writer.write(rec)
+        latencies.append((time.perf_counter() - t) / len(batch))
+        count += len(batch)
+    writer.close()
+    if writer.error is not None:
+        raise writer.error
+    return Sample("records", count, time.perf_counter() - start, latencies)
+
+
+def bench_parse_records(fixture):
+    """Streaming a JSONL route as dicts (``iter_route_records``); latency per 10k records."""
+    from .timeline import iter_route_records
+
+    count, seconds, latencies = _batched_latencies(iter_route_records(fixture.route), RECORD_BATCH)
+    return Sample("records", count, seconds, latencies)
+
+
+def bench_codec(fixture, repeat=3):
+    """Decoding and validating the JSONL route's lines in bulk, then encoding them again; latency per 10k."""
+    from .records import CODEC, decode_records, encode_records
+
+    with open(fixture.route, "rb") as f:
+        lines = f.read().split(b"\n")
+    latencies = []
+    count = 0
+    for _ in range(repeat):
+        for i in range(0, len(lines), RECORD_BATCH):
+            t = time.perf_counter()
+            records, _ = decode_records(lines[i:i + RECORD_BATCH])
+            encode_records(records)
+            latencies.append(time.perf_counter() - t)
+            count += len(records)
+    return Sample("records", count, sum(latencies), latencies, codec=CODEC)
+
+
+def _bench_arrays(path, repeat):
+    from .analytics import read_route_arrays
+
+    latencies = []
+    count = 0
+    for _ in range(repeat):
+        t = time.perf_counter()
+        count += len(read_route_arrays(path))
+        latencies.append(time.perf_counter() - t)
+    return Sample("records", count, sum(latencies), latencies)
+
+
+def bench_parse_arrays(fixture, repeat=5):
+    """Columnar parse of a JSONL route (``read_route_arrays``); latency per file."""
+    return _bench_arrays(fixture.route, repeat)
+
+
+def bench_parse_binary(fixture, repeat=5):
+    """Columnar read of the same route in the binary format; latency per file."""
+    return _bench_arrays(fixture.binary_route, repeat)
+
+
+def bench_view(fixture, pages=2000, seed=0):
+    """The log viewer: open a route's index, then render pages of rows at random positions."""
+    from .route_index import open_route_index
+
+    rng = random.Random(seed)
+    t = time.perf_counter()
+    index = open_route_index(fixture.route)
+    try:
+        while getattr(index, "can_load_more", lambda: False)():
+            index.load_next()
+            index.commit_next()
+        open_seconds = time.perf_counter() - t
+        rows = len(index)
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(pages):
+            first = rng.randrange(max(1, rows - VIEW_PAGE_ROWS))
+            t = time.perf_counter()
+            for row in range(first, min(rows, first + VIEW_PAGE_ROWS)):
+                index.record(row)
+            latencies.append(time.perf_counter() - t)
+        seconds = time.perf_counter() - start
+    finally:
+        index.close()
+    return Sample("pages", pages, seconds, latencies, open_seconds=round(open_seconds, 6), rows=rows)
+
+
+def bench_projects(fixture, repeat=20):
+    """``ProjectStore.load_all`` over a directory of project files; latency per load."""
+    latencies = []
+    count = 0
+    for _ in range(repeat):
+        store = ProjectStore(fixture.project_dir)
+        t = time.perf_counter()
+        store.load_all()
+        latencies.append(time.perf_counter() - t)
+        count += len(store.projects)
+    return Sample("projects", count, sum(latencies), latencies)
+
+
+def bench_analytics(fixture, repeat=3):
+    """``analyze_route`` on the JSONL route, parse included; latency per run."""
+    from .analytics import analyze_route
+
+    latencies = []
+    count = 0
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = analyze_route(fixture.route, fixture.taxonomy)
+        latencies.append(time.perf_counter() - t)
+        count += result.point_count
+    return Sample("points", count, sum(latencies), latencies)
+
+
+BENCHMARKS = {
+    "tick": bench_tick,
+    "write": bench_write,
+    "parse_records": bench_parse_records,
+    "codec": bench_codec,
+    "parse_arrays": bench_parse_arrays,
+    "parse_binary": bench_parse_binary,
+    "view": bench_view,
+    "projects": bench_projects,
+    "analytics": bench_analytics,
+}
+
+
+def _peak_rss_mb():
+    """This process's peak resident memory.
+
+    Linux reads ``VmHWM``, which starts afresh in a spawned process;
+    ``ru_maxrss`` there carries over the peak of the process that spawned it.
+    """
+    try:
+        with open("/proc/self/status", "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 3)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 3)
+
+
+def _run_one(name, fixture):
+    baseline = _peak_rss_mb()
+    result = BENCHMARKS[name](fixture).to_dict()
+    result["peak_memory_mb"] = _peak_rss_mb()
+    result["baseline_memory_mb"] = baseline
+    return result
+
+
+def _revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_benchmarks(names=None, workdir=None, isolate=True, progress=None, **params):
+    """Runs the named benchmarks (default: all) and returns the report as a dict.
+
+    Every benchmark reports throughput, latency percentiles and the peak
+    resident memory of the process it ran in. ``params`` size the ``Fixture``. Data goes to a temporary directory
+    unless ``workdir`` is given, in which case it is kept. With ``isolate``
+    each benchmark runs in its own spawned process.
+    """
+    names = list(names or BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(unknown)}")
+    keep = workdir is not None
+    workdir = workdir or tempfile.mkdtemp(prefix="gta-bench-")
+    try:
+        t = time.perf_counter()
+        fixture = Fixture(workdir, **params)
+        setup_seconds = time.perf_counter() - t
+        results = {}
+        for name in names:
+            if isolate:
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    results[name] = pool.submit(_run_one, name, fixture).result()
+            else:
+                results[name] = _run_one(name, fixture)
+            if progress is not None:
+                progress(name, results[name])
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "revision": _revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": fixture.params,
+        "setup_seconds": round(setup_seconds, 3),
+        "results": results,
+    }
+
+
+def compare(baseline, report, threshold=0.10):
+    """Regressions of ``report`` against ``baseline``: ``(benchmark, metric, old, new, change)`` tuples.
+
+    Throughput dropping, or p99 latency or peak memory growing, by more than
+    ``threshold`` (a fraction) counts as a regression. Raises ``ValueError``
+    if the two runs were sized by different ``params``.
+    """
+    old_params, new_params = baseline.get("params", {}), report.get("params", {})
+    differing = sorted(key for key in old_params.keys() | new_params.keys()
+                       if old_params.get(key) != new_params.get(key))
+    if differing:
+        raise ValueError("Baseline was run with different parameters: " + ", ".join(
+            f"{key} {old_params.get(key)!r} (now {new_params.get(key)!r})" for key in differing))
+    regressions = []
+    for name, new in report["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            continue
+        checks = [
+            ("throughput", old.get("throughput"), new.get("throughput"), -1),
+            ("p99_ms", old.get("latency_ms", {}).get("p99"), new.get("latency_ms", {}).get("p99"), 1),
+            ("peak_memory_mb", old.get("peak_memory_mb"), new.get("peak_memory_mb"), 1),
+        ]
+        for metric, before, after, worse in checks:
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if change * worse > threshold:
+                regressions.append((name, metric, before, after, change))
+    return regressions
+
+
+def format_result(name, result):
+    lat = result.get("latency_ms")
+    latency = (f"  p50 {lat['p50']:.3f} ms  p99 {lat['p99']:.3f} ms  max {lat['max']:.3f} ms"
+               if lat else "")
+    memory = f"  peak {result['peak_memory_mb']:.0f} MB" if result.get("peak_memory_mb") else ""
+    return f"{name:<14} {result['throughput']:>14,.0f} {result['unit']}/s{latency}{memory}"
+
+
+def save_report(report, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
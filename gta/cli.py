@@ -0,0 +1,876 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+from .projects import ProjectError, ProjectStore
+from .records import encode_record
+from .route_catalog import SORT_COLUMNS, RouteCatalog, parse_route_name
+from .route_segments import open_segment, session_name
+from .session import RouteSession
+
+DATA_DIR = "app_data"
+
+
+def _paths(args):
+    return (os.path.join(args.data_dir, "projects"),
+            os.path.join(args.data_dir, "routes"),
+            os.path.join(args.data_dir, "routes.db"))
+
+
+def _open_spatial(args):
+    from .spatial_index import SpatialIndex
+
+    return SpatialIndex(os.path.join(args.data_dir, "spatial.db"), _paths(args)[1])
+
+
+def _open_tags(args):
+    from .tag_index import TagIndex
+
+    return TagIndex(os.path.join(args.data_dir, "tags.db"), _paths(args)[1])
+
+
+def _open_store(args):
+    store = ProjectStore(_paths(args)[0])
+    store.load_all()
+    return store
+
+
+def _open_catalog(args):
+    _, route_dir, db_path = _paths(args)
+    catalog = RouteCatalog(db_path, route_dir)
+    catalog.revalidate()
+    return catalog
+
+
+def _get_project(store, name):
+    data = store.get(store.path_for(name))
+    if data is None:
+        error = store.errors.get(store.path_for(name), "no such project")
+        raise SystemExit(f"Cannot load project '{name}': {error}")
+    return data
+
+
+def _resolve_route(catalog, route):
+    """A route file path, or the segment paths of a cataloged session."""
+    if os.path.isfile(route):
+        return route
+    name = os.path.basename(route)
+    paths = catalog.session_paths(session_name(name) or name)
+    if not paths:
+        raise SystemExit(f"Unknown route: {route}")
+    return paths if len(paths) > 1 else paths[0]
+
+
+def _parse_class(value):
+    name, sep, attrs = value.partition("=")
+    attributes = [a.strip() for a in attrs.split(",") if a.strip()]
+    if not sep or not name.strip():
+        raise argparse.ArgumentTypeError(f"expected CLASS=attr1,attr2, got '{value}'")
+    return {"className": name.strip(), "attributes": attributes}
+
+
+def _parse_meta(value):
+    name, sep, attr = value.partition("=")
+    if not sep or not name.strip() or not attr.strip():
+        raise argparse.ArgumentTypeError(f"expected CLASS=ATTR, got '{value}'")
+    return {name.strip(): attr.strip()}
+
+
+def _host_port(value):
+    host, _, port = value.rpartition(":")
+    if not port.isdigit():
+        raise argparse.ArgumentTypeError("expected HOST:PORT or PORT")
+    return host or "0.0.0.0", int(port)
+
+
+def _location_source(args):
+    if args.source is None and args.nmea is None and args.rate is None:
+        return None
+    config = {"type": "nmea" if args.nmea else (args.source or "simulator")}
+    if args.nmea:
+        config["path"] = args.nmea
+    if args.rate is not None:
+        config["rateHz"] = args.rate
+    return config
+
+
+def _fmt_ts(ts):
+    if ts is None:
+        return "-"
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+
+def _fmt_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+def cmd_project_list(args):
+    store = _open_store(args)
+    for path in store.paths():
+        data = store.get(path)
+        classes = ", ".join(entry["className"] for entry in data.get("taxonomy", []))
+        print(f"{data['projectName']}\tevery {data['gpsFrequency']}s\t{classes}")
+    for path, error in sorted(store.errors.items()):
+        print(f"{os.path.basename(path)}: {error}", file=sys.stderr)
+    return 0
+
+
+def cmd_project_create(args):
+    store = _open_store(args)
+    if store.get(store.path_for(args.name)) is not None:
+        raise SystemExit(f"Project '{args.name}' already exists.")
+    data = {
+        "projectName": args.name,
+        "gpsFrequency": args.frequency,
+        "taxonomy": args.taxonomy or []
+    }
+    source = _location_source(args)
+    if source is not None:
+        data["locationSource"] = source
+    if args.format == "binary":
+        data["routeFormat"] = "binary"
+    try:
+        path = store.save(data)
+    except (OSError, ProjectError) as e:
+        raise SystemExit(f"Failed to save project: {e}")
+    print(path)
+    return 0
+
+
+def cmd_log(args):
+    store = _open_store(args)
+    data = _get_project(store, args.project)
+    _, route_dir, db_path = _paths(args)
+    _recover(route_dir)
+    catalog = RouteCatalog(db_path, route_dir)
+    indexes = [_open_spatial(args), _open_tags(args)]
+    session = RouteSession(data, route_dir=route_dir, catalog=catalog,
+                           location_config=_location_source(args), indexes=indexes)
+    for meta in args.meta or []:
+        session.submit_meta(meta)
+
+    def on_tick(log):
+        if not args.quiet:
+            print(f"{log['tick_timestamp']}: {log['meta_data']}", flush=True)
+
+    print(f"Logging to {session.route_file}", file=sys.stderr)
+    try:
+        session.run(duration=args.duration, on_tick=on_tick)
+    except KeyboardInterrupt:
+        pass  # run() has already stopped the session
+    except (KeyError, ValueError) as e:
+        raise SystemExit(f"Invalid location source: {e}")
+    except OSError as e:
+        raise SystemExit(f"Failed to write route log: {e}")
+    finally:
+        catalog.close()
+        for index in indexes:
+            index.close()
+    return 0
+
+
+def _recover(route_dir, force=False):
+    from .recovery import recover_sessions
+
+    recovered = recover_sessions(route_dir, force)
+    for result in recovered:
+        print(f"Recovered {result}", file=sys.stderr)
+    return recovered
+
+
+def cmd_recover(args):
+    recovered = _recover(_paths(args)[1], args.force)
+    if not recovered:
+        print("No unfinished sessions")
+    return 0
+
+
+def cmd_routes(args):
+    catalog = _open_catalog(args)
+    try:
+        rows = catalog.routes(args.project, order_by=args.sort, descending=not args.ascending)
+    finally:
+        catalog.close()
+    for row in rows:
+        segments = f" ({row['segment_count']} segments)" if row["segment_count"] > 1 else ""
+        print(f"{row['session']}{segments}\t{_fmt_ts(row['start_ts'])}\t{_fmt_ts(row['end_ts'])}"
+              f"\t{row['point_count']} points\t{row['byte_size']} bytes")
+    return 0
+
+
+def _print_hits(args, hits):
+    if args.json:
+        print(json.dumps([{
+            "session": hit.session,
+            "points": hit.point_count,
+            "min_distance_m": hit.min_distance,
+            "ranges": [{"start_ts": a, "end_ts": b, "points": n} for a, b, n in hit.ranges()]
+        } for hit in hits], indent=2))
+        return
+    for hit in hits:
+        nearest = "" if hit.min_distance is None else f"\tnearest {hit.min_distance:.0f} m"
+        print(f"{hit.session}\t{hit.point_count} points{nearest}")
+        for start, end, count in hit.ranges():
+            print(f"  {_fmt_ts(start)} – {_fmt_ts(end)}\t{count} points")
+
+
+def cmd_near(args):
+    spatial = _open_spatial(args)
+    try:
+        spatial.sync(args.project)
+        hits = spatial.query_near(args.project, args.lat, args.lon, args.radius,
+                                  start_ts=args.start, end_ts=args.end)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        spatial.close()
+    _print_hits(args, hits)
+    return 0
+
+
+def cmd_area(args):
+    spatial = _open_spatial(args)
+    try:
+        spatial.sync(args.project)
+        hits = spatial.query_bbox(args.project, args.south, args.west, args.north, args.east,
+                                  start_ts=args.start, end_ts=args.end)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        spatial.close()
+    _print_hits(args, hits)
+    return 0
+
+
+def cmd_tags(args):
+    store = _open_store(args)
+    data = _get_project(store, args.project)
+    index = _open_tags(args)
+    try:
+        index.set_taxonomy(args.project, data.get("taxonomy", []))
+        index.sync(args.project)
+        if args.query is None:
+            counts = index.tag_counts(args.project)
+            for cls, attr in sorted(index.taxonomy_tags(args.project) | set(counts)):
+                print(f"{cls}={attr}\t{counts.get((cls, attr), 0)} ticks")
+            return 0
+        matches = index.query(args.project, args.query)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        index.close()
+
+    if args.json:
+        print(json.dumps([{
+            "filename": m.filename,
+            "session": m.session,
+            "rows": m.rows.tolist(),
+            "tick_timestamps": m.ts.tolist()
+        } for m in matches], indent=2))
+        return 0
+    for m in matches:
+        print(f"{m.filename}\t{len(m)} ticks\t{_fmt_ts(m.ts.min())} – {_fmt_ts(m.ts.max())}")
+    return 0
+
+
+def _route_taxonomy(args, route):
+    first = route if isinstance(route, str) else route[0]
+    parsed = parse_route_name(os.path.basename(first))
+    if parsed is None:
+        return None
+    store = _open_store(args)
+    return (store.get(store.path_for(parsed[0])) or {}).get("taxonomy")
+
+
+def _export_format(path):
+    from .export import FORMATS
+
+    ext = os.path.splitext(path)[1].lower()
+    return next((fmt for fmt, fmt_ext in FORMATS.items() if fmt_ext == ext), None)
+
+
+def cmd_summary(args):
+    from .analytics import analyze_route, format_analysis
+
+    catalog = _open_catalog(args)
+    try:
+        route = _resolve_route(catalog, args.route)
+    finally:
+        catalog.close()
+
+    result = analyze_route(route, _route_taxonomy(args, route))
+    if args.json:
+        print(json.dumps(result.summary(), indent=2))
+    else:
+        print(format_analysis(result))
+    return 0
+
+
+def cmd_export(args):
+    from .route_binary import BinaryRouteReader, is_binary_route
+
+    catalog = _open_catalog(args)
+    try:
+        route = _resolve_route(catalog, args.route)
+    finally:
+        catalog.close()
+
+    fmt = _export_format(args.dst)
+    if fmt is not None:
+        from .export import export_route
+
+        count = export_route(route, args.dst, fmt, _route_taxonomy(args, route))
+        print(f"{count} records written to {args.dst}")
+        return 0
+
+    count = 0
+    with open(args.dst, "wb") as out:
+        for path in [route] if isinstance(route, str) else route:
+            if is_binary_route(path):
+                with BinaryRouteReader(path) as reader:
+                    for rec in reader.iter_records():
+                        out.write(encode_record(rec) + b"\n")
+                        count += 1
+                continue
+            with open_segment(path) as f:
+                for line in f:
+                    if line.strip():
+                        out.write(line if line.endswith(b"\n") else line + b"\n")
+                        count += 1
+    print(f"{count} records written to {args.dst}")
+    return 0
+
+
+def cmd_timeline(args):
+    from .timeline import Timeline
+
+    catalog = _open_catalog(args)
+    try:
+        timeline = Timeline.for_project(args.project, catalog.route_dir, args.start, args.end, catalog)
+    finally:
+        catalog.close()
+
+    if args.summary:
+        from .analytics import analyze_route, format_analysis
+
+        store = _open_store(args)
+        taxonomy = (store.get(store.path_for(args.project)) or {}).get("taxonomy")
+        result = analyze_route(timeline, taxonomy)
+        if args.json:
+            print(json.dumps(result.summary(), indent=2))
+        else:
+            print(format_analysis(result))
+        return 0
+
+    count = 0
+    out = open(args.dst, "wb") if args.dst else sys.stdout.buffer
+    try:
+        for rec in timeline:
+            out.write(encode_record(rec) + b"\n")
+            count += 1
+    finally:
+        if args.dst:
+            out.close()
+    if args.dst:
+        print(f"{count} records from {len(timeline.paths)} files written to {args.dst}")
+    return 0
+
+
+def cmd_bulk_export(args):
+    from .export import BulkExporter
+
+    catalog = _open_catalog(args)
+    try:
+        if args.route:
+            routes = [_resolve_route(catalog, r) for r in args.route]
+        else:
+            routes = [catalog.session_paths(row["session"])
+                      for row in catalog.routes(args.project, descending=False)]
+            routes = [paths[0] if len(paths) == 1 else paths for paths in routes]
+    finally:
+        catalog.close()
+    if not routes:
+        print(f"No routes found for project: {args.project}", file=sys.stderr)
+        return 1
+
+    store = _open_store(args)
+    taxonomy = (store.get(store.path_for(args.project)) or {}).get("taxonomy")
+    exporter = BulkExporter(routes, args.out_dir, args.format, taxonomy, args.workers)
+    results = exporter.run()
+    failed = 0
+    try:
+        for done, result in enumerate(results, 1):
+            if result.error:
+                failed += 1
+                print(f"[{done}/{len(routes)}] {result.name}: {result.error}", file=sys.stderr)
+            elif not args.quiet:
+                print(f"[{done}/{len(routes)}] {result.dst} ({result.count} records)")
+    except KeyboardInterrupt:
+        exporter.cancel()
+        results.close()
+        print("Export cancelled.", file=sys.stderr)
+        return 130
+    return 1 if failed else 0
+
+
+def cmd_align(args):
+    from .meta_events import realign_route
+
+    catalog = _open_catalog(args)
+    try:
+        route = _resolve_route(catalog, args.route)
+        paths = [route] if isinstance(route, str) else route
+        parsed = parse_route_name(os.path.basename(paths[0]))
+        try:
+            result = realign_route(route, args.mode, taxonomy=_route_taxonomy(args, route),
+                                   project_name=parsed[0] if parsed else None, dry_run=args.dry_run,
+                                   retag_state_path=os.path.join(args.data_dir, "retag.json"))
+        except ValueError as e:
+            raise SystemExit(f"{args.route}: {e}")
+        if not args.dry_run:
+            indexes = [_open_spatial(args), _open_tags(args)]
+            try:
+                for path in paths:
+                    catalog.update_route(path)
+                    for index in indexes:
+                        index.update_route(path)
+            finally:
+                for index in indexes:
+                    index.close()
+    finally:
+        catalog.close()
+
+    action = "would be realigned" if args.dry_run else "realigned"
+    print(f"{len(result)} tags {action} ({args.mode})")
+    if result.old_offset is not None:
+        print(f"Mean offset from submission: {result.old_offset:.1f} s before, {result.new_offset:.1f} s after")
+    elif result.new_offset is not None:
+        print(f"Mean offset from submission: {result.new_offset:.1f} s")
+    return 0
+
+
+def cmd_generate(args):
+    from .generate import generate_project
+
+    t = time.perf_counter()
+    project_path, paths = generate_project(
+        args.data_dir, args.project, routes=args.routes, points=args.points, classes=args.classes,
+        attributes=args.attributes, tag_density=args.tag_density, shape=args.shape, rate_hz=args.rate,
+        route_format=args.format, seed=args.seed
+    )
+    print(project_path)
+    for path in paths:
+        print(path)
+    print(f"{len(paths)} routes of {args.points} points in {time.perf_counter() - t:.1f} s", file=sys.stderr)
+    return 0
+
+
+def cmd_bench(args):
+    from .bench import compare, format_result, run_benchmarks, save_report
+
+    def progress(name, result):
+        print(format_result(name, result), flush=True)
+
+    try:
+        report = run_benchmarks(args.only, workdir=args.workdir, isolate=not args.in_process,
+                                progress=progress, points=args.points, projects=args.projects,
+                                shape=args.shape, seed=args.seed)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if args.out:
+        save_report(report, args.out)
+        print(f"Results saved to {args.out}", file=sys.stderr)
+    if not args.compare:
+        return 0
+
+    with open(args.compare, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    try:
+        regressions = compare(baseline, report, args.threshold)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    for name, metric, before, after, change in regressions:
+        print(f"REGRESSION {name} {metric}: {before:g} -> {after:g} ({change:+.0%})")
+    if not regressions:
+        print(f"No regressions against {args.compare} (revision {baseline.get('revision')})")
+    return 1 if regressions else 0
+
+
+def cmd_convert(args):
+    from .route_binary import binary_to_jsonl, is_binary_route, jsonl_to_binary
+
+    if is_binary_route(args.src):
+        count = binary_to_jsonl(args.src, args.dst)
+    else:
+        count = jsonl_to_binary(args.src, args.dst)
+    print(f"{count} records written")
+    return 0
+
+
+def cmd_migrate(args):
+    from .route_binary import migrate_routes
+
+    project_dir, route_dir, _ = _paths(args)
+    for src, dst, count in migrate_routes(route_dir, project_dir, args.remove,
+                                          os.path.join(args.data_dir, "retag.json")):
+        print(f"{src} -> {dst} ({count} records)")
+    return 0
+
+
+def cmd_archive(args):
+    from .archive import ArchiveJob
+
+    _, route_dir, db_path = _paths(args)
+    _recover(route_dir)
+    project = _get_project(_open_store(args), args.project)
+    try:
+        job = ArchiveJob(args.project, lambda: _open_catalog(args), args.older_than * 86400.0,
+                         mode=args.mode, bucket_s=args.bucket, tolerance_m=args.tolerance,
+                         taxonomy=project.get("taxonomy"), state_path=os.path.join(args.data_dir, "archive.json"),
+                         index_factories=[lambda: _open_spatial(args), lambda: _open_tags(args)],
+                         retag_state_path=os.path.join(args.data_dir, "retag.json"))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    reclaimed = 0
+    try:
+        for result in job.run():
+            print(result)
+            if not result.error:
+                reclaimed += result.reclaimed
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume", file=sys.stderr)
+    archived, kept, before, after = job.state.totals(args.project)
+    kept = f"; {kept} kept as is" if kept else ""
+    print(f"Reclaimed {_fmt_bytes(reclaimed)} this run; {archived} sessions archived so far, "
+          f"{_fmt_bytes(before)} -> {_fmt_bytes(after)} in total{kept}")
+    return 0
+
+
+def _rename_arg(text):
+    old, sep, new = text.partition("=")
+    if not sep or not old.strip() or not new.strip():
+        raise argparse.ArgumentTypeError(f"Expected OLD=NEW, got '{text}'")
+    return old.strip(), new.strip()
+
+
+def _class_attr(text):
+    cls, sep, attr = text.partition(":")
+    if not sep or not cls.strip() or not attr.strip():
+        raise argparse.ArgumentTypeError(f"Expected CLASS:ATTR, got '{text}'")
+    return cls.strip(), attr.strip()
+
+
+def cmd_retag(args):
+    from .retag import RetagJob
+    from .taxonomy import TaxonomyMigration, record_migration, taxonomy_version
+
+    _, route_dir, db_path = _paths(args)
+    _recover(route_dir)
+    store = _open_store(args)
+    project = _get_project(store, args.project)
+    attributes = {}
+    for spec, new in args.rename or []:
+        cls, attr = _class_attr(spec)
+        attributes.setdefault(cls, {})[attr] = new
+    for cls, attr in args.drop or []:
+        attributes.setdefault(cls, {})[attr] = None
+    classes = dict(args.rename_class or [])
+    classes.update((cls, None) for cls in args.drop_class or [])
+    migration = TaxonomyMigration(classes, attributes)
+    if migration:
+        record_migration(project, migration)
+        try:
+            store.save(project)
+        except (OSError, ProjectError) as e:
+            raise SystemExit(f"Cannot save project '{args.project}': {e}")
+        print(f"Taxonomy version {taxonomy_version(project)}: " + "; ".join(migration.describe()))
+
+    job = RetagJob(project, lambda: RouteCatalog(db_path, route_dir), route_dir,
+                   state_path=os.path.join(args.data_dir, "retag.json"),
+                   index_factories=[lambda: _open_spatial(args), lambda: _open_tags(args)], workers=args.workers)
+    rewritten = failed = 0
+    try:
+        for result in job.run():
+            if result.error:
+                failed += 1
+                print(f"{result.filename}: {result.error}", file=sys.stderr)
+            elif result.changed:
+                rewritten += 1
+                dropped = f", {result.dropped} tags dropped" if result.dropped else ""
+                print(f"{result.filename}: {result.changed} records rewritten{dropped}")
+    except KeyboardInterrupt:
+        job.cancel()
+        print("Interrupted; run the same project again to resume", file=sys.stderr)
+    print(f"{job.total or 0} files at taxonomy version {job.version}, {rewritten} rewritten"
+          + (f", {failed} failed" if failed else ""))
+    return 1 if failed else 0
+
+
+def cmd_ingest(args):
+    import asyncio
+
+    from .ingest import IngestServer
+
+    if not (args.tcp or args.udp or args.unix):
+        raise SystemExit("Nothing to listen on: give --tcp, --udp and/or --unix")
+    project_dir, route_dir, db_path = _paths(args)
+    server = IngestServer(project_dir, route_dir, default_project=args.project,
+                          flush_interval=args.flush_interval, high_water=args.high_water,
+                          idle_timeout=args.idle_timeout,
+                          catalog_factory=lambda: RouteCatalog(db_path, route_dir),
+                          index_factories=[lambda: _open_spatial(args), lambda: _open_tags(args)])
+
+    async def serve():
+        await server.start(tcp=args.tcp, udp=args.udp, unix=args.unix)
+        for address in server.addresses():
+            print(f"Listening on {address}", file=sys.stderr)
+        started = time.monotonic()
+        try:
+            while args.duration is None or time.monotonic() - started < args.duration:
+                await asyncio.sleep(args.status_interval if args.duration is None
+                                    else min(args.status_interval, args.duration))
+                print(server.status(), file=sys.stderr, flush=True)
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        raise SystemExit(f"Ingest server failed: {e}")
+    print(server.status(), file=sys.stderr)
+    return 0
+
+
+def cmd_fleet_sim(args):
+    import asyncio
+
+    from .loadgen import FleetSimulator
+
+    taxonomy = None
+    if args.meta_rate:
+        if not args.project:
+            raise SystemExit("--meta-rate needs --project: metadata is drawn from that project's taxonomy")
+        taxonomy = _get_project(_open_store(args), args.project).get("taxonomy")
+    try:
+        sim = FleetSimulator(args.address, devices=args.devices, rate_hz=args.rate, project=args.project,
+                             taxonomy=taxonomy, meta_rate=args.meta_rate, connections=args.connections,
+                             seed=args.seed)
+        stats = asyncio.run(sim.run(args.duration))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    except OSError as e:
+        raise SystemExit(f"Cannot reach {args.address}: {e}")
+    except KeyboardInterrupt:
+        return 0
+    lag = sim.lag_ms
+    print(f"{stats['sent']} fixes and {stats['metas']} metadata messages from {args.devices} devices "
+          f"in {stats['seconds']:.1f} s ({stats['sent'] / stats['seconds']:,.0f}/s)")
+    print(f"Behind schedule: p50 {lag.percentile(50) or 0:.1f} ms  p99 {lag.percentile(99) or 0:.1f} ms  "
+          f"max {stats['behind_max'] * 1000.0:.1f} ms")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="gta", description="GPS Tracker Application command line")
+    parser.add_argument("--data-dir", default=DATA_DIR,
+                        help="directory holding projects/, routes/ and routes.db (default: app_data)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    project = sub.add_parser("project", help="list or create projects")
+    project_sub = project.add_subparsers(dest="project_command", required=True)
+    project_sub.add_parser("list", help="list projects").set_defaults(func=cmd_project_list)
+
+    create = project_sub.add_parser("create", help="create a project")
+    create.add_argument("name")
+    create.add_argument("--frequency", type=int, default=5, help="metadata tick interval in seconds")
+    create.add_argument("--class", dest="taxonomy", type=_parse_class, action="append",
+                        metavar="CLASS=ATTR,...", help="taxonomy class; may be repeated")
+    create.add_argument("--format", choices=("jsonl", "binary"), default="jsonl")
+    create.set_defaults(func=cmd_project_create)
+
+    log = sub.add_parser("log", help="run a headless logging session")
+    log.add_argument("project")
+    log.add_argument("--duration", type=float, help="stop after this many seconds (default: until Ctrl-C)")
+    log.add_argument("--meta", type=_parse_meta, action="append",
+                     metavar="CLASS=ATTR", help="metadata to submit at the first ticks; may be repeated")
+    log.add_argument("--quiet", action="store_true", help="do not print ticks")
+
+    for p in (create, log):
+        p.add_argument("--source", choices=("simulator", "synthetic", "nmea"),
+                       help="location source (overrides the project's)")
+        p.add_argument("--nmea", metavar="PATH", help="replay an NMEA file")
+        p.add_argument("--rate", type=float, metavar="HZ", help="fix rate")
+    log.set_defaults(func=cmd_log)
+
+    recover = sub.add_parser("recover", help="repair sessions left unfinished by a crash")
+    recover.add_argument("--force", action="store_true",
+                         help="also sessions that look live (e.g. logged from another host)")
+    recover.set_defaults(func=cmd_recover)
+
+    routes = sub.add_parser("routes", help="list a project's routes")
+    routes.add_argument("project")
+    routes.add_argument("--sort", choices=SORT_COLUMNS, default="start_ts")
+    routes.add_argument("--ascending", action="store_true")
+    routes.set_defaults(func=cmd_routes)
+
+    near = sub.add_parser("near", help="find routes that passed within a distance of a point")
+    near.add_argument("project")
+    near.add_argument("lat", type=float)
+    near.add_argument("lon", type=float)
+    near.add_argument("--radius", type=float, default=100.0, help="metres (default: 100)")
+    near.set_defaults(func=cmd_near)
+
+    area = sub.add_parser("area", help="find routes that passed through a bounding box")
+    area.add_argument("project")
+    area.add_argument("south", type=float)
+    area.add_argument("west", type=float)
+    area.add_argument("north", type=float)
+    area.add_argument("east", type=float)
+    area.set_defaults(func=cmd_area)
+
+    for p in (near, area):
+        p.add_argument("--start", type=float, help="only fixes at or after this Unix time")
+        p.add_argument("--end", type=float, help="only fixes at or before this Unix time")
+        p.add_argument("--json", action="store_true")
+
+    tags = sub.add_parser("tags", help="list a project's tags, or find ticks matching a tag query")
+    tags.add_argument("project")
+    tags.add_argument("query", nargs="?",
+                      help='e.g. "Weather=Rainy AND (Traffic=Heavy OR Traffic=Moderate)"')
+    tags.add_argument("--json", action="store_true")
+    tags.set_defaults(func=cmd_tags)
+
+    summary = sub.add_parser("summary", help="analyze a route file or session")
+    summary.add_argument("route", help="route file path or session name")
+    summary.add_argument("--json", action="store_true")
+    summary.set_defaults(func=cmd_summary)
+
+    export = sub.add_parser("export", help="write a route or whole session as JSONL, GPX, GeoJSON or CSV")
+    export.add_argument("route", help="route file path or session name")
+    export.add_argument("dst", help="output file; the format follows its extension (default: JSONL)")
+    export.set_defaults(func=cmd_export)
+
+    bulk = sub.add_parser("bulk-export", help="export many routes in parallel, one file per route")
+    bulk.add_argument("project")
+    bulk.add_argument("out_dir")
+    bulk.add_argument("--format", choices=("gpx", "geojson", "csv"), default="gpx")
+    bulk.add_argument("--route", action="append",
+                      help="route file path or session name; may be repeated (default: every route)")
+    bulk.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    bulk.add_argument("--quiet", action="store_true", help="only report failures")
+    bulk.set_defaults(func=cmd_bulk_export)
+
+    timeline = sub.add_parser("timeline", help="merge a project's routes into one time-ordered stream")
+    timeline.add_argument("project")
+    timeline.add_argument("dst", nargs="?", help="JSONL output file (default: stdout)")
+    timeline.add_argument("--start", type=float, help="only fixes at or after this Unix time")
+    timeline.add_argument("--end", type=float, help="only fixes at or before this Unix time")
+    timeline.add_argument("--summary", action="store_true", help="analyze the timeline instead of writing it")
+    timeline.add_argument("--json", action="store_true", help="with --summary, print JSON")
+    timeline.set_defaults(func=cmd_timeline)
+
+    align = sub.add_parser("align", help="re-attach a route's metadata to the fixes nearest its submission")
+    align.add_argument("route", help="route file path or session name")
+    align.add_argument("--mode", choices=("nearest", "interpolate"), default="nearest")
+    align.add_argument("--dry-run", action="store_true", help="report offsets without rewriting")
+    align.set_defaults(func=cmd_align)
+
+    generate = sub.add_parser("generate", help="create a project with synthetic routes")
+    generate.add_argument("project")
+    generate.add_argument("--routes", type=int, default=3)
+    generate.add_argument("--points", type=int, default=10000, help="fixes per route")
+    generate.add_argument("--classes", type=int, default=3, help="taxonomy classes")
+    generate.add_argument("--attributes", type=int, help="attributes per class (default: varies)")
+    generate.add_argument("--tag-density", type=float, default=0.01, help="tag records per fix")
+    generate.add_argument("--shape", choices=("walk", "road"), default="road")
+    generate.add_argument("--rate", type=float, default=1.0, metavar="HZ", help="fix rate")
+    generate.add_argument("--format", choices=("jsonl", "binary"), default="jsonl")
+    generate.add_argument("--seed", type=int)
+    generate.set_defaults(func=cmd_generate)
+
+    bench = sub.add_parser("bench", help="benchmark logging and reading on synthetic data")
+    bench.add_argument("--only", action="append", metavar="NAME",
+                       help="run only this benchmark; may be repeated")
+    bench.add_argument("--points", type=int, default=100000, help="fixes in the benchmark route")
+    bench.add_argument("--projects", type=int, default=200, help="project files to load")
+    bench.add_argument("--shape", choices=("walk", "road"), default="road")
+    bench.add_argument("--seed", type=int, default=0)
+    bench.add_argument("--out", metavar="JSON", help="save the results")
+    bench.add_argument("--compare", metavar="JSON", help="flag regressions against saved results")
+    bench.add_argument("--threshold", type=float, default=0.10, help="regression tolerance (default: 0.10)")
+    bench.add_argument("--workdir", help="keep the generated data here (default: a temp directory)")
+    bench.add_argument("--in-process", action="store_true",
+                       help="run every benchmark in this process (peak memory is then cumulative)")
+    bench.set_defaults(func=cmd_bench)
+
+    convert = sub.add_parser("convert", help="convert one route between JSONL and binary")
+    convert.add_argument("src")
+    convert.add_argument("dst")
+    convert.set_defaults(func=cmd_convert)
+
+    migrate = sub.add_parser("migrate", help="convert all JSONL routes to the binary format")
+    migrate.add_argument("--remove", action="store_true", help="delete JSONL files once converted")
+    migrate.set_defaults(func=cmd_migrate)
+
+    archive = sub.add_parser("archive", help="downsample a project's old routes into compact archives")
+    archive.add_argument("project")
+    archive.add_argument("--older-than", type=float, default=30.0, metavar="DAYS",
+                         help="archive sessions that ended this many days ago (default: 30)")
+    archive.add_argument("--mode", choices=("bucket", "simplify"), default="bucket",
+                         help="keep one fix per time bucket, or simplify the track within a tolerance")
+    archive.add_argument("--bucket", type=float, default=10.0, metavar="SECONDS",
+                         help="bucket size for --mode bucket (default: 10)")
+    archive.add_argument("--tolerance", type=float, default=5.0, metavar="METRES",
+                         help="maximum deviation for --mode simplify (default: 5)")
+    archive.set_defaults(func=cmd_archive)
+
+    retag = sub.add_parser("retag", help="rename, merge or drop taxonomy classes and attributes across routes")
+    retag.add_argument("project")
+    retag.add_argument("--rename-class", type=_rename_arg, action="append", metavar="OLD=NEW",
+                       help="rename a class (several onto one NEW merges them); may be repeated")
+    retag.add_argument("--rename", type=_rename_arg, action="append", metavar="CLASS:OLD=NEW",
+                       help="rename an attribute (several onto one NEW merges them); may be repeated")
+    retag.add_argument("--drop-class", action="append", metavar="CLASS", help="remove a class from every route")
+    retag.add_argument("--drop", type=_class_attr, action="append", metavar="CLASS:ATTR",
+                       help="remove an attribute from every route")
+    retag.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    retag.set_defaults(func=cmd_retag)
+
+    ingest = sub.add_parser("ingest", help="log routes streamed by many devices over TCP, UDP or a Unix socket")
+    ingest.add_argument("--tcp", type=_host_port, metavar="HOST:PORT")
+    ingest.add_argument("--udp", type=_host_port, metavar="HOST:PORT")
+    ingest.add_argument("--unix", metavar="PATH", help="Unix socket path")
+    ingest.add_argument("--project", help="project of messages that do not name one")
+    ingest.add_argument("--flush-interval", type=float, default=1.0, help="seconds between writes (default: 1)")
+    ingest.add_argument("--idle-timeout", type=float, default=300.0,
+                        help="close a device's route after this many silent seconds (default: 300)")
+    ingest.add_argument("--high-water", type=int, default=200000,
+                        help="buffered records at which senders are paused (default: 200000)")
+    ingest.add_argument("--duration", type=float, help="stop after this many seconds (default: until Ctrl-C)")
+    ingest.add_argument("--status-interval", type=float, default=10.0, help="seconds between status lines")
+    ingest.set_defaults(func=cmd_ingest)
+
+    fleet = sub.add_parser("fleet-sim", help="simulate many devices streaming to an ingest server")
+    fleet.add_argument("address", help="tcp://HOST:PORT, udp://HOST:PORT or unix://PATH")
+    fleet.add_argument("--devices", type=int, default=1000)
+    fleet.add_argument("--rate", type=float, default=1.0, metavar="HZ", help="fixes per device per second")
+    fleet.add_argument("--duration", type=float, default=60.0, help="seconds (default: 60)")
+    fleet.add_argument("--project", help="project to name in messages (default: the server's)")
+    fleet.add_argument("--meta-rate", type=float, default=0.0,
+                       help="chance a fix is followed by metadata from the taxonomy of --project")
+    fleet.add_argument("--connections", type=int, help="stream connections (default: one per 250 devices)")
+    fleet.add_argument("--seed", type=int)
+    fleet.set_defaults(func=cmd_fleet_sim)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
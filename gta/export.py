@@ -0,0 +1,195 @@
+import os
+import csv
+import json
+import time
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import as_completed
+from xml.sax.saxutils import escape, quoteattr
+
+from .route_segments import session_name, strip_compression
+from .timeline import Timeline, iter_route_records
+from .worker_pool import cancellable_pool, worker_cancel_event
+
+FORMATS = {"gpx": ".gpx", "geojson": ".geojson", "csv": ".csv"}
+CANCEL_CHECK = 4096
+
+ExportResult = namedtuple("ExportResult", ["name", "dst", "count", "error"])
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def route_name(route):
+    """Output name of a route file, a list of session segments or a ``Timeline``."""
+    if isinstance(route, Timeline):
+        return route.title.replace(" ", "_")
+    first = route if isinstance(route, str) else route[0]
+    name = session_name(first)
+    if name is None:
+        name = os.path.splitext(strip_compression(os.path.basename(first)))[0]
+    return name
+
+
+def _iso_time(ts):
+    seconds, millis = divmod(round(ts * 1000), 1000)
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+    return f"{stamp}.{millis:03d}Z" if millis else f"{stamp}Z"
+
+
+def _write_gpx(records, out, name, taxonomy):
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<gpx version="1.1" creator="GTA" xmlns="http://www.topografix.com/GPX/1/1"'
+              ' xmlns:gta="https://github.com/avgCoderr/gts-tracker-application">\n'
+              f'<trk><name>{escape(name)}</name><trkseg>\n')
+    count = 0
+    for rec in records:
+        lat, lon = rec.get("latitude"), rec.get("longitude")
+        if lat is None or lon is None:
+            continue
+        out.write(f'<trkpt lat="{lat}" lon="{lon}"><time>{_iso_time(rec["tick_timestamp"])}</time>')
+        meta = rec.get("meta_data")
+        if meta:
+            tags = "".join(
+                f"<gta:tag class={quoteattr(str(k))}>{escape(str(v))}</gta:tag>" for k, v in meta.items()
+            )
+            out.write(f"<extensions>{tags}</extensions>")
+        out.write("</trkpt>\n")
+        count += 1
+    out.write("</trkseg></trk>\n</gpx>\n")
+    return count
+
+
+def _write_geojson(records, out, name, taxonomy):
+    # One Point feature per record, so each keeps its own time and tags
+    out.write('{"type": "FeatureCollection", "name": %s, "features": [\n' % json.dumps(name))
+    count = 0
+    for rec in records:
+        lat, lon = rec.get("latitude"), rec.get("longitude")
+        if lat is None or lon is None:
+            continue
+        properties = {"tick_timestamp": rec["tick_timestamp"], "time": _iso_time(rec["tick_timestamp"])}
+        properties.update(rec.get("meta_data") or {})
+        if count:
+            out.write(",\n")
+        out.write(json.dumps({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": properties,
+        }))
+        count += 1
+    out.write("\n]}\n")
+    return count
+
+
+def _write_csv(records, out, name, taxonomy):
+    # Taxonomy classes get a column each; without a taxonomy the tags stay one JSON column
+    classes = [entry["className"] for entry in taxonomy or []]
+    writer = csv.writer(out)
+    writer.writerow(["tick_timestamp", "time", "latitude", "longitude"] + (classes or ["meta_data"]))
+    count = 0
+    for rec in records:
+        meta = rec.get("meta_data") or {}
+        tags = [meta.get(c, "") for c in classes] if classes else [json.dumps(meta) if meta else ""]
+        writer.writerow([rec["tick_timestamp"], _iso_time(rec["tick_timestamp"]),
+                         rec.get("latitude"), rec.get("longitude")] + tags)
+        count += 1
+    return count
+
+
+WRITERS = {"gpx": _write_gpx, "geojson": _write_geojson, "csv": _write_csv}
+
+
+def _checked(records, cancel_event):
+    for i, rec in enumerate(records):
+        if cancel_event is not None and i % CANCEL_CHECK == 0 and cancel_event.is_set():
+            raise ExportCancelled()
+        yield rec
+
+
+def export_route(route, dst, fmt, taxonomy=None, cancel_event=None):
+    """Streams one route (file, session segments or ``Timeline``) to ``dst``; returns the record count.
+
+    Fixes and tag records are both written, and both counted. The output is
+    written next to ``dst`` and renamed into place when complete.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    tmp = dst + ".part"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="", buffering=1024 * 1024) as out:
+            count = WRITERS[fmt](_checked(iter_route_records(route), cancel_event), out,
+                                 route_name(route), taxonomy)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return count
+
+
+def _export_job(route, dst, fmt, taxonomy):
+    try:
+        return export_route(route, dst, fmt, taxonomy, worker_cancel_event()), None
+    except ExportCancelled:
+        return 0, "cancelled"
+    except Exception as e:
+        # Any failure is this route's alone; the other routes carry on
+        return 0, str(e) if isinstance(e, (OSError, ValueError)) else f"{type(e).__name__}: {e}"
+
+
+class BulkExporter:
+    """Exports many routes to one format in parallel, one output file per route.
+
+    Each route is streamed by its own worker process, so throughput grows
+    with the number of cores while memory stays flat. ``run`` yields an
+    ``ExportResult`` as each file finishes; ``cancel`` may be called from
+    another thread and stops the workers at their next check.
+    """
+
+    def __init__(self, routes, out_dir, fmt, taxonomy=None, workers=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        self.routes = list(routes)
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.taxonomy = taxonomy
+        self.workers = workers or os.cpu_count() or 1
+        self._cancel_event = multiprocessing.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _destinations(self):
+        seen = {}
+        for route in self.routes:
+            name = route_name(route)
+            n = seen.get(name, 0)
+            seen[name] = n + 1
+            if n:
+                name = f"{name}_{n}"
+            yield route, name, os.path.join(self.out_dir, name + FORMATS[self.fmt])
+
+    def run(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        jobs = list(self._destinations())
+        workers = min(self.workers, len(jobs)) or 1
+        with cancellable_pool(workers, self._cancel_event) as pool:
+            futures = {
+                pool.submit(_export_job, route, dst, self.fmt, self.taxonomy): (name, dst)
+                for route, name, dst in jobs
+            }
+            try:
+                for future in as_completed(futures):
+                    name, dst = futures[future]
+                    count, error = future.result()
+                    yield ExportResult(name, None if error else dst, count, error)
+            finally:
+                # Jobs that have not started yet are dropped; running ones see the event
+                for future in futures:
+                    future.cancel()
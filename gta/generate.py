@@ -0,0 +1,180 @@
+import os
+import math
+import time
+
+import numpy as np
+
+from .location import DEFAULT_ORIGIN, EARTH_RADIUS_M
+from .live_meta import MetaEventLog, events_path, tag_record
+from .projects import ProjectStore
+from .records import RouteRecord
+from .route_catalog import RouteCatalog
+from .route_writer import open_sink
+
+SHAPES = ("walk", "road")
+CHUNK_POINTS = 65536
+
+_CLASS_POOL = [
+    ("Weather", ["Sunny", "Cloudy", "Rainy", "Foggy", "Snowy"]),
+    ("Traffic", ["Light", "Moderate", "Heavy", "Jammed"]),
+    ("Road", ["Highway", "Arterial", "Residential", "Unpaved"]),
+    ("Lighting", ["Day", "Dusk", "Night"]),
+    ("Surface", ["Dry", "Wet", "Icy"]),
+    ("Zone", ["Urban", "Suburban", "Rural"]),
+]
+
+
+def make_taxonomy(classes=3, attributes=None):
+    """A taxonomy of ``classes`` classes, named like real ones while the pool lasts.
+
+    ``attributes`` fixes the number of attributes per class.
+    """
+    taxonomy = []
+    for i in range(classes):
+        if i < len(_CLASS_POOL):
+            name, attrs = _CLASS_POOL[i]
+        else:
+            name, attrs = f"Class{i + 1}", [f"Value{j + 1}" for j in range(4)]
+        if attributes is not None:
+            attrs = (attrs + [f"{name}{j + 1}" for j in range(len(attrs), attributes)])[:attributes]
+        taxonomy.append({"className": name, "attributes": list(attrs)})
+    return taxonomy
+
+
+def generate_track(points, shape="walk", rate_hz=1.0, start_ts=None, origin=DEFAULT_ORIGIN,
+                   seed=None, chunk_size=CHUNK_POINTS):
+    """Yields ``(ts, lat, lon)`` arrays of up to ``chunk_size`` fixes, ``points`` in all.
+
+    ``walk`` is a vehicle with smoothly drifting heading and speed, like the
+    synthetic location source. ``road`` drives straight legs along a street
+    grid, turning at intersections and sometimes stopping there. Both get a
+    few metres of GPS noise and timing jitter.
+    """
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown track shape: {shape}")
+    rng = np.random.default_rng(seed)
+    ts0 = time.time() - points / rate_hz if start_ts is None else start_ts
+    lat, lon = origin
+    heading = rng.uniform(0.0, 2 * math.pi)
+    speed = 12.0
+    leg_left = 0.0  # road: metres to the next intersection
+    dt = 1.0 / rate_hz
+    done = 0
+    while done < points:
+        n = min(chunk_size, points - done)
+        ts = ts0 + (done + np.arange(n)) * dt + rng.normal(0.0, dt * 0.02, n)
+        speeds = np.clip(speed + np.cumsum(rng.normal(0.0, 0.3, n)), 0.0, 35.0 if shape == "walk" else 17.0)
+        if shape == "walk":
+            headings = heading + np.cumsum(rng.normal(0.0, 0.05, n))
+        else:
+            # Stops at lights: runs of zero speed starting at random fixes
+            starts = np.flatnonzero(rng.random(n) < 0.002 / rate_hz)
+            stopped = np.zeros(n + 1, np.int64)
+            np.add.at(stopped, starts, 1)
+            waits = rng.integers(int(10 * rate_hz) + 1, int(120 * rate_hz) + 2, len(starts))
+            np.add.at(stopped, np.minimum(starts + waits, n), -1)
+            speeds[np.cumsum(stopped[:n]) > 0] = 0.0
+            # Straight legs between intersections, where the track carries on or turns
+            dist = np.cumsum(speeds * dt)
+            legs = leg_left + np.concatenate(([0.0], np.cumsum(rng.uniform(80.0, 400.0, int(dist[-1] / 80.0) + 2))))
+            leg = np.searchsorted(legs, dist, side="right")
+            turns = rng.choice([0.0, math.pi / 2, -math.pi / 2], len(legs), p=[0.5, 0.25, 0.25])
+            turns[0] = 0.0
+            headings = heading + np.cumsum(turns)[leg]
+            leg_left = float(legs[leg[-1]] - dist[-1]) if leg[-1] < len(legs) else 0.0
+        heading = float(headings[-1])
+        speed = float(speeds[-1])
+
+        step = speeds * dt
+        north = np.cumsum(step * np.cos(headings)) / EARTH_RADIUS_M
+        east = np.cumsum(step * np.sin(headings)) / (EARTH_RADIUS_M * math.cos(math.radians(lat)))
+        lats = lat + np.degrees(north)
+        lons = lon + np.degrees(east)
+        lat, lon = float(lats[-1]), float(lons[-1])
+        noise = rng.normal(0.0, 3.0 / EARTH_RADIUS_M, (2, n))
+        yield np.round(ts, 3), lats + np.degrees(noise[0]), lons + np.degrees(noise[1])
+        done += n
+
+
+def generate_records(points, taxonomy=None, tag_density=0.01, seed=None, **track):
+    """Yields lists of route records: the fixes of ``generate_track`` plus tag records.
+
+    About ``tag_density`` of the fixes are followed by a tag record, as
+    ``RouteSession`` writes them, each setting one to all of the taxonomy's
+    classes. ``track`` is passed on to ``generate_track``.
+    """
+    rng = np.random.default_rng(None if seed is None else seed + 1)
+    classes = [(entry["className"], entry["attributes"]) for entry in taxonomy or []]
+    for ts, lat, lon in generate_track(points, seed=seed, **track):
+        tagged = rng.random(len(ts)) < tag_density if classes else np.zeros(len(ts), bool)
+        batch = []
+        for i, (t, la, lo) in enumerate(zip(ts.tolist(), lat.tolist(), lon.tolist())):
+            batch.append(RouteRecord(t, la, lo))
+            if tagged[i]:
+                picked = rng.permutation(len(classes))[:rng.integers(1, len(classes) + 1)]
+                meta = {classes[k][0]: classes[k][1][rng.integers(len(classes[k][1]))] for k in sorted(picked)}
+                batch.append(tag_record(t, la, lo, round(t - float(rng.uniform(0.0, 0.5)), 3), meta))
+        yield batch
+
+
+def generate_route(path, points, taxonomy=None, tag_density=0.01, project_name=None, seed=None,
+                   events=True, **track):
+    """Writes a synthetic route of ``points`` fixes to ``path`` (JSONL or ``.rbin``); returns the record count.
+
+    With ``events`` the tags are also written to the session's side-channel
+    file, as a logging session would.
+    """
+    sink = open_sink(path, taxonomy, project_name)
+    log = MetaEventLog(events_path(path)) if events and taxonomy else None
+    count = 0
+    try:
+        for batch in generate_records(points, taxonomy, tag_density, seed, **track):
+            sink.write(batch)
+            count += len(batch)
+            if log is not None:
+                for rec in batch:
+                    if rec.is_tag:
+                        log.append(rec["meta_submitted_at"], rec["meta_data"])
+    finally:
+        sink.close()
+        if log is not None:
+            log.close()
+    return count
+
+
+def generate_project(data_dir, name, routes=3, points=10000, classes=3, attributes=None,
+                     tag_density=0.01, shape="walk", rate_hz=1.0, route_format="jsonl",
+                     frequency=5, seed=None, catalog=True):
+    """Creates a project and ``routes`` synthetic routes under ``data_dir`` (an ``app_data`` layout).
+
+    Routes follow one another in time, each ``points`` fixes long, and are
+    added to the route catalog. Returns ``(project_path, route_paths)``.
+    """
+    taxonomy = make_taxonomy(classes, attributes)
+    data = {"projectName": name, "gpsFrequency": frequency, "taxonomy": taxonomy}
+    if route_format == "binary":
+        data["routeFormat"] = "binary"
+    project_path = ProjectStore(os.path.join(data_dir, "projects")).save(data)
+
+    route_dir = os.path.join(data_dir, "routes")
+    os.makedirs(route_dir, exist_ok=True)
+    ext = ".rbin" if route_format == "binary" else ".jsonl"
+    duration = points / rate_hz
+    start = int(time.time() - routes * (duration + 3600))
+    paths = []
+    for i in range(routes):
+        start_ts = start + int(i * (duration + 3600))
+        path = os.path.join(route_dir, f"route_{name}_{start_ts}{ext}")
+        generate_route(path, points, taxonomy, tag_density, name,
+                       seed=None if seed is None else seed + 2 * i,
+                       shape=shape, rate_hz=rate_hz, start_ts=start_ts)
+        paths.append(path)
+
+    if catalog:
+        db = RouteCatalog(os.path.join(data_dir, "routes.db"), route_dir)
+        try:
+            for path in paths:
+                db.update_route(path)
+        finally:
+            db.close()
+    return project_path, paths
@@ -0,0 +1,411 @@
+import os
+import re
+import time
+import asyncio
+import socket
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .live_meta import LiveMetaAligner, events_path
+from .projects import ProjectStore
+from .records import RouteRecord, dumps, loads
+from .route_catalog import RouteStats
+from .route_writer import open_sink
+from .tick_metrics import Histogram
+
+FLUSH_INTERVAL = 1.0
+FLUSH_RECORDS = 20000
+HIGH_WATER = 200000
+IDLE_TIMEOUT = 300.0
+MAX_OPEN_FILES = 512
+MAX_LINE = 64 * 1024
+READ_CHUNK = 256 * 1024
+STOP_GRACE = 2.0
+
+_DEVICE_CHARS_RE = re.compile(r"[^A-Za-z0-9._-]")
+
+
+def clean_device_id(value):
+    """A device id safe for file names, or ``None`` if nothing usable is left."""
+    if value is None:
+        return None
+    device = _DEVICE_CHARS_RE.sub("-", str(value))[:64].strip(".")
+    return device or None
+
+
+def device_route_path(route_dir, project, device, ts, ext=".jsonl"):
+    """``route_<project>@<device>_<ts><ext>``, moved to a later ``ts`` if that file exists."""
+    ts = int(ts)
+    while True:
+        path = os.path.join(route_dir, f"route_{project}@{device}_{ts}{ext}")
+        if not os.path.exists(path):
+            return path
+        ts += 1
+
+
+class DeviceRoute:
+    """One device's route while the server is logging it.
+
+    ``buffer`` and ``events`` are filled on the event loop and handed to the
+    I/O thread at each flush; ``sink`` and ``stats`` belong to the I/O thread.
+    """
+
+    def __init__(self, project, device, path, project_data):
+        self.project = project
+        self.device = device
+        self.path = path
+        self.taxonomy = project_data.get("taxonomy", [])
+        self.binary = path.endswith(".rbin")
+        self.aligner = LiveMetaAligner(project_data.get("metaAlignment", "nearest"))
+        self.buffer = []
+        self.events = []
+        self.last_seen = time.monotonic()
+        self.sink = None
+        self.stats = RouteStats()
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        self.server._receive_datagram(data)
+
+
+class IngestServer:
+    """Logs the routes of many devices that stream positions and metadata to it.
+
+    Devices send newline-delimited JSON over TCP, a Unix socket or UDP (one
+    or more lines per datagram)::
+
+        {"device": "truck-17", "project": "Fleet", "ts": 1753137889.5, "lat": 28.64, "lon": 77.21}
+        {"device": "truck-17", "project": "Fleet", "ts": 1753137890.1, "meta": {"Weather": "Rainy"}}
+
+    ``project`` may be left out when the server has a ``default_project``,
+    and ``ts`` defaults to the time of arrival. A device's first message
+    starts its route, ``route_<project>@<device>_<ts>`` in ``route_dir`` and
+    in the project's route format. Metadata is aligned onto the device's
+    fixes as in a logging session and kept in the route's events file.
+    Routes that hear nothing for ``idle_timeout`` seconds are closed and
+    cataloged; the device's next message starts a new one.
+
+    Records are buffered per device and written by a single I/O thread every
+    ``flush_interval`` seconds, or sooner once ``flush_records`` are waiting,
+    keeping at most ``max_open_files`` route files open. While more than
+    ``high_water`` records wait, stream connections are not read, so TCP
+    pushes back on the senders, and datagrams are dropped (``stats["dropped"]``).
+    """
+
+    def __init__(self, project_dir, route_dir, default_project=None, flush_interval=FLUSH_INTERVAL,
+                 flush_records=FLUSH_RECORDS, high_water=HIGH_WATER, idle_timeout=IDLE_TIMEOUT,
+                 max_open_files=MAX_OPEN_FILES, catalog_factory=None, index_factories=()):
+        self.route_dir = route_dir
+        self.default_project = default_project
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        self.high_water = high_water
+        self.low_water = high_water // 2
+        self.idle_timeout = idle_timeout
+        self.max_open_files = max_open_files
+        self.catalog_factory = catalog_factory
+        self.index_factories = list(index_factories)
+
+        self.store = ProjectStore(project_dir)
+        self.store.load_all()
+        self._projects_synced = time.monotonic()
+        self.routes = {}
+        self.pending = 0
+        self.stats = dict.fromkeys((
+            "connections", "messages", "fixes", "metas", "rejected", "dropped", "paused",
+            "records_written", "routes_started", "routes_closed", "flushes", "write_errors",
+        ), 0)
+        self.flush_ms = Histogram()
+
+        self._servers = []
+        self._transports = []
+        self._streams = {}  # writer -> the task reading its connection
+        self._unix_paths = []
+        self._flusher = None
+        self._flush_wanted = None
+        self._drained = None
+        self._io = None
+        self._open_sinks = OrderedDict()  # I/O thread only
+        self._catalog = None
+        self._indexes = []
+
+    async def start(self, tcp=None, udp=None, unix=None):
+        """Starts listening on any of ``tcp``/``udp`` (``(host, port)``) and ``unix`` (a socket path)."""
+        loop = asyncio.get_running_loop()
+        os.makedirs(self.route_dir, exist_ok=True)
+        self._flush_wanted = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._io = ThreadPoolExecutor(1, thread_name_prefix="IngestWriter")
+        await loop.run_in_executor(self._io, self._open_indexes)
+        if tcp is not None:
+            self._servers.append(await asyncio.start_server(self._handle_stream, tcp[0], tcp[1],
+                                                            limit=MAX_LINE))
+        if unix is not None:
+            if os.path.exists(unix):
+                os.remove(unix)  # left behind by a server that did not stop cleanly
+            self._servers.append(await asyncio.start_unix_server(self._handle_stream, unix, limit=MAX_LINE))
+            self._unix_paths.append(unix)
+        if udp is not None:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _DatagramProtocol(self), local_addr=udp)
+            sock = transport.get_extra_info("socket")
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            except OSError:
+                pass
+            self._transports.append(transport)
+        self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    def addresses(self):
+        """Where the server listens, e.g. to find the port picked for ``("127.0.0.1", 0)``."""
+        addresses = [sock.getsockname() for server in self._servers for sock in server.sockets]
+        addresses.extend(t.get_extra_info("sockname") for t in self._transports)
+        return addresses
+
+    async def stop(self, grace=STOP_GRACE):
+        """Stops listening, writes everything received and closes every route.
+
+        Open connections get ``grace`` seconds to deliver what they already
+        sent before they are cut.
+        """
+        for server in self._servers:
+            server.close()
+        for transport in self._transports:
+            transport.close()
+        if self._streams:
+            await asyncio.wait(list(self._streams.values()), timeout=grace)
+        for writer in list(self._streams):
+            writer.close()
+        for server in self._servers:
+            await server.wait_closed()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self._flush(close_all=True)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._io, self._close_indexes)
+        self._io.shutdown()
+        for path in self._unix_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self._servers, self._transports, self._unix_paths = [], [], []
+
+    # Receiving, on the event loop
+
+    async def _handle_stream(self, reader, writer):
+        self.stats["connections"] += 1
+        self._streams[writer] = asyncio.current_task()
+        rest = b""
+        try:
+            while True:
+                if not self._drained.is_set():
+                    self.stats["paused"] += 1
+                    await self._drained.wait()
+                data = await reader.read(READ_CHUNK)
+                if not data:
+                    break
+                lines = (rest + data).split(b"\n")
+                rest = lines.pop()
+                if len(rest) > MAX_LINE:
+                    self.stats["rejected"] += 1
+                    rest = b""
+                now = time.time()
+                for line in lines:
+                    self._handle_line(line, now)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._streams.pop(writer, None)
+            writer.close()
+
+    def _receive_datagram(self, data):
+        if self.pending > self.high_water:
+            self.stats["dropped"] += 1
+            return
+        now = time.time()
+        for line in data.split(b"\n"):
+            self._handle_line(line, now)
+
+    def _handle_line(self, line, now):
+        if not line.strip():
+            return
+        try:
+            msg = loads(line)
+        except ValueError:
+            self.stats["rejected"] += 1
+            return
+        if not isinstance(msg, dict) or not self.handle_message(msg, now):
+            self.stats["rejected"] += 1
+
+    def _project(self, name):
+        data = self.store.get(self.store.path_for(name))
+        if data is None and time.monotonic() - self._projects_synced > 5.0:
+            # Projects created since the server started
+            self.store.sync_dir()
+            self._projects_synced = time.monotonic()
+            data = self.store.get(self.store.path_for(name))
+        return data
+
+    def handle_message(self, msg, now=None):
+        """Buffers one message; returns False if it was not usable."""
+        now = time.time() if now is None else now
+        device = clean_device_id(msg.get("device"))
+        project = msg.get("project") or self.default_project
+        if device is None or not isinstance(project, str):
+            return False
+        ts = msg.get("ts", now)
+        lat, lon, meta = msg.get("lat"), msg.get("lon"), msg.get("meta")
+        if not isinstance(ts, (int, float)):
+            return False
+        has_fix = isinstance(lat, (int, float)) and isinstance(lon, (int, float))
+        if not has_fix and not (isinstance(meta, dict) and meta):
+            return False
+
+        route = self.routes.get((project, device))
+        if route is None:
+            data = self._project(project)
+            if data is None:
+                return False
+            ext = ".rbin" if data.get("routeFormat") == "binary" else ".jsonl"
+            path = device_route_path(self.route_dir, project, device, ts, ext)
+            route = self.routes[(project, device)] = DeviceRoute(project, device, path, data)
+            self.stats["routes_started"] += 1
+        route.last_seen = time.monotonic()
+        self.stats["messages"] += 1
+
+        added = 0
+        if isinstance(meta, dict) and meta:
+            route.events.append((ts, meta))
+            route.aligner.submit(ts, meta)
+            self.stats["metas"] += 1
+        if has_fix:
+            tags = route.aligner.on_fix(ts, lat, lon)
+            route.buffer.extend(tags)  # they lie at or before the fix, so they go first
+            route.buffer.append(RouteRecord(ts, lat, lon))
+            added = 1 + len(tags)
+            self.stats["fixes"] += 1
+
+        self.pending += added
+        if self.pending >= self.flush_records:
+            self._flush_wanted.set()
+        if self.pending > self.high_water and self._drained.is_set():
+            self._drained.clear()
+        return True
+
+    # Flushing
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wanted.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wanted.clear()
+            await self._flush()
+
+    async def _flush(self, close_all=False):
+        now, mono = time.time(), time.monotonic()
+        closing = []
+        for key, route in list(self.routes.items()):
+            if close_all or mono - route.last_seen > self.idle_timeout:
+                del self.routes[key]
+                route.buffer.extend(route.aligner.expire(float("inf")))
+                closing.append(route)
+            elif len(route.aligner):
+                route.buffer.extend(route.aligner.expire(now))
+
+        batch = []
+        count = 0
+        for route in list(self.routes.values()) + closing:
+            if route.buffer or route.events:
+                batch.append((route, route.buffer, route.events))
+                count += len(route.buffer)
+                route.buffer, route.events = [], []
+        if not batch and not closing:
+            return
+
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._io, self._write, batch, closing)
+        finally:
+            self.flush_ms.record((time.perf_counter() - started) * 1000.0)
+            self.stats["flushes"] += 1
+            self.pending = max(0, self.pending - count)
+            if self.pending <= self.low_water:
+                self._drained.set()
+
+    # Writing, on the I/O thread
+
+    def _open_indexes(self):
+        self._catalog = self.catalog_factory() if self.catalog_factory is not None else None
+        self._indexes = [factory() for factory in self.index_factories]
+
+    def _close_indexes(self):
+        if self._catalog is not None:
+            self._catalog.close()
+        for index in self._indexes:
+            index.close()
+
+    def _sink(self, route):
+        if route.sink is not None:
+            self._open_sinks.move_to_end(route.path)
+            return route.sink
+        route.sink = open_sink(route.path, route.taxonomy, route.project)
+        self._open_sinks[route.path] = route
+        while len(self._open_sinks) > self.max_open_files:
+            _, evicted = self._open_sinks.popitem(last=False)
+            evicted.sink.close()
+            evicted.sink = None
+        return route.sink
+
+    def _write(self, batch, closing):
+        for route, records, events in batch:
+            try:
+                if records:
+                    self._sink(route).write(records)
+                    for rec in records:
+                        route.stats.add(rec)
+                    self.stats["records_written"] += len(records)
+                if events:
+                    with open(events_path(route.path), "ab") as f:
+                        f.writelines(dumps({"submitted_at": ts, "meta_data": meta}) + b"\n"
+                                     for ts, meta in events)
+            except OSError:
+                self.stats["write_errors"] += 1
+        for route, _, _ in batch:
+            # Binary routes reach the disk a block at a time instead of leaving a tiny block per flush
+            if route.sink is not None and not route.binary:
+                route.sink.flush()
+        for route in closing:
+            self._close_route(route)
+
+    def _close_route(self, route):
+        if route.sink is not None:
+            self._open_sinks.pop(route.path, None)
+            route.sink.close()
+            route.sink = None
+        self.stats["routes_closed"] += 1
+        if not os.path.exists(route.path):
+            return  # metadata only, no fixes
+        route.stats.byte_size = os.path.getsize(route.path)
+        try:
+            if self._catalog is not None:
+                self._catalog.update_route(route.path, appended=route.stats)
+            for index in self._indexes:
+                index.update_route(route.path)
+        except (OSError, ValueError):
+            self.stats["write_errors"] += 1
+
+    def status(self):
+        s = self.stats
+        return (f"{len(self.routes)} devices, {len(self._streams)} connections, {s['messages']} messages, "
+                f"{s['records_written']} written, {self.pending} pending, {s['rejected']} rejected, "
+                f"{s['dropped']} dropped, flush p99 {self.flush_ms.percentile(99) or 0:.1f} ms")
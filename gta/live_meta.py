@@ -0,0 +1,99 @@
+import threading
+from collections import deque
+
+from .records import RouteRecord, dumps
+from .route_segments import EVENTS_SUFFIX, sidecar_path
+
+ALIGN_MODES = ("nearest", "interpolate")
+MAX_FIX_WAIT = 5.0
+
+
+def events_path(route_file):
+    """Side-channel file of a session's metadata submissions: ``route_P_123.events.jsonl``."""
+    return sidecar_path(route_file, EVENTS_SUFFIX)
+
+
+def tag_record(ts, lat, lon, submitted_at, meta_data):
+    return RouteRecord(ts, lat, lon, meta_data, submitted_at)
+
+
+class MetaEventLog:
+    """Append-only log of metadata submissions, written the moment they are made."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "ab")
+        self._lock = threading.Lock()
+
+    def append(self, submitted_at, meta_data):
+        line = dumps({"submitted_at": submitted_at, "meta_data": meta_data}) + b"\n"
+        with self._lock:
+            self._f.write(line)
+            self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class LiveMetaAligner:
+    """Places metadata submissions on the fixes around them while a session runs.
+
+    A submission waits for the first fix at or after its time and is then
+    aligned between that fix and the one before it, like ``meta_events.align_events``.
+    Submissions that see no newer fix within ``max_wait`` seconds go on the
+    latest fix. Every call only touches the submissions it places, so the fix
+    and tick paths cost O(1) per submission however many are pending.
+
+    A tag is never later than the fix that completed it, so callers write
+    the tags ``on_fix`` returns before that fix to keep routes in time order.
+    """
+
+    def __init__(self, mode="nearest", max_wait=MAX_FIX_WAIT):
+        if mode not in ALIGN_MODES:
+            raise ValueError(f"Unknown alignment mode: {mode}")
+        self.mode = mode
+        self.max_wait = max_wait
+        self._pending = deque()
+        self._last_fix = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, submitted_at, meta_data):
+        with self._lock:
+            self._pending.append((submitted_at, meta_data))
+
+    def on_fix(self, ts, lat, lon):
+        """Records a fix; returns the tag records of submissions it completes."""
+        fix = (ts, lat, lon)
+        placed = []
+        with self._lock:
+            while self._pending and self._pending[0][0] <= ts:
+                placed.append(self._place(self._pending.popleft(), self._last_fix, fix))
+            self._last_fix = fix
+        return placed
+
+    def expire(self, now, max_wait=None):
+        """Places submissions older than ``max_wait`` seconds on the latest fix."""
+        cutoff = now - (self.max_wait if max_wait is None else max_wait)
+        placed = []
+        with self._lock:
+            if self._last_fix is None:
+                return placed
+            while self._pending and self._pending[0][0] <= cutoff:
+                placed.append(self._place(self._pending.popleft(), self._last_fix, None))
+        return placed
+
+    def _place(self, event, before, after):
+        submitted_at, meta_data = event
+        if before is None or after is None:
+            ts, lat, lon = before or after
+        elif self.mode == "interpolate" and after[0] > before[0]:
+            f = min(max((submitted_at - before[0]) / (after[0] - before[0]), 0.0), 1.0)
+            ts = submitted_at if before[0] <= submitted_at <= after[0] else before[0] + f * (after[0] - before[0])
+            lat = before[1] + f * (after[1] - before[1])
+            lon = before[2] + f * (after[2] - before[2])
+        else:
+            ts, lat, lon = before if submitted_at - before[0] <= after[0] - submitted_at else after
+        return tag_record(ts, lat, lon, submitted_at, meta_data)
@@ -0,0 +1,151 @@
+import json
+import math
+import time
+import asyncio
+import socket
+
+import numpy as np
+
+from .location import DEFAULT_ORIGIN, EARTH_RADIUS_M
+from .tick_metrics import Histogram
+
+DATAGRAM_BYTES = 8 * 1024
+SLOTS_PER_SECOND = 10
+
+
+def parse_address(address):
+    """``tcp://host:port``, ``udp://host:port`` or ``unix:///path`` -> ``(kind, target)``."""
+    kind, sep, rest = address.partition("://")
+    if not sep or kind not in ("tcp", "udp", "unix"):
+        raise ValueError(f"Expected tcp://HOST:PORT, udp://HOST:PORT or unix://PATH, got '{address}'")
+    if kind == "unix":
+        return kind, rest
+    host, _, port = rest.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Expected HOST:PORT in '{address}'")
+    return kind, (host, int(port))
+
+
+class FleetSimulator:
+    """Simulates a fleet of devices streaming fixes to an ``IngestServer``.
+
+    Every device reports ``rate_hz`` times a second from its own random-walk
+    track, and now and then (``meta_rate`` per report) submits metadata
+    drawn from ``taxonomy``. Devices are spread evenly over the second rather
+    than all reporting at once, and over ``connections`` stream connections
+    (or one UDP socket). Stream writes wait for the server to drain, so
+    ``stats`` shows how far behind schedule backpressure pushed the fleet.
+    """
+
+    def __init__(self, address, devices=1000, rate_hz=1.0, project=None, taxonomy=None, meta_rate=0.0,
+                 connections=None, prefix="sim", origin=DEFAULT_ORIGIN, seed=None):
+        self.kind, self.target = parse_address(address)
+        self.devices = devices
+        self.rate_hz = rate_hz
+        self.meta_rate = meta_rate
+        self.connections = max(1, min(devices, connections or math.ceil(devices / 250)))
+        self.classes = [(entry["className"], entry["attributes"]) for entry in taxonomy or []]
+        self.rng = np.random.default_rng(seed)
+        self.lat = origin[0] + self.rng.normal(0.0, 0.05, devices)
+        self.lon = origin[1] + self.rng.normal(0.0, 0.05, devices)
+        self.heading = self.rng.uniform(0.0, 2 * math.pi, devices)
+        self.speed = self.rng.uniform(0.0, 20.0, devices)
+        project = "" if project is None else f',"project":{json.dumps(project)}'
+        # Everything up to the timestamp is fixed per device
+        self._heads = [f'{{"device":"{prefix}-{i:05d}"{project},"ts":' for i in range(devices)]
+        self.stats = {"sent": 0, "metas": 0, "bytes": 0, "behind_max": 0.0}
+        self.lag_ms = Histogram()
+
+    async def _open(self):
+        loop = asyncio.get_running_loop()
+        if self.kind == "udp":
+            transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol,
+                                                               remote_addr=self.target)
+            return [transport]
+        writers = []
+        for _ in range(self.connections):
+            if self.kind == "tcp":
+                _, writer = await asyncio.open_connection(*self.target)
+                writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            else:
+                _, writer = await asyncio.open_unix_connection(self.target)
+            writers.append(writer)
+        return writers
+
+    def _advance(self, rows, dt):
+        self.heading[rows] += self.rng.normal(0.0, 0.05, len(rows))
+        self.speed[rows] = np.clip(self.speed[rows] + self.rng.normal(0.0, 0.3, len(rows)), 0.0, 35.0)
+        dist = self.speed[rows] * dt
+        self.lat[rows] += np.degrees(dist * np.cos(self.heading[rows]) / EARTH_RADIUS_M)
+        self.lon[rows] += np.degrees(dist * np.sin(self.heading[rows])
+                                     / (EARTH_RADIUS_M * np.cos(np.radians(self.lat[rows]))))
+
+    def _lines(self, rows, now):
+        heads = self._heads
+        ts = f"{now:.3f}"
+        lines = [f'{heads[i]}{ts},"lat":{la:.7f},"lon":{lo:.7f}}}\n'
+                 for i, la, lo in zip(rows.tolist(), self.lat[rows].tolist(), self.lon[rows].tolist())]
+        if self.classes and self.meta_rate:
+            for i in rows[self.rng.random(len(rows)) < self.meta_rate].tolist():
+                name, attrs = self.classes[self.rng.integers(len(self.classes))]
+                meta = json.dumps({name: attrs[self.rng.integers(len(attrs))]})
+                lines.append(f'{heads[i]}{ts},"meta":{meta}}}\n')
+                self.stats["metas"] += 1
+        return lines
+
+    async def _send(self, channel, lines):
+        if self.kind == "udp":
+            chunk, size = [], 0
+            for line in lines:
+                if size + len(line) > DATAGRAM_BYTES and chunk:
+                    channel.sendto("".join(chunk).encode())
+                    chunk, size = [], 0
+                chunk.append(line)
+                size += len(line)
+            if chunk:
+                channel.sendto("".join(chunk).encode())
+        else:
+            channel.write("".join(lines).encode())
+            await channel.drain()
+
+    async def run(self, duration):
+        """Sends for ``duration`` seconds; returns ``stats``."""
+        channels = await self._open()
+        slots = max(1, int(SLOTS_PER_SECOND / self.rate_hz)) if self.rate_hz < SLOTS_PER_SECOND else 1
+        period = 1.0 / self.rate_hz
+        # Device rows per (slot, channel): slot spreads devices over the period, channel over connections
+        rows = np.arange(self.devices)
+        groups = [[rows[(rows % slots == s) & (rows % len(channels) == c)] for c in range(len(channels))]
+                  for s in range(slots)]
+        start = time.monotonic()
+        step = 0
+        try:
+            while True:
+                due = start + step * period / slots
+                now = time.monotonic()
+                if due - start >= duration:
+                    break
+                if due > now:
+                    await asyncio.sleep(due - now)
+                behind = time.monotonic() - due
+                self.lag_ms.record(max(0.0, behind) * 1000.0)
+                self.stats["behind_max"] = max(self.stats["behind_max"], behind)
+                wall = time.time()
+                sends = []
+                for channel, group in zip(channels, groups[step % slots]):
+                    if not len(group):
+                        continue
+                    self._advance(group, period)
+                    lines = self._lines(group, wall)
+                    self.stats["sent"] += len(group)
+                    self.stats["bytes"] += sum(len(line) for line in lines)
+                    sends.append(self._send(channel, lines))
+                await asyncio.gather(*sends)
+                step += 1
+        finally:
+            for channel in channels:
+                channel.close()
+            if self.kind != "udp":
+                await asyncio.gather(*(channel.wait_closed() for channel in channels), return_exceptions=True)
+        self.stats["seconds"] = time.monotonic() - start
+        return self.stats
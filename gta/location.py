@@ -0,0 +1,225 @@
+import math
+import threading
+import time
+from collections import namedtuple
+from random import random, gauss
+
+Fix = namedtuple("Fix", ["timestamp", "latitude", "longitude"])
+
+# Simulated coordinates are centred on Delhi
+DEFAULT_ORIGIN = (28.6448, 77.2167)
+EARTH_RADIUS_M = 6371000.0
+
+
+class LocationProvider:
+    """Base class for location sources.
+
+    A provider produces fixes on its own thread and hands each one to the
+    callback passed to ``start``. Subclasses implement ``next_fix``, which
+    returns a ``Fix`` or ``None`` when the source is exhausted.
+    """
+
+    def __init__(self, rate_hz=1.0):
+        self.rate_hz = rate_hz
+        self._callback = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._latest = None
+
+    def start(self, callback):
+        if self._thread is not None:
+            return
+        self._callback = callback
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.close()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def latest(self):
+        return self._latest
+
+    def next_fix(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _run(self):
+        interval = 1.0 / self.rate_hz if self.rate_hz else 0.0
+        next_at = time.monotonic()
+        while not self._stop_event.is_set():
+            fix = self.next_fix()
+            if fix is None:
+                break
+            self._latest = fix
+            self._callback(fix)
+
+            if interval:
+                next_at += interval
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    self._stop_event.wait(delay)
+                else:
+                    # Fell behind; don't try to catch up with a burst
+                    next_at = time.monotonic()
+
+
+class SimulatedProvider(LocationProvider):
+    def __init__(self, rate_hz=1.0, origin=DEFAULT_ORIGIN):
+        super().__init__(rate_hz)
+        self.origin = origin
+
+    def next_fix(self):
+        lat0, lon0 = self.origin
+        return Fix(round(time.time(), 3), lat0 + random() * 0.001, lon0 + random() * 0.001)
+
+
+class SyntheticProvider(LocationProvider):
+    """Random-walk vehicle track with smooth heading and speed changes."""
+
+    def __init__(self, rate_hz=10.0, origin=DEFAULT_ORIGIN, speed_mps=12.0, heading_deg=None):
+        super().__init__(rate_hz)
+        self.lat, self.lon = origin
+        self.speed = speed_mps
+        self.heading = math.radians(heading_deg if heading_deg is not None else random() * 360.0)
+        self._last_ts = None
+
+    def next_fix(self):
+        now = time.time()
+        dt = 0.0 if self._last_ts is None else now - self._last_ts
+        self._last_ts = now
+
+        self.heading += gauss(0.0, 0.05)
+        self.speed = min(35.0, max(0.0, self.speed + gauss(0.0, 0.3)))
+
+        dist = self.speed * dt
+        self.lat += math.degrees(dist * math.cos(self.heading) / EARTH_RADIUS_M)
+        self.lon += math.degrees(
+            dist * math.sin(self.heading) / (EARTH_RADIUS_M * math.cos(math.radians(self.lat)))
+        )
+        return Fix(round(now, 3), self.lat, self.lon)
+
+
+def nmea_checksum_ok(sentence):
+    if "*" not in sentence:
+        return True
+    body, _, checksum = sentence[1:].partition("*")
+    calc = 0
+    for ch in body:
+        calc ^= ord(ch)
+    try:
+        return calc == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def _nmea_coord(value, hemisphere):
+    if not value:
+        return None
+    dot = value.index(".") if "." in value else len(value)
+    degrees = float(value[:dot - 2])
+    minutes = float(value[dot - 2:])
+    coord = degrees + minutes / 60.0
+    if hemisphere in ("S", "W"):
+        coord = -coord
+    return coord
+
+
+def parse_nmea(sentence):
+    """Parses a GGA or RMC sentence into ``(lat, lon)``, or ``None``."""
+    sentence = sentence.strip()
+    if not sentence.startswith("$") or not nmea_checksum_ok(sentence):
+        return None
+
+    fields = sentence.split("*")[0].split(",")
+    kind = fields[0][-3:]
+    try:
+        if kind == "GGA" and len(fields) > 6 and fields[6] not in ("", "0"):
+            lat = _nmea_coord(fields[2], fields[3])
+            lon = _nmea_coord(fields[4], fields[5])
+        elif kind == "RMC" and len(fields) > 6 and fields[2] == "A":
+            lat = _nmea_coord(fields[3], fields[4])
+            lon = _nmea_coord(fields[5], fields[6])
+        else:
+            return None
+    except ValueError:
+        return None
+
+    if lat is None or lon is None:
+        return None
+    return lat, lon
+
+
+class NmeaProvider(LocationProvider):
+    """Reads NMEA sentences from a file (replay) or a serial/pseudo-terminal.
+
+    When replaying a file, fixes are paced at ``rate_hz``. For devices pass
+    ``rate_hz=None`` so fixes are delivered as fast as the device emits them.
+    With ``loop=True`` a recorded file is replayed from the start when it ends.
+    """
+
+    def __init__(self, path, rate_hz=None, loop=False):
+        super().__init__(rate_hz)
+        self.path = path
+        self.loop = loop
+        self._file = None
+
+    def next_fix(self):
+        if self._file is None:
+            self._file = open(self.path, "r", encoding="ascii", errors="replace")
+
+        while not self._stop_event.is_set():
+            line = self._file.readline()
+            if not line:
+                if not self.loop:
+                    return None
+                self._file.seek(0)
+                continue
+            coords = parse_nmea(line)
+            if coords is not None:
+                return Fix(round(time.time(), 3), coords[0], coords[1])
+        return None
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+PROVIDERS = {
+    "simulator": SimulatedProvider,
+    "synthetic": SyntheticProvider,
+    "nmea": NmeaProvider,
+}
+
+
+def create_provider(config=None):
+    """Builds a provider from a project's ``locationSource`` entry.
+
+    ``config`` looks like ``{"type": "nmea", "path": "drive.nmea", "rateHz": 5}``.
+    Missing config means the built-in simulator at 1 Hz.
+    """
+    config = dict(config or {})
+    kind = config.pop("type", "simulator")
+    if kind not in PROVIDERS:
+        raise ValueError(f"Unknown location source: {kind}")
+
+    kwargs = {}
+    if "rateHz" in config:
+        kwargs["rate_hz"] = config["rateHz"]
+    if kind == "nmea":
+        kwargs["path"] = config["path"]
+        kwargs["loop"] = config.get("loop", False)
+    elif "origin" in config:
+        kwargs["origin"] = tuple(config["origin"])
+    return PROVIDERS[kind](**kwargs)
@@ -0,0 +1,200 @@
+import os
+
+import numpy as np
+
+from .live_meta import ALIGN_MODES, MetaEventLog, events_path, tag_record
+from .records import loads, plain_number
+from .route_segments import compress_file, is_compressed, strip_compression
+from .timeline import iter_route_records
+
+
+def read_meta_events(path):
+    """``(submitted_at, meta_data)`` of every event in a side-channel file, in submission order."""
+    times, metas = [], []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                event = loads(line)
+            except ValueError:
+                continue  # torn last line
+            if isinstance(event, dict) and event.get("meta_data"):
+                times.append(float(event["submitted_at"]))
+                metas.append(event["meta_data"])
+    order = np.argsort(np.array(times, dtype=np.float64), kind="stable")
+    return np.array(times, dtype=np.float64)[order], [metas[i] for i in order]
+
+
+def align_events(fix_ts, fix_lat, fix_lon, event_ts, mode="nearest"):
+    """Places events on a time-sorted fix track; returns ``(ts, lat, lon)`` arrays, one row per event.
+
+    ``nearest`` takes the time and position of the closest fix. ``interpolate``
+    keeps the event's own time and interpolates the position between the
+    fixes around it; events outside the track snap to its ends.
+    """
+    if mode not in ALIGN_MODES:
+        raise ValueError(f"Unknown alignment mode: {mode}")
+    event_ts = np.asarray(event_ts, dtype=np.float64)
+    if not len(fix_ts) or not len(event_ts):
+        empty = np.empty(0)
+        return empty, empty, empty
+    if mode == "interpolate":
+        ts = np.clip(event_ts, fix_ts[0], fix_ts[-1])
+        return ts, np.interp(ts, fix_ts, fix_lat), np.interp(ts, fix_ts, fix_lon)
+
+    right = np.searchsorted(fix_ts, event_ts, side="left")
+    left = np.clip(right - 1, 0, len(fix_ts) - 1)
+    right = np.clip(right, 0, len(fix_ts) - 1)
+    pick = np.where(np.abs(event_ts - fix_ts[left]) <= np.abs(fix_ts[right] - event_ts), left, right)
+    return fix_ts[pick], fix_lat[pick], fix_lon[pick]
+
+
+def _read_track(route, tags_are_fixes):
+    """Fixes and tag records of a route; tag records are the ones carrying ``meta_submitted_at``.
+
+    Tag records written by the old per-tick queue also mark where the route
+    was at that tick, so with ``tags_are_fixes`` they count as fixes too.
+    """
+    fix_ts, fix_lat, fix_lon = [], [], []
+    tag_ts, tag_submitted, tag_meta = [], [], []
+    for rec in iter_route_records(route):
+        is_tag = rec.get("meta_submitted_at") is not None
+        if is_tag:
+            tag_ts.append(rec["tick_timestamp"])
+            tag_submitted.append(rec["meta_submitted_at"])
+            tag_meta.append(rec.get("meta_data") or {})
+        if (not is_tag or tags_are_fixes) and rec.get("latitude") is not None and rec.get("longitude") is not None:
+            fix_ts.append(rec["tick_timestamp"])
+            fix_lat.append(rec["latitude"])
+            fix_lon.append(rec["longitude"])
+    fix_ts = np.array(fix_ts, dtype=np.float64)
+    order = np.argsort(fix_ts, kind="stable")
+    return (
+        fix_ts[order], np.array(fix_lat, dtype=np.float64)[order], np.array(fix_lon, dtype=np.float64)[order],
+        np.array(tag_ts, dtype=np.float64), np.array(tag_submitted, dtype=np.float64), tag_meta,
+    )
+
+
+class Realignment:
+    """Result of ``realign_route``: submission times and the times their tags now carry.
+
+    ``old_ts`` is only known when the submissions were read back from the
+    route's own tag records.
+    """
+
+    def __init__(self, submitted_at, new_ts, old_ts=None):
+        self.submitted_at = submitted_at
+        self.new_ts = new_ts
+        self.old_ts = old_ts
+
+    def __len__(self):
+        return len(self.new_ts)
+
+    def _offset(self, ts):
+        if ts is None or not len(ts):
+            return None
+        return float(np.mean(np.abs(ts - self.submitted_at)))
+
+    @property
+    def old_offset(self):
+        """Mean seconds between a tag and its submission before realigning, if known."""
+        return self._offset(self.old_ts)
+
+    @property
+    def new_offset(self):
+        return self._offset(self.new_ts)
+
+
+def _rewrite(path, records, taxonomy, project_name):
+    from .route_writer import open_sink
+
+    # Same extension as the route, since the sink picks the format from it
+    tmp = os.path.join(os.path.dirname(path), ".realign-" + os.path.basename(strip_compression(path)))
+    sink = open_sink(tmp, taxonomy, project_name)
+    try:
+        batch = []
+        for rec in records:
+            batch.append(rec)
+            if len(batch) >= 4096:
+                sink.write(batch)
+                batch = []
+        if batch:
+            sink.write(batch)
+    finally:
+        sink.close()
+    if is_compressed(path):
+        tmp = compress_file(tmp, "zstd" if path.endswith(".zst") else "gzip")
+    os.replace(tmp, path)
+
+
+def realign_route(route, mode="nearest", events=None, taxonomy=None, project_name=None, dry_run=False,
+                  retag_state_path=os.path.join("app_data", "retag.json")):
+    """Re-attaches a route's metadata to the fixes nearest its submission times.
+
+    ``route`` is a route file or a session's segments. Submissions come from
+    ``events`` (``(submitted_at, meta_data)`` arrays), else the session's
+    side-channel file, else the route's own tag records, which is how routes
+    logged with the old one-tag-per-tick queue are repaired (their tick
+    records stay, without the tags, and a side-channel file is written for
+    them, journaled in ``retag_state_path`` at the route's taxonomy
+    version). Tag records are replaced by freshly aligned ones, merged in
+    time order among the fixes, and each file is rewritten atomically.
+    Returns a ``Realignment``.
+    """
+    paths = [route] if isinstance(route, str) else list(route)
+    if events is None and os.path.exists(events_path(paths[0])):
+        events = read_meta_events(events_path(paths[0]))
+    legacy = events is None
+    fix_ts, fix_lat, fix_lon, tag_ts, tag_submitted, tag_meta = _read_track(paths, legacy)
+    old_ts = None
+    if legacy:
+        order = np.argsort(tag_submitted, kind="stable")
+        events = (tag_submitted[order], [tag_meta[i] for i in order])
+        old_ts = tag_ts[order]
+    submitted_at, metas = events
+    submitted_at = np.asarray(submitted_at, dtype=np.float64)
+    ts, lat, lon = align_events(fix_ts, fix_lat, fix_lon, submitted_at, mode)
+    result = Realignment(submitted_at, ts, old_ts)
+    if dry_run or not len(fix_ts):
+        return result
+    if legacy:
+        from .retag import RetagState
+
+        retag_state = RetagState(retag_state_path)
+        sources = [os.path.basename(path) for path in paths]
+        retag_state.source_version(sources)  # before anything is rewritten
+
+    tags = iter(sorted(
+        (tag_record(plain_number(ts[k]), float(lat[k]), float(lon[k]), plain_number(submitted_at[k]), metas[k])
+         for k in range(len(ts))),
+        key=lambda rec: rec["tick_timestamp"]
+    ))
+    pending = [next(tags, None)]
+
+    def merged(path, last):
+        # Each tag goes in before the first record that is later than it
+        for rec in iter_route_records(path):
+            if rec.get("meta_submitted_at") is not None:
+                if not legacy:
+                    continue
+                rec = dict(rec, meta_data={})
+                del rec["meta_submitted_at"]
+            while pending[0] is not None and pending[0]["tick_timestamp"] < rec["tick_timestamp"]:
+                yield pending[0]
+                pending[0] = next(tags, None)
+            yield rec
+        while last and pending[0] is not None:
+            yield pending[0]
+            pending[0] = next(tags, None)
+
+    for i, path in enumerate(paths):
+        _rewrite(path, merged(path, i == len(paths) - 1), taxonomy, project_name)
+    if legacy:
+        # From now on the route is realigned from the side channel, like a new session
+        log = MetaEventLog(events_path(paths[0]))
+        try:
+            for k in range(len(submitted_at)):
+                log.append(plain_number(submitted_at[k]), metas[k])
+        finally:
+            log.close()
+        retag_state.carry_over(sources, os.path.basename(events_path(paths[0])))
+    return result
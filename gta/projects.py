@@ -0,0 +1,160 @@
+import os
+import json
+import tempfile
+
+PROJECT_DIR = os.path.join("app_data", "projects")
+
+MIN_FREQUENCY = 5
+MAX_FREQUENCY = 20
+
+# Read once at import: os.umask can only be queried by setting it, which is not thread-safe
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+class ProjectError(ValueError):
+    pass
+
+
+def validate_project(data):
+    """Raises ``ProjectError`` if ``data`` is not a well-formed project."""
+    if not isinstance(data, dict):
+        raise ProjectError("Project file must contain a JSON object.")
+    name = data.get("projectName")
+    if not isinstance(name, str) or not name.strip():
+        raise ProjectError("Project name cannot be empty.")
+    if "@" in name:
+        raise ProjectError("Project name cannot contain '@'.")  # separates fleet device ids in route names
+    freq = data.get("gpsFrequency")
+    if not isinstance(freq, int) or not (MIN_FREQUENCY <= freq <= MAX_FREQUENCY):
+        raise ProjectError(f"GPS frequency must be between {MIN_FREQUENCY} and {MAX_FREQUENCY} seconds.")
+    version = data.get("taxonomyVersion", 1)
+    if not isinstance(version, int) or version < 1:
+        raise ProjectError("Taxonomy version must be a positive integer.")
+    taxonomy = data.get("taxonomy", [])
+    if not isinstance(taxonomy, list):
+        raise ProjectError("Taxonomy must be a list of classes.")
+    for entry in taxonomy:
+        if not isinstance(entry, dict) or not str(entry.get("className", "")).strip():
+            raise ProjectError("Each taxonomy class must have a valid name.")
+        attrs = entry.get("attributes")
+        if not isinstance(attrs, list) or not attrs:
+            raise ProjectError(f"Class '{entry['className']}' must have at least one attribute.")
+
+
+def load_project(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    validate_project(data)
+    return data
+
+
+def write_json_atomic(path, data):
+    """Writes JSON to a temp file in the same directory, then renames it over ``path``.
+
+    The file keeps the mode it had, or gets the one ``open`` would have given
+    it, rather than the owner-only mode of the temp file.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fchmod(f.fileno(), mode)
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class ProjectStore:
+    """In-memory cache of every project file in ``project_dir``.
+
+    Files are read once by ``load_all``; afterwards ``reload`` and ``sync_dir``
+    only re-read files whose mtime/size changed. Invalid files are kept out
+    of ``projects`` and reported in ``errors``.
+    """
+
+    def __init__(self, project_dir=PROJECT_DIR):
+        self.project_dir = project_dir
+        self.projects = {}
+        self.errors = {}
+        self._stamps = {}
+
+    def path_for(self, name):
+        return os.path.join(self.project_dir, f"{name}.json")
+
+    def _listing(self):
+        os.makedirs(self.project_dir, exist_ok=True)
+        return {
+            os.path.join(self.project_dir, name)
+            for name in os.listdir(self.project_dir)
+            if name.endswith(".json") and not name.startswith(".tmp_")
+        }
+
+    def load_all(self):
+        self.projects.clear()
+        self.errors.clear()
+        self._stamps.clear()
+        for path in self._listing():
+            self.reload(path)
+
+    def reload(self, path):
+        """Re-reads ``path`` if it changed on disk. Returns True if the cache changed."""
+        try:
+            stamp = _stamp(path)
+        except OSError:
+            return self._drop(path)
+        if self._stamps.get(path) == stamp:
+            return False
+
+        self._stamps[path] = stamp
+        try:
+            self.projects[path] = load_project(path)
+            self.errors.pop(path, None)
+        except (OSError, ValueError) as e:
+            self.projects.pop(path, None)
+            self.errors[path] = str(e)
+        return True
+
+    def _drop(self, path):
+        known = path in self._stamps
+        self.projects.pop(path, None)
+        self.errors.pop(path, None)
+        self._stamps.pop(path, None)
+        return known
+
+    def sync_dir(self):
+        """Picks up added, removed and changed files. Returns the changed paths."""
+        listing = self._listing()
+        changed = [path for path in list(self._stamps) if path not in listing and self._drop(path)]
+        changed.extend(path for path in sorted(listing) if self.reload(path))
+        return changed
+
+    def get(self, path):
+        return self.projects.get(path)
+
+    def paths(self):
+        return sorted(self.projects, key=lambda p: os.path.basename(p).lower())
+
+    def save(self, data, path=None):
+        validate_project(data)
+        path = path or self.path_for(data["projectName"])
+        write_json_atomic(path, data)
+        self.projects[path] = data
+        self.errors.pop(path, None)
+        self._stamps[path] = _stamp(path)
+        return path
@@ -0,0 +1,216 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .route_segments import open_segment
+
+CHUNK_BYTES = 4 * 1024 * 1024
+TAIL_BLOCK = 64 * 1024
+CODEC = "orjson" if orjson is not None else "json"
+FIELDS = ("tick_timestamp", "meta_submitted_at", "latitude", "longitude", "meta_data")
+_FIELD_SET = frozenset(FIELDS)
+
+
+_NUMBER_TYPES = (int, float)  # by exact type, which leaves out bool
+
+
+def _number(value):
+    if type(value) in _NUMBER_TYPES:
+        return repr(value)
+    # NumPy scalars and other number types
+    return dumps(value.item() if hasattr(value, "item") else value).decode("utf-8")
+
+
+def plain_number(value):
+    """``value`` (a float or NumPy scalar) as an int if it is whole, else as a float, so it encodes compactly."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class RouteRecord:
+    """One route record: a fix, or a tag when ``meta_submitted_at`` is set.
+
+    Slotted, so it takes a fraction of the memory of the equivalent dict,
+    and readable like one (``rec["latitude"]``, ``rec.get("meta_data")``),
+    so code written against decoded records accepts either.
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, tick_timestamp, latitude, longitude, meta_data=None, meta_submitted_at=None):
+        self.tick_timestamp = tick_timestamp
+        self.meta_submitted_at = meta_submitted_at
+        self.latitude = latitude
+        self.longitude = longitude
+        self.meta_data = {} if meta_data is None else meta_data
+
+    @classmethod
+    def from_dict(cls, rec):
+        """The record a decoded JSON object holds, or ``None`` if it is not a valid route record."""
+        if type(rec) is not dict:
+            return None
+        get = rec.get
+        ts, lat, lon, meta, submitted = (get("tick_timestamp"), get("latitude"), get("longitude"),
+                                         get("meta_data") or {}, get("meta_submitted_at"))
+        if (type(ts) not in _NUMBER_TYPES or type(lat) not in _NUMBER_TYPES or type(lon) not in _NUMBER_TYPES
+                or type(meta) is not dict or (submitted is not None and type(submitted) not in _NUMBER_TYPES)):
+            return None
+        return cls(ts, lat, lon, meta, submitted)
+
+    @property
+    def is_tag(self):
+        return self.meta_submitted_at is not None
+
+    def keys(self):
+        return [key for key in FIELDS if key != "meta_submitted_at" or self.meta_submitted_at is not None]
+
+    def __contains__(self, key):
+        return key in _FIELD_SET and (key != "meta_submitted_at" or self.meta_submitted_at is not None)
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self else default
+
+    def to_dict(self):
+        if self.meta_submitted_at is None:
+            return {"tick_timestamp": self.tick_timestamp, "latitude": self.latitude,
+                    "longitude": self.longitude, "meta_data": self.meta_data}
+        return {"tick_timestamp": self.tick_timestamp, "meta_submitted_at": self.meta_submitted_at,
+                "latitude": self.latitude, "longitude": self.longitude, "meta_data": self.meta_data}
+
+    def encode(self):
+        if orjson is not None:
+            return orjson.dumps(self.to_dict(), default=_default)
+        # Field by field rather than through a dict; only tags need the JSON encoder
+        meta = dumps(self.meta_data).decode("utf-8") if self.meta_data else "{}"
+        submitted = ("" if self.meta_submitted_at is None
+                     else f',"meta_submitted_at":{_number(self.meta_submitted_at)}')
+        return (f'{{"tick_timestamp":{_number(self.tick_timestamp)}{submitted},'
+                f'"latitude":{_number(self.latitude)},"longitude":{_number(self.longitude)},'
+                f'"meta_data":{meta}}}').encode("utf-8")
+
+    def __eq__(self, other):
+        if isinstance(other, RouteRecord):
+            other = other.to_dict()
+        return self.to_dict() == other if isinstance(other, dict) else NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"RouteRecord({self.to_dict()!r})"
+
+
+def _default(obj):
+    if isinstance(obj, RouteRecord):
+        return obj.to_dict()
+    if hasattr(obj, "item"):
+        return obj.item()  # NumPy scalar
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    loads = orjson.loads
+
+    def dumps(obj):
+        """Compact JSON of ``obj`` as bytes."""
+        return orjson.dumps(obj, default=_default)
+
+    def dumps_pretty(obj):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_INDENT_2).decode("utf-8")
+else:
+    loads = json.loads
+    _encoder = json.JSONEncoder(separators=(",", ":"), default=_default)
+
+    def dumps(obj):
+        """Compact JSON of ``obj`` as bytes."""
+        return _encoder.encode(obj).encode("utf-8")
+
+    def dumps_pretty(obj):
+        return json.dumps(obj, indent=2, default=_default)
+
+
+def encode_record(rec):
+    """One JSONL line of a route record, a ``RouteRecord`` or a dict, without the newline."""
+    return rec.encode() if type(rec) is RouteRecord else dumps(rec)
+
+
+def encode_records(records):
+    """A JSONL chunk of ``records``, newline-terminated; ``b""`` for none."""
+    if not records:
+        return b""
+    return b"\n".join(map(encode_record, records)) + b"\n"
+
+
+def decode_lines(lines):
+    """Decodes every line; blank and unparsable lines come back as ``None``."""
+    decoded = []
+    append = decoded.append
+    for line in lines:
+        try:
+            append(loads(line))
+        except ValueError:
+            append(None)
+    return decoded
+
+
+def decode_records(lines):
+    """``(records, skipped)``: the ``RouteRecord``s of the valid lines, and how many others there were.
+
+    Blank lines are neither records nor counted as skipped.
+    """
+    records = []
+    skipped = 0
+    from_dict = RouteRecord.from_dict
+    for line in lines:
+        try:
+            rec = from_dict(loads(line))
+        except ValueError:
+            rec = None
+        if rec is not None:
+            records.append(rec)
+        elif line.strip():
+            skipped += 1
+    return records, skipped
+
+
+def iter_line_batches(f, chunk_size=CHUNK_BYTES):
+    """Yields lists of the whole lines in successive ``chunk_size`` reads of the binary file ``f``."""
+    tail = b""
+    while True:
+        block = f.read(chunk_size)
+        if not block:
+            break
+        lines = (tail + block).split(b"\n")
+        tail = lines.pop()
+        if lines:
+            yield lines
+    if tail:
+        yield [tail]
+
+
+def reversed_lines(f, end):
+    """Yields the lines of the binary file ``f`` before offset ``end``, last first, reading back a block at a time."""
+    rest = b""
+    while end > 0:
+        start = max(0, end - TAIL_BLOCK)
+        f.seek(start)
+        lines = (f.read(end - start) + rest).split(b"\n")
+        rest = lines.pop(0) if start else b""
+        yield from reversed(lines)
+        end = start
+
+
+def read_records(path, chunk_size=CHUNK_BYTES):
+    """Yields batches of the valid ``RouteRecord``s of a JSONL route, plain or compressed."""
+    with open_segment(path) as f:
+        for lines in iter_line_batches(f, chunk_size):
+            records, _ = decode_records(lines)
+            if records:
+                yield records
@@ -0,0 +1,455 @@
+import os
+import time
+import socket
+import struct
+
+from .live_meta import events_path, tag_record
+from .projects import write_json_atomic
+from .records import TAIL_BLOCK, RouteRecord, encode_record, loads, plain_number, reversed_lines
+from .route_catalog import ROUTE_DIR
+from .route_segments import SESSION_SUFFIX, is_compressed, session_segments, sidecar_path
+
+REPLAY_WINDOW = 60.0  # seconds of fixes before the oldest pending submission searched for its tag
+TAIL_BACKUP_SUFFIX = ".tail.tmp"  # the records a tag insertion rewrites, kept until it is done
+_BACKUP_HEADER = struct.Struct("<QQ")  # offset of the tail, its length
+
+
+def manifest_path(route_file):
+    """Manifest of a running session: ``route_P_123.session.json``."""
+    return sidecar_path(route_file, SESSION_SUFFIX)
+
+
+class SessionManifest:
+    """Marks a session as being logged, and holds its metadata submissions not yet on disk.
+
+    It is written when the session starts and removed once it has stopped
+    cleanly, so one left behind by a process that is gone means the session
+    was cut short. ``pending`` lists ``(submitted_at, meta_data)`` of
+    submissions whose tag records have not been flushed yet; recovery
+    replays them.
+    """
+
+    def __init__(self, route_file):
+        self.route_file = route_file
+        self.path = manifest_path(route_file)
+        self.data = None
+
+    def create(self, project_name, taxonomy=None, alignment="nearest"):
+        self.data = {
+            "route": os.path.basename(self.route_file),
+            "projectName": project_name,
+            "taxonomy": taxonomy or [],
+            "metaAlignment": alignment,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "boot_id": _boot_id(),
+            "pid_started": _process_start(os.getpid()),
+            "started_at": time.time(),
+            "pending": [],
+        }
+        write_json_atomic(self.path, self.data)
+
+    def update(self, pending):
+        self.data["pending"] = [[submitted_at, meta] for submitted_at, meta in pending]
+        write_json_atomic(self.path, self.data)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _boot_id():
+    try:
+        with open("/proc/sys/kernel/random/boot_id", "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None  # not Linux
+
+
+def _process_start(pid):
+    """When process ``pid`` started, in clock ticks since boot, or ``None`` if it cannot be told."""
+    try:
+        data = _read(f"/proc/{pid}/stat")
+        # The command name may hold spaces and parentheses; starttime is the 20th field after it
+        return int(data[data.rindex(b")") + 2:].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True  # exists, or this platform cannot tell
+    return True
+
+
+def owner_alive(data):
+    """True if the process that wrote a manifest may still be logging its session.
+
+    A manifest from another host is assumed to be live, since its process
+    cannot be checked from here. On this host the boot and the start time of
+    the process are compared as well as its pid, since after a reboot or a
+    while the pid may belong to an unrelated process.
+    """
+    if data.get("host") != socket.gethostname():
+        return True
+    pid = data.get("pid")
+    if not isinstance(pid, int) or pid == os.getpid():
+        return False
+    boot_id = data.get("boot_id")
+    if boot_id is not None and _boot_id() not in (None, boot_id):
+        return False
+    if not _pid_alive(pid):
+        return False
+    started = data.get("pid_started")
+    return started is None or _process_start(pid) in (None, started)
+
+
+def unfinished_sessions(route_dir=ROUTE_DIR, force=False):
+    """Manifest paths of sessions whose process is gone (all of them with ``force``)."""
+    found = []
+    for name in sorted(os.listdir(route_dir)):
+        if not name.endswith(SESSION_SUFFIX):
+            continue
+        path = os.path.join(route_dir, name)
+        try:
+            data = loads(_read(path))
+        except (OSError, ValueError):
+            data = {}  # torn while being written, so certainly not live
+        if force or not isinstance(data, dict) or not owner_alive(data):
+            found.append(path)
+    return found
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _last_newline(f, size):
+    """Offset just past the last newline in the first ``size`` bytes of ``f`` (0 if there is none)."""
+    end = size
+    while end > 0:
+        start = max(0, end - TAIL_BLOCK)
+        f.seek(start)
+        cut = f.read(end - start).rfind(b"\n")
+        if cut >= 0:
+            return start + cut + 1
+        end = start
+    return 0
+
+
+def repair_jsonl_tail(path, is_valid=None):
+    """Makes a JSONL file end on a whole line; returns the number of bytes cut off.
+
+    Only the bytes after the last newline are read (plus however far back
+    that newline is). A last line that decodes, and passes ``is_valid`` if
+    given, only lacks its newline and gets one; anything else there is a
+    torn write and is cut off.
+    """
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        keep = _last_newline(f, size)
+        if keep == size:
+            return 0
+        f.seek(keep)
+        tail = f.read(size - keep)
+        try:
+            rec = loads(tail)
+        except ValueError:
+            rec = None
+        if rec is not None and (is_valid is None or is_valid(rec)):
+            f.seek(size)
+            f.write(b"\n")
+            return 0
+        f.truncate(keep)
+        os.fsync(f.fileno())
+        return size - keep
+
+
+def _repair_binary(path):
+    from .route_binary import BinaryRouteReader
+
+    try:
+        with BinaryRouteReader(path) as reader:
+            valid = reader.valid_size
+    except ValueError:
+        valid = 0  # the file header itself is torn; the next writer starts the file over
+    size = os.path.getsize(path)
+    if valid < size:
+        with open(path, "r+b") as f:
+            f.truncate(valid)
+            os.fsync(f.fileno())
+    return size - valid
+
+
+def _jsonl_tail(path, since):
+    """Fixes and tag submission times of the records at the end of a JSONL route, back to ``since``."""
+    fixes, submitted = [], set()
+    with open(path, "rb") as f:
+        for line in reversed_lines(f, f.seek(0, os.SEEK_END)):
+            try:
+                rec = RouteRecord.from_dict(loads(line))
+            except ValueError:
+                continue
+            if rec is None:
+                continue
+            if rec.is_tag:
+                submitted.add(rec.meta_submitted_at)
+            else:
+                fixes.append((rec.tick_timestamp, rec.latitude, rec.longitude))
+            if rec.tick_timestamp < since and fixes:
+                break
+    fixes.reverse()
+    return fixes, submitted
+
+
+def _binary_tail(path, since):
+    import numpy as np
+    from .route_binary import BinaryRouteReader
+
+    fixes, submitted = [], set()
+    if os.path.getsize(path) == 0:
+        return fixes, submitted
+    with BinaryRouteReader(path) as reader:
+        for block in reversed(reader.blocks):
+            ts, lat, lon = reader.columns(block)
+            tag_rows = set()
+            if block.meta_count:
+                subs, rows, _ = reader.meta(block)
+                for sub, row in zip(subs.tolist(), rows.tolist()):
+                    if not np.isnan(sub):
+                        submitted.add(sub)
+                        tag_rows.add(row)
+            rows = [i for i in range(block.count) if i not in tag_rows]
+            fixes[:0] = zip(ts[rows].tolist(), lat[rows].tolist(), lon[rows].tolist())
+            if block.count and ts[0] < since and fixes:
+                break
+    return fixes, submitted
+
+
+def _record_time(line):
+    try:
+        rec = loads(line)
+    except ValueError:
+        return None
+    ts = rec.get("tick_timestamp") if isinstance(rec, dict) else None
+    return ts if isinstance(ts, (int, float)) else None
+
+
+def _merge_tags(records, tags):
+    """Yields ``records`` (``(ts, record)`` pairs in time order) with ``tags`` in place among them.
+
+    A tag goes in before the first record that is later than it.
+    """
+    tags = iter(tags)
+    tag = next(tags, None)
+    for ts, rec in records:
+        while tag is not None and ts is not None and tag.tick_timestamp < ts:
+            yield tag
+            tag = next(tags, None)
+        yield rec
+    while tag is not None:
+        yield tag
+        tag = next(tags, None)
+
+
+def _restore_tail(path):
+    """Undoes a tag insertion into ``path`` that was cut short; returns True if there was one.
+
+    A backup that is itself incomplete means the route was not touched yet.
+    """
+    backup = path + TAIL_BACKUP_SUFFIX
+    if not os.path.exists(backup):
+        return False
+    data = _read(backup)
+    if len(data) >= _BACKUP_HEADER.size:
+        offset, length = _BACKUP_HEADER.unpack_from(data)
+        tail = data[_BACKUP_HEADER.size:]
+        if len(tail) == length:
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+                f.seek(offset)
+                f.write(tail)
+                os.fsync(f.fileno())
+    os.remove(backup)
+    return True
+
+
+def _rewrite_tail(path, offset, write):
+    """Cuts ``path`` at ``offset`` and calls ``write`` to append the new tail.
+
+    The bytes cut off are saved next to the route first, so recovery can put
+    them back (``_restore_tail``) if the process dies in between.
+    """
+    backup = path + TAIL_BACKUP_SUFFIX
+    with open(path, "rb") as f:
+        f.seek(offset)
+        tail = f.read()
+    with open(backup, "wb") as f:
+        f.write(_BACKUP_HEADER.pack(offset, len(tail)) + tail)
+        os.fsync(f.fileno())
+    with open(path, "r+b") as f:
+        f.truncate(offset)
+        os.fsync(f.fileno())
+    write()
+    os.remove(backup)
+
+
+def _insert_jsonl(path, tags):
+    """Writes tag records into a JSONL route in time order; only the lines after the first tag are rewritten."""
+    first = tags[0].tick_timestamp
+    with open(path, "rb") as f:
+        end = offset = f.seek(0, os.SEEK_END)
+        tail = []
+        for i, line in enumerate(reversed_lines(f, end)):
+            ts = _record_time(line)
+            if ts is not None and ts <= first:
+                break
+            offset -= len(line) + (1 if i else 0)  # the first piece has no newline after it
+            if line.strip():
+                tail.append((ts, line))
+    tail.reverse()
+
+    def write():
+        with open(path, "ab") as f:
+            f.write(b"".join((line if isinstance(line, bytes) else encode_record(line)) + b"\n"
+                             for line in _merge_tags(tail, tags)))
+            os.fsync(f.fileno())
+
+    _rewrite_tail(path, offset, write)
+
+
+def _insert_binary(path, tags, taxonomy, project_name):
+    """Writes tag records into a binary route in time order, rewriting the blocks after the first tag."""
+    from .route_binary import BinaryRouteReader, BinaryRouteSink
+
+    first = tags[0].tick_timestamp
+    with BinaryRouteReader(path) as reader:
+        offset, tail = reader.valid_size, []
+        for block in reader.blocks:
+            if block.count and reader.columns(block)[0][-1] > first:
+                offset = block.offset
+                tail = [(rec["tick_timestamp"], rec) for rec in reader.iter_records(block.row_start)]
+                break
+
+    def write():
+        sink = BinaryRouteSink(path, taxonomy, project_name)
+        try:
+            sink.write(list(_merge_tags(tail, tags)))
+            sink.fsync()
+        finally:
+            sink.close()
+
+    _rewrite_tail(path, offset, write)
+
+
+class Recovery:
+    """What ``recover_session`` did to one session."""
+
+    def __init__(self, route):
+        self.route = route
+        self.files = []
+        self.truncated = 0  # bytes of torn writes cut off
+        self.replayed = 0  # pending submissions written as tags
+        self.unplaced = 0  # pending submissions with no fix to go on, left in the events file
+        self.removed = []  # leftovers of interrupted compressions
+
+    def __str__(self):
+        return (f"{self.route}: {self.truncated} torn bytes cut, {self.replayed} pending tags replayed"
+                + (f", {self.unplaced} without a fix" if self.unplaced else ""))
+
+
+def _tidy_compressions(route_dir, files, result):
+    # A crash mid-compression leaves a temporary file, or the source next to its finished copy
+    names = set(os.listdir(route_dir))
+    for path in files:
+        name = os.path.basename(path)
+        for ext in (".gz", ".zst"):
+            if name + ext + ".tmp" in names:
+                os.remove(path + ext + ".tmp")
+                result.removed.append(name + ext + ".tmp")
+            if not is_compressed(name) and name + ext in names:
+                os.remove(path)
+                result.removed.append(name)
+
+
+def recover_session(manifest_file):
+    """Closes the session a manifest was left behind by; returns a ``Recovery``.
+
+    The live segment's torn tail is cut off (reading from the end, so the
+    cost depends on the damage and not on the file size), and so is the
+    events file's. Pending submissions whose tags are not in the route are
+    aligned onto the fixes at the end of it and written among them in time
+    order, rewriting only the records after the first tag. The manifest is
+    removed last, so a recovery that is itself interrupted is run again
+    (after putting back a rewrite it cut short).
+    """
+    # NumPy and the binary format are only needed here, not by RouteSession's SessionManifest
+    import numpy as np
+    from .meta_events import align_events
+    from .route_binary import is_binary_route
+
+    try:
+        data = loads(_read(manifest_file))
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        data = {}
+    route_dir = os.path.dirname(manifest_file)
+    session = os.path.basename(manifest_file)[:-len(SESSION_SUFFIX)]
+    result = Recovery(data.get("route") or session)
+
+    files = session_segments(route_dir, session)
+    _tidy_compressions(route_dir, files, result)
+    files = [path for path in files if os.path.exists(path)]
+    result.files = files
+    live = [path for path in files if not is_compressed(path)]
+    last = live[-1] if live else None
+
+    if last is not None:
+        _restore_tail(last)
+        result.truncated += _repair_binary(last) if is_binary_route(last) else repair_jsonl_tail(
+            last, lambda rec: RouteRecord.from_dict(rec) is not None)
+    events = events_path(os.path.join(route_dir, session + ".jsonl"))
+    if os.path.exists(events):
+        result.truncated += repair_jsonl_tail(events, lambda rec: isinstance(rec, dict) and "submitted_at" in rec)
+
+    pending = [(s, meta) for s, meta in data.get("pending", []) if isinstance(meta, dict) and meta]
+    if pending and last is not None:
+        since = min(s for s, _ in pending) - REPLAY_WINDOW
+        fixes, submitted = (_binary_tail if is_binary_route(last) else _jsonl_tail)(last, since)
+        pending = sorted((s, meta) for s, meta in pending if s not in submitted)
+        if pending and fixes:
+            fix_ts, fix_lat, fix_lon = (np.array(column, dtype=np.float64) for column in zip(*fixes))
+            ts, lat, lon = align_events(fix_ts, fix_lat, fix_lon, [s for s, _ in pending],
+                                        data.get("metaAlignment", "nearest"))
+            tags = sorted((tag_record(plain_number(t), la, lo, s, meta)
+                           for t, la, lo, (s, meta) in zip(ts.tolist(), lat.tolist(), lon.tolist(), pending)),
+                          key=lambda rec: rec.tick_timestamp)
+            if is_binary_route(last):
+                _insert_binary(last, tags, data.get("taxonomy"), data.get("projectName"))
+            else:
+                _insert_jsonl(last, tags)
+            result.replayed = len(pending)
+        else:
+            result.unplaced = len(pending)
+    elif pending:
+        result.unplaced = len(pending)
+
+    os.remove(manifest_file)
+    return result
+
+
+def recover_sessions(route_dir=ROUTE_DIR, force=False):
+    """Recovers every session in ``route_dir`` left unfinished by a process that is gone.
+
+    Meant to run at startup, before the route catalog is revalidated (which
+    then picks up the repaired files). Returns a ``Recovery`` per session.
+    """
+    if not os.path.isdir(route_dir):
+        return []
+    return [recover_session(path) for path in unfinished_sessions(route_dir, force)]
@@ -0,0 +1,361 @@
+import os
+import gzip
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import as_completed
+
+import numpy as np
+
+from .projects import write_json_atomic
+from .records import dumps, iter_line_batches, loads
+from .recovery import manifest_path
+from .route_binary import BinaryRouteReader, BinaryRouteSink, is_binary_route
+from .route_catalog import RouteStats, parse_route_name
+from .route_segments import EVENTS_SUFFIX, compress_file, open_segment, zstandard
+from .taxonomy import MigrationPlan, TaxonomyMigration, migration_plan, taxonomy_version, version_at
+from .worker_pool import cancellable_pool, worker_cancel_event
+
+RETAG_STATE = os.path.join("app_data", "retag.json")
+CANCEL_CHECK = 64  # line batches or blocks between checks
+_EMPTY_META = (b'"meta_data":{}', b'"meta_data": {}')
+
+RetagResult = namedtuple("RetagResult", ["filename", "version", "changed", "dropped", "error"])
+
+
+class RetagCancelled(Exception):
+    pass
+
+
+class RetagState:
+    """Taxonomy version each route file was rewritten to, journaled so a run can resume.
+
+    A file is entered as ``"replacing"`` (with its temporary copy) just
+    before the copy is renamed over it, so a run killed at that point
+    finishes the rename on the next start instead of rewriting the file
+    again, which migrations that swap names would not survive.
+    """
+
+    def __init__(self, path=RETAG_STATE):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                data = loads(f.read())
+        except (OSError, ValueError):
+            data = {}
+        files = data.get("files") if isinstance(data, dict) else None
+        self.files = files if isinstance(files, dict) else {}
+
+    def save(self):
+        write_json_atomic(self.path, {"files": self.files})
+
+    def set(self, filename, entry):
+        self.files[filename] = entry
+        self.save()
+
+    def version(self, filename):
+        """The version a finished run rewrote ``filename`` to, or ``None``."""
+        entry = self.files.get(filename)
+        return entry.get("version") if entry is not None and entry.get("state") == "done" else None
+
+    def source_version(self, sources):
+        """The journaled version shared by the files ``sources``, or ``None`` if none of them has one.
+
+        Raises ``ValueError`` if they are at different versions, as the
+        files of a session are while a run is only part way through it.
+        """
+        versions = {self.version(name) for name in sources}
+        if len(versions) > 1:
+            raise ValueError("its files are at different taxonomy versions; update the project's routes first")
+        return versions.pop() if versions else None
+
+    def carry_over(self, sources, filename):
+        """Journals ``filename``, written from the files ``sources``, at their version.
+
+        Archiving and conversion write a session under a new name, which
+        would otherwise count as being at the version its session started
+        with and be migrated a second time.
+        """
+        version = self.source_version(sources)
+        if version is not None and self.version(filename) != version:
+            self.set(filename, {"version": version, "state": "done", "changed": 0, "dropped": 0})
+
+
+def project_files(project_name, route_dir):
+    """``(filename, session_ts)`` of the project's route and metadata event files.
+
+    Sessions that are still being logged are left out.
+    """
+    found = []
+    for name in sorted(os.listdir(route_dir)):
+        route_name = name[:-len(EVENTS_SUFFIX)] + ".jsonl" if name.endswith(EVENTS_SUFFIX) else name
+        parsed = parse_route_name(route_name)
+        if parsed is None or parsed[0] != project_name:
+            continue
+        if os.path.exists(manifest_path(os.path.join(route_dir, route_name))):
+            continue
+        found.append((name, parsed[1]))
+    return found
+
+
+def _tmp_path(path, version):
+    return f"{path}.v{version}.tmp"
+
+
+def _check(cancel_event, i):
+    if cancel_event is not None and i % CANCEL_CHECK == 0 and cancel_event.is_set():
+        raise RetagCancelled()
+
+
+def _open_output(path, like):
+    """``(raw, out)`` for writing ``path`` compressed the way ``like`` is."""
+    raw = open(path, "wb")
+    if like.endswith(".gz"):
+        return raw, gzip.GzipFile(fileobj=raw, mode="wb", filename="", mtime=0)
+    if like.endswith(".zst"):
+        if zstandard is None:
+            raw.close()
+            raise OSError(f"zstandard is required to rewrite {like}")
+        return raw, zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=False)
+    return raw, raw
+
+
+def _retag_jsonl(src, dst, plan, cancel_event):
+    """Rewrites a JSONL route or events file line by line; returns ``(changed, dropped)``.
+
+    Lines without metadata, and lines that do not decode, are copied as they
+    are. Tags (and events) left with no metadata at all are dropped.
+    """
+    changed = dropped = 0
+    raw, out = _open_output(dst, src)
+    try:
+        with open_segment(src) as f:
+            for i, lines in enumerate(iter_line_batches(f)):
+                _check(cancel_event, i)
+                kept = []
+                for line in lines:
+                    if not line.strip() or _EMPTY_META[0] in line or _EMPTY_META[1] in line:
+                        kept.append(line)
+                        continue
+                    try:
+                        rec = loads(line)
+                    except ValueError:
+                        kept.append(line)
+                        continue
+                    meta = rec.get("meta_data") if isinstance(rec, dict) else None
+                    new = plan.apply_meta(meta) if isinstance(meta, dict) and meta else meta
+                    if new is meta:
+                        kept.append(line)
+                        continue
+                    changed += 1
+                    if not new and ("meta_submitted_at" in rec or "submitted_at" in rec):
+                        dropped += 1
+                        continue
+                    rec["meta_data"] = new
+                    kept.append(dumps(rec))
+                if kept:
+                    out.write(b"\n".join(kept) + b"\n")
+        if out is not raw:
+            out.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+    finally:
+        raw.close()
+    return changed, dropped
+
+
+def _retag_binary(src, dst, plan, taxonomy, cancel_event):
+    """Rewrites a binary route block by block; columns are copied, only metadata is re-encoded."""
+    changed = dropped = 0
+    plain = dst[:-len(".tmp")] + ".plain.tmp" if src.endswith((".gz", ".zst")) else dst
+    with BinaryRouteReader(src) as reader:
+        if all(plan.map_pair(cls, attr) == (cls, attr) for cls, attr in reader.dictionary):
+            return 0, 0  # every pair the file can hold is unchanged
+        extras = {key: value for key, value in reader.header.items() if key not in ("projectName", "dictionary")}
+        sink = BinaryRouteSink(plain, taxonomy, reader.header.get("projectName"), info=extras)
+        try:
+            for i, block in enumerate(reader.blocks):
+                _check(cancel_event, i)
+                ts, lat, lon = reader.columns(block)
+                tags = {}
+                if block.meta_count:
+                    submitted, rows, codes = reader.meta(block)
+                    for sub, row, code in zip(submitted.tolist(), rows.tolist(), codes.tolist()):
+                        entry = tags.setdefault(row, (None if np.isnan(sub) else sub, {}))
+                        cls, attr = reader.dictionary[code]
+                        entry[1][cls] = attr
+                keep = None
+                for row, (sub, meta) in list(tags.items()):
+                    new = plan.apply_meta(meta)
+                    if new is meta:
+                        continue
+                    changed += 1
+                    if new:
+                        tags[row] = (sub, new)
+                        continue
+                    del tags[row]
+                    if sub is not None:
+                        if keep is None:
+                            keep = np.ones(block.count, dtype=bool)
+                        keep[row] = False
+                        dropped += 1
+                if keep is not None:
+                    # Tag rows left without metadata go; later rows move up
+                    shift = np.cumsum(~keep)
+                    tags = {row - int(shift[row]): tag for row, tag in tags.items()}
+                    ts, lat, lon = ts[keep], lat[keep], lon[keep]
+                sink.write_columns(ts, lat, lon, dict(sorted(tags.items())))
+            sink.fsync()
+        finally:
+            sink.close()
+    if plain != dst:
+        os.replace(compress_file(plain, "zstd" if src.endswith(".zst") else "gzip"), dst)
+    return changed, dropped
+
+
+def retag_file(src, dst, steps, taxonomy=None, cancel_event=None):
+    """Writes ``src`` with its metadata migrated by ``steps`` to ``dst``; returns ``(changed, dropped)``.
+
+    Nothing is left at ``dst`` if no record changed.
+    """
+    plan = MigrationPlan(TaxonomyMigration.from_dict(step) for step in steps)
+    for path in (dst, dst[:-len(".tmp")] + ".plain.tmp"):
+        if os.path.exists(path):
+            os.remove(path)  # left by an interrupted run
+    try:
+        if is_binary_route(src):
+            changed, dropped = _retag_binary(src, dst, plan, taxonomy, cancel_event)
+        else:
+            changed, dropped = _retag_jsonl(src, dst, plan, cancel_event)
+    except BaseException:
+        if os.path.exists(dst):
+            os.remove(dst)
+        raise
+    if not changed and os.path.exists(dst):
+        os.remove(dst)
+    return changed, dropped
+
+
+def _retag_job(src, dst, steps, taxonomy):
+    try:
+        return retag_file(src, dst, steps, taxonomy, worker_cancel_event()) + (None,)
+    except RetagCancelled:
+        return 0, 0, "cancelled"
+    except (OSError, ValueError) as e:
+        return 0, 0, str(e)
+
+
+class RetagJob:
+    """Brings every route of a project up to its current taxonomy version.
+
+    A file's version is the one recorded in ``RetagState`` (by a run, or
+    carried over from the files it was archived or converted from), or else
+    the one in effect when its session started. Files behind the project's version
+    are rewritten by worker processes, streamed a batch of lines or a block
+    at a time, to a temporary copy that is renamed over the original; the
+    catalog and indexes are then updated. Metadata event files are migrated
+    along with their routes, so realigning does not bring old names back.
+
+    ``run`` yields a ``RetagResult`` per file; ``cancel`` may be called from
+    another thread. A cancelled or killed run resumes where it stopped.
+    """
+
+    def __init__(self, project, catalog_factory, route_dir, state_path=RETAG_STATE, index_factories=(),
+                 workers=None):
+        self.project = project
+        self.catalog_factory = catalog_factory
+        self.route_dir = route_dir
+        self.index_factories = list(index_factories)
+        self.workers = workers or os.cpu_count() or 1
+        self.state = RetagState(state_path)
+        self.version = taxonomy_version(project)
+        self.total = None
+        self._cancel_event = multiprocessing.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def file_version(self, filename, session_ts):
+        version = self.state.version(filename)
+        return version_at(self.project, session_ts) if version is None else version
+
+    def pending(self):
+        """``(filename, version)`` of the files that are behind the project's taxonomy."""
+        files = []
+        for name, session_ts in project_files(self.project["projectName"], self.route_dir):
+            entry = self.state.files.get(name)
+            if entry is not None and entry.get("state") == "replacing":
+                continue  # finished first by run
+            version = self.file_version(name, session_ts)
+            if version < self.version:
+                files.append((name, version))
+        return files
+
+    def run(self):
+        catalog = self.catalog_factory() if self.catalog_factory is not None else None
+        indexes = [factory() for factory in self.index_factories]
+        try:
+            replacing = [(name, entry) for name, entry in self.state.files.items()
+                         if entry.get("state") == "replacing" and os.path.exists(os.path.join(self.route_dir, name))]
+            jobs = self.pending()
+            self.total = len(replacing) + len(jobs)
+            for name, entry in replacing:
+                yield self._replace(name, entry, catalog, indexes)
+            if not jobs:
+                return
+            taxonomy = self.project.get("taxonomy")
+            workers = min(self.workers, len(jobs))
+            with cancellable_pool(workers, self._cancel_event) as pool:
+                futures = {}
+                for name, version in jobs:
+                    src = os.path.join(self.route_dir, name)
+                    steps = [step.to_dict() for step in migration_plan(self.project, version).steps]
+                    futures[pool.submit(_retag_job, src, _tmp_path(src, self.version), steps, taxonomy)] = name
+                try:
+                    for future in as_completed(futures):
+                        name = futures[future]
+                        changed, dropped, error = future.result()
+                        if error:
+                            yield RetagResult(name, None, 0, 0, error)
+                            continue
+                        entry = {"version": self.version, "changed": changed, "dropped": dropped}
+                        if changed:
+                            entry.update(state="replacing", tmp=os.path.basename(
+                                _tmp_path(os.path.join(self.route_dir, name), self.version)))
+                            self.state.set(name, entry)
+                            yield self._replace(name, entry, catalog, indexes)
+                        else:
+                            entry["state"] = "done"
+                            self.state.set(name, entry)
+                            yield RetagResult(name, self.version, 0, 0, None)
+                finally:
+                    for future in futures:
+                        future.cancel()
+        finally:
+            if catalog is not None:
+                catalog.close()
+            for index in indexes:
+                index.close()
+
+    def _replace(self, name, entry, catalog, indexes):
+        path = os.path.join(self.route_dir, name)
+        tmp = os.path.join(self.route_dir, entry["tmp"])
+        delta = None
+        if os.path.exists(tmp):
+            # Only metadata changed: the summary stays, less any dropped tags
+            delta = RouteStats()
+            delta.point_count = -entry["dropped"]
+            delta.byte_size = os.path.getsize(tmp) - os.path.getsize(path)
+            os.replace(tmp, path)
+        if not name.endswith(EVENTS_SUFFIX):
+            if catalog is not None:
+                catalog.update_route(path, appended=delta)
+            for index in indexes:
+                index.update_route(path)
+        entry["state"] = "done"
+        del entry["tmp"]
+        self.state.set(name, entry)
+        return RetagResult(name, entry["version"], entry["changed"], entry["dropped"], None)
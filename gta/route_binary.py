@@ -0,0 +1,442 @@
+import os
+import json
+import mmap
+import time
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from .records import dumps, encode_record, plain_number, read_records
+from .route_catalog import ROUTE_DIR, RouteStats, parse_route_name
+from .route_segments import EVENTS_SUFFIX, open_mappable, strip_compression
+
+# File layout (little endian, every section 8-byte aligned so columns can be
+# mapped straight into NumPy):
+#
+#   file header   magic "GTAROUTE", u16 version, u16 reserved, u32 header_len,
+#                 header JSON (projectName + initial class/attribute dictionary, plus
+#                 "archive" settings for downsampled archives)
+#   block*        magic "GTAB", u32 count, u32 meta_count, u32 dict_len,
+#                 dict JSON (new [class, attribute] pairs, appended to the dictionary),
+#                 f64 ts[count], f64 lat[count], f64 lon[count],
+#                 f64 submitted_at[meta_count], i32 meta_row[meta_count], i32 meta_code[meta_count]
+#
+# A tagged tick contributes one meta entry per class; meta_row is relative to
+# the block and meta_code indexes the dictionary.
+
+EXTENSION = ".rbin"
+MAGIC = b"GTAROUTE"
+BLOCK_MAGIC = b"GTAB"
+VERSION = 1
+FILE_HEADER = struct.Struct("<8sHHI")
+BLOCK_HEADER = struct.Struct("<4sIII")
+BLOCK_RECORDS = 4096
+
+Block = namedtuple("Block", ["offset", "row_start", "count", "meta_count", "data_offset"])
+
+
+def is_binary_route(path):
+    return strip_compression(path).endswith(EXTENSION)
+
+
+def _pad8(n):
+    return (n + 7) & ~7
+
+
+def _padded(data):
+    return data + b"\0" * (_pad8(len(data)) - len(data))
+
+
+def taxonomy_dictionary(taxonomy):
+    return [[entry["className"], attr] for entry in taxonomy or [] for attr in entry.get("attributes", [])]
+
+
+class BinaryRouteReader:
+    """Memory-mapped reader for ``.rbin`` routes.
+
+    Columns are returned as zero-copy NumPy views over the mapping. The reader
+    also offers the ``RouteIndex`` interface (``len``, ``record``, ``line``)
+    so the log viewer can page through binary routes the same way.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open_mappable(path)
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self.blocks = []
+        self.dictionary = []
+        self.header = {}
+        self.valid_size = 0
+        self._row_starts = np.empty(0, dtype=np.int64)
+        self._tag_cache = (None, None)
+        self._scan()
+
+    def _scan(self):
+        self.row_count = 0
+        if self.size == 0:
+            return  # created but nothing written yet
+        if self.size < FILE_HEADER.size:
+            raise ValueError(f"{self.path} is not a binary route file")
+        magic, version, _, header_len = FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a binary route file")
+        pos = FILE_HEADER.size
+        self.header = json.loads(bytes(self._mm[pos:pos + header_len]))
+        self.dictionary = [tuple(pair) for pair in self.header.get("dictionary", [])]
+        self.valid_size = _pad8(pos + header_len)
+        self._scan_blocks()
+
+    def _scan_blocks(self):
+        pos = self.valid_size
+        rows = self.row_count
+        while pos + BLOCK_HEADER.size <= self.size:
+            magic, count, meta_count, dict_len = BLOCK_HEADER.unpack_from(self._mm, pos)
+            if magic != BLOCK_MAGIC:
+                break
+            data_offset = pos + BLOCK_HEADER.size + _pad8(dict_len)
+            end = data_offset + 24 * count + 16 * meta_count
+            end = _pad8(end)
+            if end > self.size:
+                break  # torn block at the tail
+            if dict_len:
+                start = pos + BLOCK_HEADER.size
+                self.dictionary.extend(tuple(p) for p in json.loads(bytes(self._mm[start:start + dict_len])))
+            self.blocks.append(Block(pos, rows, count, meta_count, data_offset))
+            rows += count
+            pos = end
+            self.valid_size = end
+
+        self._row_starts = np.array([b.row_start for b in self.blocks], dtype=np.int64)
+        self.row_count = rows
+
+    def refresh(self):
+        """Picks up blocks appended since the last scan; returns the first new row.
+
+        Blocks are only ever appended whole, so rows already seen never change.
+        """
+        size = os.fstat(self._file.fileno()).st_size
+        if size <= self.size:
+            return self.row_count
+        first = self.row_count
+        old_mm = self._mm
+        self.size = size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._tag_cache = (None, None)
+        if old_mm is not None:
+            try:
+                old_mm.close()
+            except BufferError:
+                pass  # column views are still in use; the mapping is released with them
+        if not self.header:
+            if size < FILE_HEADER.size:
+                return first
+            self.blocks = []
+            self._scan()
+        else:
+            self._scan_blocks()
+        return first
+
+    def __len__(self):
+        return self.row_count
+
+    def columns(self, block):
+        base = block.data_offset
+        n = block.count
+        ts = np.frombuffer(self._mm, np.float64, n, base)
+        lat = np.frombuffer(self._mm, np.float64, n, base + 8 * n)
+        lon = np.frombuffer(self._mm, np.float64, n, base + 16 * n)
+        return ts, lat, lon
+
+    def meta(self, block):
+        base = block.data_offset + 24 * block.count
+        m = block.meta_count
+        submitted = np.frombuffer(self._mm, np.float64, m, base)
+        rows = np.frombuffer(self._mm, np.int32, m, base + 8 * m)
+        codes = np.frombuffer(self._mm, np.int32, m, base + 12 * m)
+        return submitted, rows, codes
+
+    def arrays(self):
+        """Returns ``(ts, lat, lon, tag_rows, tags)`` for the whole route."""
+        if not self.blocks:
+            empty = np.empty(0)
+            return empty, empty, empty, np.empty(0, dtype=np.int64), []
+        cols = [self.columns(b) for b in self.blocks]
+        if len(cols) == 1:
+            ts, lat, lon = cols[0]
+        else:
+            ts, lat, lon = (np.concatenate(c) for c in zip(*cols))
+
+        tag_rows, tags = [], []
+        for block in self.blocks:
+            for row, meta in self._block_tags(block).items():
+                tag_rows.append(block.row_start + row)
+                tags.append(meta["meta_data"])
+        return ts, lat, lon, np.array(tag_rows, dtype=np.int64), tags
+
+    def _block_tags(self, block):
+        cached_block, tags = self._tag_cache
+        if cached_block is block:
+            return tags
+        tags = {}
+        if block.meta_count:
+            submitted, rows, codes = self.meta(block)
+            for sub, row, code in zip(submitted.tolist(), rows.tolist(), codes.tolist()):
+                entry = tags.setdefault(row, {"submitted_at": sub, "meta_data": {}})
+                cls, attr = self.dictionary[code]
+                entry["meta_data"][cls] = attr
+        self._tag_cache = (block, tags)
+        return tags
+
+    def record(self, row):
+        b = int(np.searchsorted(self._row_starts, row, side="right")) - 1
+        block = self.blocks[b]
+        local = row - block.row_start
+        ts, lat, lon = self.columns(block)
+        return self._make_record(ts[local], lat[local], lon[local], self._block_tags(block).get(local))
+
+    def line(self, row):
+        return dumps(self.record(row))
+
+    @staticmethod
+    def _make_record(ts, lat, lon, tag):
+        rec = {"tick_timestamp": plain_number(ts)}
+        if tag is not None and not np.isnan(tag["submitted_at"]):
+            rec["meta_submitted_at"] = plain_number(tag["submitted_at"])
+        rec["latitude"] = float(lat)
+        rec["longitude"] = float(lon)
+        rec["meta_data"] = tag["meta_data"] if tag is not None else {}
+        return rec
+
+    def iter_records(self, start_row=0):
+        for block in self.blocks:
+            skip = start_row - block.row_start
+            if skip >= block.count:
+                continue
+            skip = max(skip, 0)
+            ts, lat, lon = self.columns(block)
+            tags = self._block_tags(block)
+            for i, (t, la, lo) in enumerate(zip(ts[skip:].tolist(), lat[skip:].tolist(), lon[skip:].tolist()), skip):
+                yield self._make_record(t, la, lo, tags.get(i))
+
+    def row_at(self, ts):
+        """First row with a timestamp at or after ``ts``, assuming rows are in tick order."""
+        for block in self.blocks:
+            block_ts = self.columns(block)[0]
+            if block.count and block_ts[-1] >= ts:
+                return block.row_start + int(np.searchsorted(block_ts, ts, side="left"))
+        return self.row_count
+
+    def stats(self):
+        stats = RouteStats()
+        stats.byte_size = self.size
+        ts, lat, lon, tag_rows, _ = self.arrays()
+        stats.point_count = len(ts)
+        if len(ts):
+            stats.start_ts, stats.end_ts = float(ts.min()), float(ts.max())
+            stats.min_lat, stats.max_lat = float(lat.min()), float(lat.max())
+            stats.min_lon, stats.max_lon = float(lon.min()), float(lon.max())
+        return stats
+
+    def close(self):
+        self._tag_cache = (None, None)
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # column views are still in use; the mapping is released with them
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def summarize_binary_route(path):
+    with BinaryRouteReader(path) as reader:
+        return reader.stats()
+
+
+class BinaryRouteSink:
+    """Appends records to a ``.rbin`` file in blocks of up to ``block_records``.
+
+    Records are buffered until a block fills up or ``flush`` is called. When
+    appending to an existing file its dictionary is reloaded and any torn
+    block at the tail is cut off first. ``info`` adds fields to the header of
+    a new file.
+    """
+
+    def __init__(self, path, taxonomy=None, project_name=None, block_records=BLOCK_RECORDS, info=None):
+        self.path = path
+        self.block_records = block_records
+        self.bytes_written = 0
+        self.io_seconds = 0.0  # time spent in file writes, as opposed to encoding
+        self._pending = []
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with BinaryRouteReader(path) as reader:
+                self.dictionary = list(reader.dictionary)
+                valid_size = reader.valid_size
+            self._f = open(path, "r+b")
+            self._f.truncate(valid_size)
+            self._f.seek(valid_size)
+        else:
+            self.dictionary = [tuple(p) for p in taxonomy_dictionary(taxonomy)]
+            self._f = open(path, "wb")
+            header = json.dumps({
+                "projectName": project_name,
+                "dictionary": [list(p) for p in self.dictionary],
+                **(info or {}),
+            }).encode("utf-8")
+            self._write(FILE_HEADER.pack(MAGIC, VERSION, 0, len(header)) + _padded(header))
+        self._codes = {pair: i for i, pair in enumerate(self.dictionary)}
+
+    def _write(self, data):
+        t = time.perf_counter()
+        self._f.write(data)
+        self.io_seconds += time.perf_counter() - t
+        self.bytes_written += len(data)
+
+    def write(self, records):
+        self._pending.extend(records)
+        while len(self._pending) >= self.block_records:
+            self._write_block(self._pending[:self.block_records])
+            del self._pending[:self.block_records]
+
+    def _write_block(self, records):
+        n = len(records)
+        cols = np.empty((3, n), dtype=np.float64)
+        tags = {}
+        for i, rec in enumerate(records):
+            cols[0, i] = rec["tick_timestamp"]
+            cols[1, i] = rec["latitude"]
+            cols[2, i] = rec["longitude"]
+            meta = rec.get("meta_data")
+            if meta:
+                tags[i] = (rec.get("meta_submitted_at"), meta)
+        self._write_columns(cols, tags)
+
+    def write_columns(self, ts, lat, lon, tags=None):
+        """Writes one block straight from columns, after any buffered records.
+
+        ``tags`` maps rows of the block to ``(meta_submitted_at, meta_data)``;
+        ``meta_submitted_at`` is ``None`` for fixes that carry metadata.
+        """
+        if self._pending:
+            self._write_block(self._pending)
+            self._pending = []
+        self._write_columns(np.vstack((ts, lat, lon)).astype(np.float64, copy=False), tags or {})
+
+    def _write_columns(self, cols, tags):
+        submitted, meta_rows, meta_codes, new_pairs = [], [], [], []
+        for i, (sub, meta) in tags.items():
+            for cls, attr in meta.items():
+                pair = (str(cls), str(attr))
+                code = self._codes.get(pair)
+                if code is None:
+                    code = self._codes[pair] = len(self.dictionary)
+                    self.dictionary.append(pair)
+                    new_pairs.append(list(pair))
+                submitted.append(np.nan if sub is None else sub)
+                meta_rows.append(i)
+                meta_codes.append(code)
+
+        dict_json = json.dumps(new_pairs).encode("utf-8") if new_pairs else b""
+        m = len(meta_rows)
+        body = (cols.tobytes()
+                + np.asarray(submitted, dtype=np.float64).tobytes()
+                + np.asarray(meta_rows, dtype=np.int32).tobytes()
+                + np.asarray(meta_codes, dtype=np.int32).tobytes())
+        self._write(BLOCK_HEADER.pack(BLOCK_MAGIC, cols.shape[1], m, len(dict_json))
+                    + _padded(dict_json) + _padded(body))
+
+    def flush(self):
+        if self._pending:
+            self._write_block(self._pending)
+            self._pending = []
+        self._f.flush()
+
+    def fsync(self):
+        self.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self.flush()
+        self._f.close()
+
+
+def jsonl_to_binary(src, dst, taxonomy=None, project_name=None):
+    """Writes ``src`` to ``dst`` in the binary format, replacing ``dst`` once it is complete."""
+    tmp = dst + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)  # left by an interrupted conversion; the sink would append to it
+    sink = BinaryRouteSink(tmp, taxonomy, project_name)
+    count = 0
+    try:
+        for batch in read_records(src):  # torn or incomplete lines are skipped
+            sink.write(batch)
+            count += len(batch)
+        sink.fsync()
+    except BaseException:
+        sink.close()
+        os.remove(tmp)
+        raise
+    sink.close()
+    os.replace(tmp, dst)
+    return count
+
+
+def binary_to_jsonl(src, dst):
+    count = 0
+    with BinaryRouteReader(src) as reader, open(dst, "wb") as out:
+        for rec in reader.iter_records():
+            out.write(encode_record(rec) + b"\n")
+            count += 1
+    return count
+
+
+def migrate_routes(route_dir=ROUTE_DIR, project_dir=os.path.join("app_data", "projects"), remove_source=False,
+                   retag_state_path=os.path.join("app_data", "retag.json")):
+    """Converts every ``*.jsonl`` route in ``route_dir`` to the binary format.
+
+    Each project's taxonomy seeds the dictionary of its routes, and each
+    copy takes over its source's taxonomy version in the retag journal.
+    Sources are only removed (with ``remove_source``) once their binary copy
+    is complete; a kept source is ignored by readers (see
+    ``route_segments.drop_converted``). Returns a list of
+    ``(source, destination, records)``.
+    """
+    from .retag import RetagState
+
+    retag_state = RetagState(retag_state_path)
+    taxonomies = {}
+    migrated = []
+    for name in sorted(os.listdir(route_dir)):
+        if not name.endswith(".jsonl") or name.endswith(EVENTS_SUFFIX):
+            continue
+        src = os.path.join(route_dir, name)
+        dst = src[:-len(".jsonl")] + EXTENSION
+        if os.path.exists(dst):
+            continue
+
+        parsed = parse_route_name(name)
+        project = parsed[0] if parsed else None
+        if project not in taxonomies:
+            try:
+                with open(os.path.join(project_dir, f"{project}.json"), "r") as f:
+                    taxonomies[project] = json.load(f).get("taxonomy", [])
+            except (OSError, ValueError):
+                taxonomies[project] = []
+
+        count = jsonl_to_binary(src, dst, taxonomies[project], project)
+        st = os.stat(src)
+        os.utime(dst, (st.st_atime, st.st_mtime))
+        retag_state.carry_over([name], os.path.basename(dst))
+        if remove_source:
+            os.remove(src)
+        migrated.append((src, dst, count))
+    return migrated
@@ -0,0 +1,281 @@
+import os
+import re
+import sqlite3
+
+from .records import read_records
+from .route_segments import (
+    converted, drop_converted, segment_number, session_name, session_segments, strip_compression
+)
+
+ROUTE_DIR = os.path.join("app_data", "routes")
+CATALOG_PATH = os.path.join("app_data", "routes.db")
+
+# route_<project>[@<device>]_<ts>...; routes of fleet devices carry the device id
+ROUTE_NAME_RE = re.compile(
+    r"^route_(?P<project>[^@]+?)(?:@(?P<device>.+))?_(?P<ts>\d+)(?:\.s\d+)?\.(?:jsonl|rbin)(?:\.gz|\.zst)?$"
+)
+
+SORT_COLUMNS = ("filename", "start_ts", "end_ts", "point_count", "byte_size", "mtime")
+
+
+def parse_route_name(filename):
+    """Returns ``(project, session_ts)`` for a route file or segment name, or ``None``."""
+    m = ROUTE_NAME_RE.match(filename)
+    if not m:
+        return None
+    return m.group("project"), int(m.group("ts"))
+
+
+def route_device(filename):
+    """The fleet device a route file was logged for, or ``None`` for the app's own sessions."""
+    m = ROUTE_NAME_RE.match(filename)
+    return m.group("device") if m else None
+
+
+def latest_session(project, route_dir=ROUTE_DIR):
+    """Segment paths of the project's most recently started session, read from disk.
+
+    Unlike the catalog this also sees sessions that are still being logged.
+    Fleet device routes are left out.
+    """
+    latest = None
+    for name in os.listdir(route_dir):
+        parsed = parse_route_name(name)
+        if parsed is None or route_device(name) is not None:
+            continue
+        if parsed[0] == project and (latest is None or parsed[1] > latest[0]):
+            latest = (parsed[1], session_name(name))
+    if latest is None:
+        return []
+    return session_segments(route_dir, latest[1])
+
+
+class RouteStats:
+    """Running summary of the records in a route: time span, point count and bbox."""
+
+    def __init__(self):
+        self.point_count = 0
+        self.start_ts = None
+        self.end_ts = None
+        self.min_lat = self.max_lat = None
+        self.min_lon = self.max_lon = None
+        self.byte_size = 0
+
+    def add(self, rec):
+        self.point_count += 1
+        ts = rec.get("tick_timestamp")
+        if isinstance(ts, (int, float)):
+            if self.start_ts is None or ts < self.start_ts:
+                self.start_ts = ts
+            if self.end_ts is None or ts > self.end_ts:
+                self.end_ts = ts
+
+        lat, lon = rec.get("latitude"), rec.get("longitude")
+        if isinstance(lat, (int, float)) and isinstance(lon, (int, float)):
+            if self.min_lat is None:
+                self.min_lat = self.max_lat = lat
+                self.min_lon = self.max_lon = lon
+            else:
+                self.min_lat = min(self.min_lat, lat)
+                self.max_lat = max(self.max_lat, lat)
+                self.min_lon = min(self.min_lon, lon)
+                self.max_lon = max(self.max_lon, lon)
+
+    def merge(self, other):
+        self.point_count += other.point_count
+        self.byte_size += other.byte_size
+        for attr, pick in (("start_ts", min), ("end_ts", max), ("min_lat", min),
+                           ("max_lat", max), ("min_lon", min), ("max_lon", max)):
+            mine, theirs = getattr(self, attr), getattr(other, attr)
+            if theirs is not None:
+                setattr(self, attr, theirs if mine is None else pick(mine, theirs))
+
+    @property
+    def bbox(self):
+        if self.min_lat is None:
+            return None
+        return self.min_lat, self.min_lon, self.max_lat, self.max_lon
+
+    @classmethod
+    def from_row(cls, row):
+        stats = cls()
+        stats.point_count = row["point_count"]
+        stats.start_ts, stats.end_ts = row["start_ts"], row["end_ts"]
+        stats.min_lat, stats.min_lon = row["min_lat"], row["min_lon"]
+        stats.max_lat, stats.max_lon = row["max_lat"], row["max_lon"]
+        stats.byte_size = row["byte_size"]
+        return stats
+
+
+def summarize_route(path):
+    if strip_compression(path).endswith(".rbin"):
+        from .route_binary import summarize_binary_route
+        return summarize_binary_route(path)
+
+    stats = RouteStats()
+    for batch in read_records(path):  # torn or corrupt lines are skipped
+        for rec in batch:
+            stats.add(rec)
+    stats.byte_size = os.path.getsize(path)
+    return stats
+
+
+class RouteCatalog:
+    """SQLite-backed summary of every route file under ``route_dir``.
+
+    Rows are keyed by file name and carry the file's size and mtime, so
+    ``revalidate`` only re-reads files that changed since they were cataloged.
+    Segments of one logging session share a ``session`` and are listed as a
+    single route by ``routes``.
+    """
+
+    def __init__(self, db_path=CATALOG_PATH, route_dir=ROUTE_DIR):
+        self.db_path = db_path
+        self.route_dir = route_dir
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS routes (
+                    filename TEXT PRIMARY KEY,
+                    project TEXT NOT NULL,
+                    start_ts REAL,
+                    end_ts REAL,
+                    point_count INTEGER NOT NULL DEFAULT 0,
+                    min_lat REAL, min_lon REAL, max_lat REAL, max_lon REAL,
+                    byte_size INTEGER NOT NULL DEFAULT 0,
+                    mtime REAL NOT NULL DEFAULT 0,
+                    session TEXT
+                )
+            """)
+            columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(routes)")}
+            if "session" not in columns:
+                # Catalogs created before segmented sessions
+                self.conn.execute("ALTER TABLE routes ADD COLUMN session TEXT")
+            for row in self.conn.execute("SELECT filename FROM routes WHERE session IS NULL").fetchall():
+                self.conn.execute("UPDATE routes SET session = ? WHERE filename = ?",
+                                  (session_name(row["filename"]), row["filename"]))
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS routes_project ON routes (project, start_ts)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS routes_session ON routes (session)")
+
+    def close(self):
+        self.conn.close()
+
+    def path_for(self, filename):
+        return os.path.join(self.route_dir, filename)
+
+    def get(self, filename):
+        return self.conn.execute(
+            "SELECT * FROM routes WHERE filename = ?", (filename,)
+        ).fetchone()
+
+    def _upsert(self, filename, project, stats, st):
+        self.conn.execute("""
+            INSERT OR REPLACE INTO routes (
+                filename, project, start_ts, end_ts, point_count,
+                min_lat, min_lon, max_lat, max_lon, byte_size, mtime, session
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            filename, project, stats.start_ts, stats.end_ts, stats.point_count,
+            stats.min_lat, stats.min_lon, stats.max_lat, stats.max_lon,
+            st.st_size, st.st_mtime, session_name(filename)
+        ))
+
+    def update_route(self, path, appended=None):
+        """Records the current state of a route file.
+
+        ``appended`` is the ``RouteStats`` of the records a writer just added.
+        If the cataloged row plus those bytes account for the whole file, the
+        two are merged without re-reading anything; otherwise the file is
+        summarized from scratch.
+        """
+        filename = os.path.basename(path)
+        parsed = parse_route_name(filename)
+        if parsed is None:
+            return None
+        if converted(path):
+            self.forget(filename)  # the session is read from its binary copy
+            return None
+        st = os.stat(path)
+
+        stats = None
+        if appended is not None:
+            row = self.get(filename)
+            if row is None and appended.byte_size == st.st_size:
+                stats = appended
+            elif row is not None and row["byte_size"] + appended.byte_size == st.st_size:
+                stats = RouteStats.from_row(row)
+                stats.merge(appended)
+        if stats is None:
+            stats = summarize_route(path)
+
+        with self.conn:
+            self._upsert(filename, parsed[0], stats, st)
+        return stats
+
+    def revalidate(self):
+        """Brings the catalog in line with the route directory.
+
+        Only files whose size or mtime differ from their row are re-read.
+        Returns ``(updated, removed)`` counts.
+        """
+        known = {
+            row["filename"]: (row["byte_size"], row["mtime"])
+            for row in self.conn.execute("SELECT filename, byte_size, mtime FROM routes")
+        }
+        updated = 0
+        seen = set()
+
+        os.makedirs(self.route_dir, exist_ok=True)
+        with self.conn:
+            entries = [entry for entry in os.scandir(self.route_dir) if entry.is_file()]
+            current = set(drop_converted([entry.name for entry in entries]))
+            for entry in entries:
+                parsed = parse_route_name(entry.name)
+                if parsed is None or entry.name not in current:
+                    continue
+                seen.add(entry.name)
+                st = entry.stat()
+                if known.get(entry.name) == (st.st_size, st.st_mtime):
+                    continue
+                self._upsert(entry.name, parsed[0], summarize_route(entry.path), st)
+                updated += 1
+
+            removed = [name for name in known if name not in seen]
+            self.conn.executemany("DELETE FROM routes WHERE filename = ?", [(n,) for n in removed])
+
+        return updated, len(removed)
+
+    def forget(self, filename):
+        with self.conn:
+            self.conn.execute("DELETE FROM routes WHERE filename = ?", (filename,))
+
+    def routes(self, project, order_by="start_ts", descending=True):
+        """One row per session, aggregated over its segments."""
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort routes by {order_by}")
+        direction = "DESC" if descending else "ASC"
+        return self.conn.execute(f"""
+            SELECT session, project, MIN(filename) AS filename, COUNT(*) AS segment_count,
+                   MIN(start_ts) AS start_ts, MAX(end_ts) AS end_ts,
+                   SUM(point_count) AS point_count,
+                   MIN(min_lat) AS min_lat, MIN(min_lon) AS min_lon,
+                   MAX(max_lat) AS max_lat, MAX(max_lon) AS max_lon,
+                   SUM(byte_size) AS byte_size, MAX(mtime) AS mtime
+            FROM routes WHERE project = ?
+            GROUP BY session
+            ORDER BY {order_by} {direction}, session {direction}
+        """, (project,)).fetchall()
+
+    def session_paths(self, session):
+        """Paths of a session's segments in stream order."""
+        names = [row["filename"] for row in self.conn.execute(
+            "SELECT filename FROM routes WHERE session = ?", (session,)
+        )]
+        return [self.path_for(name) for name in sorted(names, key=segment_number)]
@@ -0,0 +1,175 @@
+import math
+
+import numpy as np
+
+from .location import EARTH_RADIUS_M
+
+MIN_TOLERANCE_M = 1.0
+CHUNK_POINTS = 512
+MIN_LEVEL_POINTS = 64
+
+
+def project(lat, lon, origin):
+    """Equirectangular projection to metres around ``origin`` (lat, lon); y grows southwards.
+
+    Accurate to well under a pixel over the extent of a city, which is all
+    the route map needs, and keeps every route in one shared plane.
+    """
+    lat0, lon0 = origin
+    k = EARTH_RADIUS_M * math.pi / 180.0
+    x = (np.asarray(lon) - lon0) * (k * math.cos(math.radians(lat0)))
+    y = (lat0 - np.asarray(lat)) * k
+    return x, y
+
+
+def unproject(x, y, origin):
+    lat0, lon0 = origin
+    k = EARTH_RADIUS_M * math.pi / 180.0
+    return lat0 - np.asarray(y) / k, lon0 + np.asarray(x) / (k * math.cos(math.radians(lat0)))
+
+
+def douglas_peucker_importance(x, y, min_tolerance=MIN_TOLERANCE_M):
+    """Douglas–Peucker tolerance at which each vertex stops being dropped.
+
+    Simplifying at tolerance ``t`` keeps exactly the vertices with
+    ``importance >= t``, so one pass yields every level of detail. A child
+    split never outranks its parent, which keeps the levels nested.
+    Vertices below ``min_tolerance`` are not ranked (importance 0).
+
+    All segments at the same depth of the split tree are processed together,
+    so the work is a few array passes per tree level rather than per vertex.
+    """
+    n = len(x)
+    importance = np.zeros(n)
+    if n == 0:
+        return importance
+    importance[0] = importance[-1] = np.inf
+    min_d2 = min_tolerance * min_tolerance
+
+    starts = np.array([0], dtype=np.int64)
+    ends = np.array([n - 1], dtype=np.int64)
+    parents = np.array([np.inf])
+    while len(starts):
+        inner = ends - starts - 1
+        has_inner = inner > 0
+        starts, ends, parents, inner = starts[has_inner], ends[has_inner], parents[has_inner], inner[has_inner]
+        if not len(starts):
+            break
+
+        # Interior vertex indices of every segment, laid out segment after segment
+        offsets = np.concatenate(([0], np.cumsum(inner)[:-1]))
+        owner = np.repeat(np.arange(len(starts)), inner)
+        idx = np.arange(inner.sum()) - offsets[owner] + starts[owner] + 1
+
+        ax, ay = x[starts], y[starts]
+        dx, dy = x[ends] - ax, y[ends] - ay
+        length2 = dx * dx + dy * dy
+        px, py = x[idx] - ax[owner], y[idx] - ay[owner]
+        sdx, sdy, slen2 = dx[owner], dy[owner], length2[owner]
+        # Distance to the segment, not the line, so loops back to the start survive
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(slen2 > 0.0, (px * sdx + py * sdy) / slen2, 0.0)
+        t = np.clip(t, 0.0, 1.0)
+        px -= t * sdx
+        py -= t * sdy
+        d2 = px * px + py * py
+
+        seg_max = np.maximum.reduceat(d2, offsets)
+        at_max = np.flatnonzero(d2 == seg_max[owner])
+        first = at_max[np.unique(owner[at_max], return_index=True)[1]]
+        split = seg_max >= min_d2
+        if not split.any():
+            break
+        k = idx[first][split]
+        rank = np.minimum(np.sqrt(seg_max[split]), parents[split])
+        importance[k] = rank
+
+        starts = np.concatenate((starts[split], k))
+        ends = np.concatenate((k, ends[split]))
+        parents = np.concatenate((rank, rank))
+    return importance
+
+
+class Level:
+    """One resolution of a route: kept vertex indices split into culling chunks."""
+
+    def __init__(self, tolerance, indices, x, y, chunk_points=CHUNK_POINTS):
+        self.tolerance = tolerance
+        self.indices = indices
+        # Chunks share their last vertex with the next one so the line stays unbroken
+        starts = np.arange(0, max(len(indices) - 1, 1), chunk_points)
+        ends = np.minimum(starts + chunk_points + 1, len(indices))
+        self.chunks = list(zip(starts.tolist(), ends.tolist()))
+        lx, ly = x[indices], y[indices]
+        self.bounds = np.array([
+            (lx[s:e].min(), ly[s:e].min(), lx[s:e].max(), ly[s:e].max()) for s, e in self.chunks
+        ]) if len(indices) else np.empty((0, 4))
+
+    def __len__(self):
+        return len(self.indices)
+
+    def visible_chunks(self, min_x, min_y, max_x, max_y):
+        b = self.bounds
+        hit = (b[:, 0] <= max_x) & (b[:, 2] >= min_x) & (b[:, 1] <= max_y) & (b[:, 3] >= min_y)
+        return np.flatnonzero(hit)
+
+
+class RoutePyramid:
+    """Multi-resolution geometry of one route in projected metres.
+
+    ``levels[0]`` holds every fix; each further level doubles the
+    Douglas–Peucker tolerance until only a handful of vertices are left.
+    Tagged ticks are kept separately as markers with the index of their
+    first taxonomy class (-1 if none of the tags is in the taxonomy).
+    """
+
+    def __init__(self, arrays, origin, taxonomy=None, min_tolerance=MIN_TOLERANCE_M):
+        arrays = arrays.sorted_by_time()
+        ok = np.isfinite(arrays.lat) & np.isfinite(arrays.lon)
+        keep = np.flatnonzero(ok)
+        self.ts = arrays.ts[keep]
+        self.x, self.y = project(arrays.lat[keep], arrays.lon[keep], origin)
+        self.x = np.ascontiguousarray(self.x)
+        self.y = np.ascontiguousarray(self.y)
+        self.bounds = (
+            (float(self.x.min()), float(self.y.min()), float(self.x.max()), float(self.y.max()))
+            if len(self.x) else (0.0, 0.0, 0.0, 0.0)
+        )
+
+        importance = douglas_peucker_importance(self.x, self.y, min_tolerance)
+        self.levels = [Level(0.0, np.arange(len(self.x)), self.x, self.y)]
+        tolerance = min_tolerance
+        while len(self.levels[-1]) > MIN_LEVEL_POINTS:
+            indices = np.flatnonzero(importance >= tolerance)
+            if len(indices) < len(self.levels[-1]):
+                self.levels.append(Level(tolerance, indices, self.x, self.y))
+            tolerance *= 2.0
+
+        self._build_markers(arrays, ok, keep, taxonomy or [])
+
+    def _build_markers(self, arrays, ok, keep, taxonomy):
+        class_order = {entry["className"]: i for i, entry in enumerate(taxonomy)}
+        # Tag rows refer to the unfiltered arrays; map them onto the kept fixes
+        position = np.full(len(ok), -1, dtype=np.int64)
+        position[keep] = np.arange(len(keep))
+        rows, classes = [], []
+        for row, meta in zip(np.asarray(arrays.tag_rows).tolist(), arrays.tags):
+            if position[row] < 0:
+                continue
+            ranks = [class_order[c] for c in meta if c in class_order]
+            rows.append(position[row])
+            classes.append(min(ranks) if ranks else -1)
+        self.marker_rows = np.array(rows, dtype=np.int64)
+        self.marker_classes = np.array(classes, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.x)
+
+    def level_for(self, tolerance):
+        """The coarsest level whose tolerance does not exceed ``tolerance`` (metres)."""
+        best = self.levels[0]
+        for level in self.levels[1:]:
+            if level.tolerance > tolerance:
+                break
+            best = level
+        return best
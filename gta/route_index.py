@@ -0,0 +1,230 @@
+import os
+import mmap
+import operator
+from array import array
+from collections import OrderedDict
+from bisect import bisect_right
+from itertools import accumulate, islice, repeat
+
+from .records import loads
+from .route_segments import open_mappable, strip_compression
+
+INDEX_CHUNK = 16 * 1024 * 1024
+
+
+class RouteIndex:
+    """Line-offset index over a memory-mapped JSONL route file.
+
+    The index is built when the file is opened; individual records are only
+    decoded when asked for, and the most recently used ones are kept in a
+    bounded LRU cache.
+
+    With ``build=False`` nothing is indexed up front: ``scan`` finds the line
+    starts of the next stretch of the file (it only reads the mapping, so it
+    can run on a worker thread) and ``extend`` makes those rows available.
+    ``size`` is the number of bytes indexed so far.
+    """
+
+    def __init__(self, path, cache_size=4096, build=True):
+        self.path = path
+        self.cache_size = cache_size
+        self.offsets = array("q")
+        self.size = 0
+        self.mapped_size = 0
+
+        self._cache = OrderedDict()
+        self._file = open_mappable(path)
+        self._mm = None
+        self._map()
+        if build:
+            self._build(0)
+        else:
+            self.size = 0
+
+    def _map(self):
+        self.size = self.mapped_size = os.fstat(self._file.fileno()).st_size
+        if self.size:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def complete(self):
+        return self.size >= self.mapped_size
+
+    def refresh(self):
+        """Indexes whatever was appended to the file since it was last indexed.
+
+        Returns the first row that is new or changed: a last line that was
+        still being written is re-read along with the new ones.
+        """
+        size = os.fstat(self._file.fileno()).st_size
+        if size == self.size:
+            return len(self.offsets)
+        if size < self.size:
+            # Truncated or replaced in place: start over
+            self.offsets = array("q")
+            self._cache.clear()
+            first = start = 0
+        elif self.size and self._mm[self.size - 1] != 0x0A:
+            start = self.offsets.pop()
+            first = len(self.offsets)
+            self._cache.pop(first, None)
+        else:
+            first = len(self.offsets)
+            start = self.size
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._map()
+        self._build(start)
+        return first
+
+    def _build(self, start):
+        while start < self.size:
+            offsets, start = self.scan(start, stop=self.size)
+            self.offsets.extend(offsets)
+
+    def scan(self, start, limit=INDEX_CHUNK, stop=None):
+        """``(offsets, end)``: the starts of the lines from ``start`` to a line end about ``limit`` bytes on.
+
+        Line starts are found with C-level split/accumulate, which keeps
+        indexing of large files well under a second per GB.
+        """
+        stop = self.mapped_size if stop is None else stop
+        end = min(start + limit, stop)
+        if end < stop:
+            cut = self._mm.rfind(b"\n", start, end)
+            if cut < 0:
+                cut = self._mm.find(b"\n", end, stop)  # a line longer than the chunk
+            end = stop if cut < 0 else cut + 1
+        parts = self._mm[start:end].split(b"\n")
+        steps = map(operator.add, map(len, islice(parts, len(parts) - 1)), repeat(1))
+        offsets = array("q", accumulate(steps, initial=start))
+        if offsets[-1] == end:
+            offsets.pop()
+        return offsets, end
+
+    def extend(self, offsets, end):
+        """Adds the rows ``scan`` found, up to byte ``end``."""
+        self.offsets.extend(offsets)
+        self.size = end
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def line(self, row):
+        start = self.offsets[row]
+        end = self.offsets[row + 1] if row + 1 < len(self.offsets) else self.size
+        return self._mm[start:end].rstrip(b"\r\n")
+
+    def record(self, row):
+        """Returns the decoded record for ``row``, or ``None`` if the line is not valid JSON."""
+        cache = self._cache
+        if row in cache:
+            cache.move_to_end(row)
+            return cache[row]
+
+        try:
+            rec = loads(self.line(row))
+        except ValueError:
+            rec = None
+        cache[row] = rec
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return rec
+
+    def close(self):
+        self._cache.clear()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionIndex:
+    """Row index over all segments of a session, opened one segment at a time.
+
+    Only the first segment is indexed up front; ``load_next``/``commit_next``
+    bring in the following ones as the viewer asks for more rows.
+    """
+
+    def __init__(self, paths, cache_size=4096):
+        self.paths = list(paths)
+        self.cache_size = cache_size
+        self.parts = []
+        self.starts = []
+        self.row_count = 0
+        self._next = None
+        while self.can_load_more() and not self.row_count:
+            self.load_next()
+            self.commit_next()
+
+    def can_load_more(self):
+        return len(self.parts) + (self._next is not None) < len(self.paths)
+
+    def load_next(self):
+        """Indexes the next segment and returns its row count, without exposing it yet."""
+        if self._next is None:
+            self._next = open_route_index(self.paths[len(self.parts)], self.cache_size)
+        return len(self._next)
+
+    def commit_next(self):
+        self.starts.append(self.row_count)
+        self.parts.append(self._next)
+        self.row_count += len(self._next)
+        self._next = None
+
+    def add_paths(self, paths):
+        """Appends segments written after the session was opened."""
+        self.paths.extend(paths)
+
+    def refresh(self):
+        """Picks up rows appended to the last loaded segment; returns the first new or changed row."""
+        if not self.parts:
+            return self.row_count
+        part = self.parts[-1]
+        first = self.starts[-1] + part.refresh()
+        self.row_count = self.starts[-1] + len(part)
+        return first
+
+    def __len__(self):
+        return self.row_count
+
+    def _locate(self, row):
+        i = bisect_right(self.starts, row) - 1
+        return self.parts[i], row - self.starts[i]
+
+    def record(self, row):
+        part, local = self._locate(row)
+        return part.record(local)
+
+    def line(self, row):
+        part, local = self._locate(row)
+        return part.line(local)
+
+    def close(self):
+        for part in self.parts:
+            part.close()
+        if self._next is not None:
+            self._next.close()
+        self.parts = []
+
+
+def open_route_index(path, cache_size=4096, build=True):
+    """Opens a random-access reader for a route file or a list of session segments.
+
+    ``build=False`` leaves a JSONL file's ``RouteIndex`` to be built with ``scan``/``extend``.
+    """
+    if not isinstance(path, str):
+        if len(path) == 1:
+            return open_route_index(path[0], cache_size)
+        return SessionIndex(path, cache_size)
+    if strip_compression(path).endswith(".rbin"):
+        from .route_binary import BinaryRouteReader
+        return BinaryRouteReader(path)
+    return RouteIndex(path, cache_size, build)
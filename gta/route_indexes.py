@@ -0,0 +1,110 @@
+import os
+import sqlite3
+
+from .analytics import read_route_arrays
+from .route_catalog import ROUTE_DIR, parse_route_name
+from .route_segments import converted, drop_converted
+
+
+class RouteFileIndex:
+    """Base for SQLite indexes derived from the contents of route files.
+
+    Tracks the size and mtime each file had when it was indexed, so ``sync``
+    only re-reads files that changed. Subclasses name their ``FILES_TABLE``
+    and implement ``_create_tables``, ``_insert`` and ``_delete``.
+    """
+
+    FILES_TABLE = None
+
+    def __init__(self, db_path, route_dir=ROUTE_DIR):
+        self.db_path = db_path
+        self.route_dir = route_dir
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.FILES_TABLE} (
+                    filename TEXT PRIMARY KEY,
+                    project TEXT NOT NULL,
+                    byte_size INTEGER NOT NULL,
+                    mtime REAL NOT NULL
+                )
+            """)
+            self._create_tables()
+
+    def _create_tables(self):
+        raise NotImplementedError
+
+    def _insert(self, filename, project, arrays):
+        raise NotImplementedError
+
+    def _delete(self, filename):
+        raise NotImplementedError
+
+    def close(self):
+        self.conn.close()
+
+    def update_route(self, path):
+        """(Re-)indexes one route file."""
+        filename = os.path.basename(path)
+        parsed = parse_route_name(filename)
+        if parsed is None:
+            return
+        if converted(path):
+            self.forget(filename)  # indexed from its binary copy
+            return
+        st = os.stat(path)
+        arrays = read_route_arrays(path)
+        with self.conn:
+            self._delete(filename)
+            self._insert(filename, parsed[0], arrays)
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.FILES_TABLE} (filename, project, byte_size, mtime) "
+                "VALUES (?, ?, ?, ?)",
+                (filename, parsed[0], st.st_size, st.st_mtime)
+            )
+
+    def forget(self, filename):
+        with self.conn:
+            self._delete(filename)
+            self.conn.execute(f"DELETE FROM {self.FILES_TABLE} WHERE filename = ?", (filename,))
+
+    def sync(self, project=None):
+        """Indexes new or changed route files and drops deleted ones.
+
+        Limited to one project when ``project`` is given. Returns ``(updated, removed)``.
+        """
+        sql = f"SELECT filename, byte_size, mtime FROM {self.FILES_TABLE}"
+        params = ()
+        if project is not None:
+            sql += " WHERE project = ?"
+            params = (project,)
+        known = {
+            row["filename"]: (row["byte_size"], row["mtime"])
+            for row in self.conn.execute(sql, params)
+        }
+
+        updated = 0
+        seen = set()
+        os.makedirs(self.route_dir, exist_ok=True)
+        entries = [entry for entry in os.scandir(self.route_dir) if entry.is_file()]
+        current = set(drop_converted([entry.name for entry in entries]))
+        for entry in entries:
+            parsed = parse_route_name(entry.name)
+            if parsed is None or entry.name not in current or (project is not None and parsed[0] != project):
+                continue
+            seen.add(entry.name)
+            st = entry.stat()
+            if known.get(entry.name) == (st.st_size, st.st_mtime):
+                continue
+            try:
+                self.update_route(entry.path)
+            except (OSError, ValueError):
+                continue  # unreadable now; retried on the next sync
+            updated += 1
+
+        removed = [name for name in known if name not in seen]
+        for name in removed:
+            self.forget(name)
+        return updated, len(removed)
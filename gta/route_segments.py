@@ -0,0 +1,301 @@
+import io
+import os
+import re
+import gzip
+import queue
+import shutil
+import struct
+import tempfile
+import threading
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used instead
+    zstandard = None
+
+COMPRESSED_EXTENSIONS = (".gz", ".zst")
+# Side files of a session, next to its segments: metadata submissions, logging metrics and
+# the manifest of a running session
+EVENTS_SUFFIX = ".events.jsonl"
+METRICS_SUFFIX = ".metrics.json"
+SESSION_SUFFIX = ".session.json"  # manifest of a session that is still being logged
+
+# route_<project>_<ts>[.s<seq>].<jsonl|rbin>[.gz|.zst]
+SEGMENT_RE = re.compile(
+    r"^(?P<session>route_.+_\d+)(?:\.s(?P<seq>\d+))?\.(?P<fmt>jsonl|rbin)(?P<comp>\.gz|\.zst)?$"
+)
+
+
+def strip_compression(path):
+    for ext in COMPRESSED_EXTENSIONS:
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+
+def is_compressed(path):
+    return path.endswith(COMPRESSED_EXTENSIONS)
+
+
+def session_name(filename):
+    m = SEGMENT_RE.match(os.path.basename(filename))
+    return m.group("session") if m else None
+
+
+def sidecar_path(route_file, suffix):
+    """Path of a session's side file: ``route_P_123.s0002.jsonl.gz`` -> ``route_P_123<suffix>``."""
+    name = session_name(route_file) or os.path.splitext(strip_compression(os.path.basename(route_file)))[0]
+    return os.path.join(os.path.dirname(route_file), name + suffix)
+
+
+def segment_number(filename):
+    m = SEGMENT_RE.match(os.path.basename(filename))
+    return int(m.group("seq")) if m and m.group("seq") else 0
+
+
+def segment_path(session_path, seq):
+    """``route_P_123.jsonl`` -> ``route_P_123.s0001.jsonl`` for ``seq=1``."""
+    base, ext = os.path.splitext(session_path)
+    return f"{base}.s{seq:04d}{ext}"
+
+
+def _binary_names(name):
+    base = strip_compression(name)[:-len(".jsonl")] + ".rbin"
+    return [base] + [base + ext for ext in COMPRESSED_EXTENSIONS]
+
+
+def converted(path):
+    """Whether ``path`` is a JSONL route file that also exists in the binary format."""
+    if not strip_compression(path).endswith(".jsonl") or session_name(path) is None:
+        return False
+    return any(os.path.exists(p) for p in _binary_names(path))
+
+
+def drop_converted(names):
+    """``names`` (file names or paths) without the JSONL route files that also exist as ``.rbin``.
+
+    ``gta migrate`` keeps its sources unless asked to remove them; readers
+    take the binary copy so such a session is not read twice.
+    """
+    present = {os.path.basename(name) for name in names}
+    return [name for name in names
+            if not (strip_compression(name).endswith(".jsonl") and session_name(name) is not None
+                    and any(b in present for b in _binary_names(os.path.basename(name))))]
+
+
+def session_segments(route_dir, session):
+    """Returns the files of a session in stream order."""
+    paths = []
+    for name in os.listdir(route_dir):
+        if session_name(name) == session:
+            paths.append(os.path.join(route_dir, name))
+    return sorted(drop_converted(paths), key=segment_number)
+
+
+def resolve_compression(method):
+    if method in (None, "", "none"):
+        return None
+    if method == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if method == "zstd" and zstandard is None:
+        return "gzip"
+    if method not in ("gzip", "zstd"):
+        raise ValueError(f"Unknown compression: {method}")
+    return method
+
+
+def open_segment(path):
+    """Opens a segment for reading bytes, decompressing on the fly."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise OSError(f"zstandard is required to read {path}")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def open_mappable(path):
+    """Returns a real, mmap-able file with the segment's uncompressed contents.
+
+    Plain files are opened directly; compressed ones are decompressed into an
+    anonymous temporary file so readers can still map and seek them.
+    """
+    if not is_compressed(path):
+        return open(path, "rb")
+    tmp = tempfile.TemporaryFile()
+    with open_segment(path) as src:
+        shutil.copyfileobj(src, tmp, 1024 * 1024)
+    tmp.flush()
+    tmp.seek(0)
+    return tmp
+
+
+def uncompressed_size(path):
+    if path.endswith(".gz"):
+        # ISIZE trailer: uncompressed length mod 2**32 (segments stay well below 4 GB)
+        with open(path, "rb") as f:
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack("<I", f.read(4))[0]
+    if path.endswith(".zst") and zstandard is not None:
+        with open(path, "rb") as f:
+            size = zstandard.frame_content_size(f.read(18))
+        if size >= 0:
+            return size
+    if is_compressed(path):
+        total = 0
+        with open_segment(path) as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                total += len(chunk)
+        return total
+    return os.path.getsize(path)
+
+
+def compress_file(path, method="gzip", level=None):
+    """Compresses ``path`` next to itself and removes the original.
+
+    The compressed copy is written to a temporary name, fsync'ed and renamed,
+    so a crash leaves either the original or a complete compressed file.
+    """
+    method = resolve_compression(method) or "gzip"
+    dst = path + (".zst" if method == "zstd" else ".gz")
+    tmp = dst + ".tmp"
+    with open(path, "rb") as src, open(tmp, "wb") as raw:
+        if method == "zstd":
+            cctx = zstandard.ZstdCompressor(level=level or 3)
+            cctx.copy_stream(src, raw, size=os.fstat(src.fileno()).st_size)
+        else:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level or 6,
+                               filename="", mtime=0) as gz:
+                shutil.copyfileobj(src, gz, 1024 * 1024)
+        raw.flush()
+        os.fsync(raw.fileno())
+    st = os.stat(path)
+    os.replace(tmp, dst)
+    os.utime(dst, (st.st_atime, st.st_mtime))
+    os.remove(path)
+    return dst
+
+
+class SegmentCompressor:
+    """Compresses closed segments one at a time on a background thread."""
+
+    def __init__(self, method="gzip"):
+        self.method = method
+        self.errors = []
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def submit(self, path, callback=None):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="SegmentCompressor", daemon=True)
+            self._thread.start()
+        self._queue.put((path, callback))
+
+    def join(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, callback = item
+            try:
+                dst = compress_file(path, self.method)
+            except Exception as e:
+                self.errors.append((path, e))
+                continue
+            if callback is not None:
+                callback(path, dst)
+
+
+class SessionStream(io.RawIOBase):
+    """Read-only, seekable byte stream over all segments of a session.
+
+    Offsets are positions in the concatenated uncompressed data. Seeking
+    within a compressed segment decompresses from its start when moving
+    backwards, so sequential reads are the fast path.
+    """
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = list(paths)
+        self.sizes = [uncompressed_size(p) for p in self.paths]
+        self.starts = []
+        total = 0
+        for size in self.sizes:
+            self.starts.append(total)
+            total += size
+        self.length = total
+        self._pos = 0
+        self._seg = -1
+        self._fh = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self._pos = max(0, offset)
+        return self._pos
+
+    def _open(self, seg):
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = open_segment(self.paths[seg])
+        self._seg = seg
+
+    def readinto(self, buf):
+        if self._pos >= self.length:
+            return 0
+        seg = 0
+        while seg + 1 < len(self.starts) and self.starts[seg + 1] <= self._pos:
+            seg += 1
+        local = self._pos - self.starts[seg]
+        if seg != self._seg:
+            self._open(seg)
+        if self._fh.tell() != local:
+            try:
+                self._fh.seek(local)
+            except (OSError, io.UnsupportedOperation):
+                self._open(seg)
+                _skip(self._fh, local)
+
+        want = min(len(buf), self.sizes[seg] - local)
+        data = self._fh.read(want)
+        n = len(data)
+        buf[:n] = data
+        self._pos += n
+        return n
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        super().close()
+
+
+def _skip(fh, count):
+    while count > 0:
+        chunk = fh.read(min(count, 1024 * 1024))
+        if not chunk:
+            break
+        count -= len(chunk)
+
+
+def open_session(paths):
+    """Buffered reader over a session's segments (supports ``readline`` and iteration)."""
+    return io.BufferedReader(SessionStream(paths), buffer_size=1024 * 1024)
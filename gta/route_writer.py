@@ -0,0 +1,272 @@
+import os
+import queue
+import threading
+import time
+
+from .records import encode_records
+from .route_catalog import RouteStats
+from .route_segments import (
+    SegmentCompressor, resolve_compression, segment_number, segment_path, session_segments,
+    is_compressed
+)
+
+_STOP = object()
+
+
+class JsonlSink:
+    def __init__(self, path):
+        self.bytes_written = 0
+        self.io_seconds = 0.0  # time spent in file writes, as opposed to encoding
+        self._f = open(path, "ab")
+
+    def write(self, records):
+        chunk = encode_records(records)
+        t = time.perf_counter()
+        self._f.write(chunk)
+        self.io_seconds += time.perf_counter() - t
+        self.bytes_written += len(chunk)
+
+    def flush(self):
+        self._f.flush()
+
+    def fsync(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+
+class Segment:
+    """A file written by a ``RouteWriter`` and the stats of what was appended to it."""
+
+    def __init__(self, path):
+        self.written_path = path
+        self.path = path  # final name, once compressed
+        self.initial_size = os.path.getsize(path) if os.path.exists(path) else 0
+        self.stats = RouteStats()
+
+
+def open_sink(path, taxonomy=None, project_name=None):
+    if path.endswith(".rbin"):
+        from .route_binary import BinaryRouteSink
+        return BinaryRouteSink(path, taxonomy, project_name)
+    return JsonlSink(path)
+
+
+class RouteWriter:
+    """Appends route records to a route file from a background thread.
+
+    Records are queued by the caller and encoded/written in groups by the
+    writer thread, which keeps the file handle open for the whole session.
+    Data is flushed to the OS every ``flush_records`` records or every
+    ``flush_interval_ms`` milliseconds, whichever comes first, and the file
+    is fsync'ed on close when ``fsync_on_stop`` is set. ``stats`` summarizes
+    everything this writer appended, for updating the route catalog.
+
+    Paths ending in ``.rbin`` are written in the binary columnar format, with
+    ``taxonomy`` seeding its metadata dictionary.
+
+    With ``segment_bytes`` and/or ``segment_seconds`` set, the session is
+    rolled into numbered segments (see ``route_segments.segment_path``) and
+    closed segments are compressed in the background with ``compression``.
+    ``segments`` lists every file written, with per-file stats.
+
+    With ``metrics`` (a ``TickMetrics``), each batch's encode and write
+    times and each flush are recorded.
+    """
+
+    def __init__(self, path, flush_records=50, flush_interval_ms=1000, fsync_on_stop=True,
+                 taxonomy=None, project_name=None, segment_bytes=None, segment_seconds=None,
+                 compression=None, metrics=None):
+        self.path = path
+        self.taxonomy = taxonomy
+        self.project_name = project_name
+        self.flush_records = max(1, int(flush_records))
+        self.flush_interval = max(0, flush_interval_ms) / 1000.0
+        self.fsync_on_stop = fsync_on_stop
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.compression = resolve_compression(compression)
+        self.metrics = metrics
+
+        self.records_written = 0
+        self.records_flushed = 0  # the first records_flushed records queued have reached the OS
+        self.stats = RouteStats()
+        self.segments = []
+        self.error = None
+
+        self._queue = queue.Queue()
+        self._queued = 0
+        self._queue_lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self._compressor = SegmentCompressor(self.compression) if self.compression else None
+
+    @property
+    def rotating(self):
+        return bool(self.segment_bytes or self.segment_seconds)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._thread = threading.Thread(
+            target=self._run, name=f"RouteWriter({os.path.basename(self.path)})", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def running(self):
+        return self._thread is not None and not self._closed
+
+    def write(self, record):
+        """Queues ``record``; returns its sequence number, which ``records_flushed`` reaches once it is flushed.
+
+        Raises the writer thread's error once it has failed, as nothing would
+        write the record.
+        """
+        if self._closed:
+            raise RuntimeError("RouteWriter is closed")
+        if self.error is not None:
+            raise self.error
+        with self._queue_lock:
+            self._queued += 1
+            self._queue.put(record)
+            return self._queued
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def close(self, timeout=None):
+        # Drains everything queued so far, and waits for pending compressions.
+        if self._thread is None or self._closed:
+            self._closed = True
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._compressor is not None:
+            self._compressor.join()
+            if self._compressor.errors and self.error is None:
+                self.error = self._compressor.errors[0][1]
+
+    def _first_segment(self):
+        if not self.rotating:
+            return self.path
+        # Resuming a session continues its last uncompressed segment
+        route_dir = os.path.dirname(self.path) or "."
+        session = os.path.splitext(os.path.basename(self.path))[0]
+        existing = session_segments(route_dir, session)
+        if not existing:
+            return segment_path(self.path, 1)
+        last = existing[-1]
+        seq = max(1, segment_number(last))
+        if is_compressed(last):
+            seq += 1
+        return segment_path(self.path, seq)
+
+    def _open_segment(self, path):
+        segment = Segment(path)
+        self.segments.append(segment)
+        return segment, open_sink(path, self.taxonomy, self.project_name)
+
+    def _close_segment(self, segment, sink, compress):
+        try:
+            if self.fsync_on_stop or compress:
+                sink.fsync()
+            else:
+                sink.flush()
+        finally:
+            sink.close()
+            segment.stats.byte_size = sink.bytes_written
+            self.stats.byte_size += sink.bytes_written
+        if compress and self._compressor is not None:
+            self._compressor.submit(segment.written_path, lambda src, dst: self._compressed(segment, dst))
+
+    @staticmethod
+    def _compressed(segment, dst):
+        segment.path = dst
+        if segment.initial_size:
+            # Stats only cover what this writer appended; the file needs a full summary
+            segment.stats = None
+        else:
+            segment.stats.byte_size = os.path.getsize(dst)
+
+    def _run(self):
+        try:
+            segment, sink = self._open_segment(self._first_segment())
+            try:
+                self._write_loop(segment, sink)
+            except Exception:
+                sink.close()
+                raise
+        except Exception as e:
+            self.error = e
+
+    def _write_loop(self, segment, sink):
+        unflushed = 0
+        last_flush = time.monotonic()
+        segment_started = last_flush
+        stopping = False
+
+        while not stopping:
+            wait = None
+            if unflushed:
+                wait = max(0.0, last_flush + self.flush_interval - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+
+            batch = []
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.flush_records:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if batch:
+                if self.metrics is not None:
+                    t, io = time.perf_counter(), sink.io_seconds
+                    sink.write(batch)
+                    total, io = time.perf_counter() - t, sink.io_seconds - io
+                    self.metrics.record_write(len(batch), total - io, io)
+                else:
+                    sink.write(batch)
+                for rec in batch:
+                    segment.stats.add(rec)
+                    self.stats.add(rec)
+                unflushed += len(batch)
+                self.records_written += len(batch)
+
+            now = time.monotonic()
+            if unflushed and (stopping or unflushed >= self.flush_records
+                              or now - last_flush >= self.flush_interval):
+                sink.flush()
+                if self.metrics is not None:
+                    self.metrics.record_flush(time.monotonic() - now)
+                unflushed = 0
+                last_flush = now
+                self.records_flushed = self.records_written
+
+            if not stopping and batch and self.rotating and (
+                    (self.segment_bytes and sink.bytes_written >= self.segment_bytes)
+                    or (self.segment_seconds and now - segment_started >= self.segment_seconds)):
+                self._close_segment(segment, sink, compress=True)
+                self.records_flushed = self.records_written
+                seq = segment_number(segment.written_path) + 1
+                segment, sink = self._open_segment(segment_path(self.path, seq))
+                segment_started = now
+                unflushed = 0
+
+        # The last segment stays uncompressed so a resumed session can append to it
+        self._close_segment(segment, sink, compress=False)
+        self.records_flushed = self.records_written
@@ -0,0 +1,247 @@
+import os
+import time
+import threading
+from collections import deque
+
+from .location import create_provider
+from .live_meta import LiveMetaAligner, MetaEventLog, events_path
+from .records import RouteRecord
+from .recovery import SessionManifest
+from .route_catalog import ROUTE_DIR
+from .route_writer import RouteWriter
+from .tick_metrics import TickMetrics, metrics_path
+
+
+class RouteSession:
+    """One route logging session, independent of any UI.
+
+    Fixes from the project's location source are written as they arrive;
+    ``tick`` places the submissions no newer fix has answered in time and
+    reports the latest fix, without writing it again. Metadata submissions are logged
+    straight away to the session's side-channel file (``events_path``) and
+    written as tag records on the fixes around their submission time (see
+    ``LiveMetaAligner``). The GUI drives ``tick`` from a QTimer and the CLI
+    from ``run``.
+
+    ``metrics`` times every tick against the ``gpsFrequency`` schedule and
+    every write, and is saved next to the route (``metrics_path``) on ``stop``.
+
+    While the session runs, its ``SessionManifest`` sits next to the route
+    with the submissions whose tags have not been flushed yet, so
+    ``recovery.recover_sessions`` can finish the session if the process dies.
+    """
+
+    def __init__(self, project_data, route_dir=ROUTE_DIR, catalog=None, location_config=None,
+                 indexes=()):
+        self.project_name = project_data["projectName"]
+        self.taxonomy = project_data.get("taxonomy", [])
+        self.tick_interval = project_data["gpsFrequency"]
+        self.location_config = location_config or project_data.get("locationSource")
+        self.catalog = catalog
+        # Route indexes (e.g. SpatialIndex) updated with each segment once it is closed
+        self.indexes = list(indexes)
+
+        self.segment_bytes = int(project_data.get("segmentMaxMB", 0) * 1024 * 1024) or None
+        self.segment_seconds = int(project_data.get("segmentMaxMinutes", 0) * 60) or None
+        self.compression = project_data.get("compression", "auto")
+
+        ts = int(time.time())
+        os.makedirs(route_dir, exist_ok=True)
+        ext = ".rbin" if project_data.get("routeFormat") == "binary" else ".jsonl"
+        self.route_file = os.path.join(route_dir, f"route_{self.project_name}_{ts}{ext}")
+        if not self.rotating:
+            open(self.route_file, "a").close()  # create file if not exists
+
+        self.events_file = events_path(self.route_file)
+        self.alignment = project_data.get("metaAlignment", "nearest")
+        self.aligner = LiveMetaAligner(self.alignment)
+        self.manifest = SessionManifest(self.route_file)
+        self._unflushed = []  # [submitted_at, meta_data, writer sequence of its tag or None]
+        self._unflushed_lock = threading.Lock()
+        # Held from placing tags until they are queued, so fixes and tags reach the writer in time order
+        self._order_lock = threading.Lock()
+        self.event_log = None
+        self.tagged = deque(maxlen=1000)  # tag records written since the last take_tagged()
+        self.metrics = TickMetrics(self.tick_interval)
+        self.metrics_file = metrics_path(self.route_file)
+        self.current_location = None
+        self.latest_fix = None
+        self.provider = None
+        self.writer = None
+
+    @property
+    def rotating(self):
+        return bool(self.segment_bytes or self.segment_seconds)
+
+    @property
+    def is_running(self):
+        return self.writer is not None
+
+    def start(self):
+        """Starts the location source and writer. Raises ``ValueError``/``KeyError`` on bad config."""
+        provider = create_provider(self.location_config)
+        self.writer = RouteWriter(self.route_file, taxonomy=self.taxonomy,
+                                  project_name=self.project_name,
+                                  segment_bytes=self.segment_bytes,
+                                  segment_seconds=self.segment_seconds,
+                                  compression=self.compression,
+                                  metrics=self.metrics)
+        self.manifest.create(self.project_name, self.taxonomy, self.alignment)
+        self.writer.start()
+        self.metrics.start()
+        self.provider = provider
+        self.provider.start(self.on_fix)
+
+    def on_fix(self, fix):
+        # Called on the provider thread for every fix
+        self.latest_fix = fix
+        self.current_location = (fix.latitude, fix.longitude)
+        if self.writer.error is not None:
+            return  # the next tick reports it
+        with self._order_lock:
+            # The tags it completes lie at or before it, so they go first
+            self._write_tags(self.aligner.on_fix(fix.timestamp, fix.latitude, fix.longitude))
+            self.writer.write(RouteRecord(fix.timestamp, fix.latitude, fix.longitude))
+
+    def _write_tags(self, records):
+        for rec in records:
+            seq = self.writer.write(rec)
+            self.tagged.append(rec)
+            with self._unflushed_lock:
+                for entry in self._unflushed:
+                    if entry[2] is None and entry[0] == rec.meta_submitted_at:
+                        entry[2] = seq
+                        break
+
+    def _save_pending(self, flushed=None):
+        """Rewrites the manifest without the submissions whose tags are flushed up to ``flushed``."""
+        with self._unflushed_lock:
+            if flushed is not None:
+                kept = [entry for entry in self._unflushed if entry[2] is None or entry[2] > flushed]
+                if len(kept) == len(self._unflushed):
+                    return
+                self._unflushed = kept
+            pending = [(submitted_at, meta) for submitted_at, meta, _ in self._unflushed]
+        try:
+            self.manifest.update(pending)
+        except OSError:
+            pass  # only recovery relies on it; the route itself is unaffected
+
+    def submit_meta(self, meta_data, submitted_at=None):
+        if not meta_data:
+            return
+        submitted_at = round(time.time(), 3) if submitted_at is None else submitted_at
+        if self.event_log is None:
+            self.event_log = MetaEventLog(self.events_file)
+        self.event_log.append(submitted_at, meta_data)
+        if self.writer is not None:
+            with self._unflushed_lock:
+                self._unflushed.append([submitted_at, meta_data, None])
+            self._save_pending()
+        self.aligner.submit(submitted_at, meta_data)
+
+    def take_tagged(self):
+        """Tag records written since the last call, oldest first."""
+        taken = []
+        while self.tagged:
+            taken.append(self.tagged.popleft())
+        return taken
+
+    def tick(self):
+        """Places overdue submissions and returns the latest fix, or ``None`` before the first fix.
+
+        Raises the writer's error as soon as it has failed; ``stop`` still
+        needs to be called.
+        """
+        if self.writer is None:
+            return None
+        if self.writer.error is not None:
+            raise self.writer.error
+        fired = time.monotonic()
+        if self._unflushed:
+            self._save_pending(self.writer.records_flushed)
+        log = self._tick()
+        self.metrics.record_tick(fired, time.monotonic() - fired, self.writer.pending(),
+                                 None if log is None else log["tick_timestamp"])
+        return log
+
+    def _tick(self):
+        fix = self.latest_fix
+        if fix is None:
+            return None
+        # Submissions that no newer fix has answered in time go on the latest one
+        with self._order_lock:
+            self._write_tags(self.aligner.expire(time.time()))
+        # on_fix has written the fix itself; a copy would add nothing to the route
+        return RouteRecord(fix.timestamp, fix.latitude, fix.longitude)
+
+    def stop(self):
+        """Stops the source, drains the writer, saves the metrics and updates the catalog.
+
+        Returns the writer's error, if any.
+        """
+        if self.provider is not None:
+            self.provider.stop()
+            self.provider = None
+        if self.event_log is not None:
+            self.event_log.close()
+            self.event_log = None
+        if self.writer is None:
+            return None
+
+        if self.writer.error is None:
+            with self._order_lock:
+                self._write_tags(self.aligner.expire(float("inf")))
+        writer, self.writer = self.writer, None
+        writer.close()
+        try:
+            self.metrics.save(self.metrics_file)
+        except OSError:
+            pass  # the metrics are diagnostics; never fail a session over them
+        if writer.error is not None:
+            return writer.error  # the manifest stays, so recovery repairs the route later
+        with self._unflushed_lock:
+            self._unflushed = []
+        try:
+            self.manifest.remove()
+        except OSError:
+            pass
+        for segment in writer.segments:
+            renamed = segment.path != segment.written_path
+            if self.catalog is not None:
+                if renamed:
+                    self.catalog.forget(os.path.basename(segment.written_path))
+                self.catalog.update_route(segment.path, appended=segment.stats)
+            for index in self.indexes:
+                if renamed:
+                    index.forget(os.path.basename(segment.written_path))
+                index.update_route(segment.path)
+        return None
+
+    def run(self, duration=None, stop_event=None, on_tick=None):
+        """Runs the session on the calling thread until ``duration`` elapses or ``stop_event`` is set."""
+        stop_event = stop_event or threading.Event()
+        self.start()
+        try:
+            deadline = None if duration is None else time.monotonic() + duration
+            next_tick = time.monotonic() + self.tick_interval
+            while not stop_event.is_set():
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+                wait = next_tick - now
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+                if stop_event.wait(max(0.0, wait)):
+                    break
+                if time.monotonic() >= next_tick:
+                    log = self.tick()
+                    next_tick += self.tick_interval
+                    if log is not None and on_tick is not None:
+                        for rec in self.take_tagged():
+                            on_tick(rec)
+                        on_tick(log)
+        finally:
+            error = self.stop()
+        if error is not None:
+            raise error
@@ -0,0 +1,179 @@
+import os
+import math
+
+import numpy as np
+
+from .analytics import haversine
+from .location import EARTH_RADIUS_M
+from .route_catalog import ROUTE_DIR
+from .route_indexes import RouteFileIndex
+from .route_segments import session_name
+
+SPATIAL_PATH = os.path.join("app_data", "spatial.db")
+
+CELL_DEG = 0.01  # ~1.1 km of latitude
+RANGE_GAP = 60.0
+
+
+class SpatialHit:
+    """Points of one session that matched a query, in time order."""
+
+    def __init__(self, session, ts, lat, lon, distance=None):
+        self.session = session
+        self.ts = ts
+        self.lat = lat
+        self.lon = lon
+        self.distance = distance
+
+    @property
+    def point_count(self):
+        return len(self.ts)
+
+    @property
+    def start_ts(self):
+        return float(self.ts[0])
+
+    @property
+    def end_ts(self):
+        return float(self.ts[-1])
+
+    @property
+    def min_distance(self):
+        return None if self.distance is None else float(self.distance.min())
+
+    def ranges(self, gap=RANGE_GAP):
+        """``(start_ts, end_ts, points)`` for each pass, split where fixes are ``gap`` seconds apart."""
+        breaks = np.flatnonzero(np.diff(self.ts) > gap) + 1
+        starts = np.concatenate(([0], breaks))
+        ends = np.concatenate((breaks, [len(self.ts)]))
+        return [(float(self.ts[s]), float(self.ts[e - 1]), int(e - s)) for s, e in zip(starts, ends)]
+
+
+def _cell(value):
+    return int(math.floor(value / CELL_DEG))
+
+
+class SpatialIndex(RouteFileIndex):
+    """Grid index over the fixes of every route, kept in SQLite.
+
+    Each route file contributes one row per ``CELL_DEG`` grid cell it passes
+    through, holding that cell's fixes. Queries read only the cells that
+    overlap the search area and never touch the route files.
+    """
+
+    FILES_TABLE = "spatial_files"
+
+    def __init__(self, db_path=SPATIAL_PATH, route_dir=ROUTE_DIR):
+        super().__init__(db_path, route_dir)
+
+    def _create_tables(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS spatial_cells (
+                filename TEXT NOT NULL,
+                project TEXT NOT NULL,
+                cy INTEGER NOT NULL,
+                cx INTEGER NOT NULL,
+                start_ts REAL,
+                end_ts REAL,
+                points BLOB NOT NULL
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS spatial_cells_cell ON spatial_cells (project, cy, cx)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS spatial_cells_file ON spatial_cells (filename)"
+        )
+
+    def _delete(self, filename):
+        self.conn.execute("DELETE FROM spatial_cells WHERE filename = ?", (filename,))
+
+    def _insert(self, filename, project, arrays):
+        ok = np.isfinite(arrays.ts) & np.isfinite(arrays.lat) & np.isfinite(arrays.lon)
+        ts, lat, lon = arrays.ts[ok], arrays.lat[ok], arrays.lon[ok]
+        if not len(ts):
+            return
+        cy = np.floor(lat / CELL_DEG).astype(np.int64)
+        cx = np.floor(lon / CELL_DEG).astype(np.int64)
+        order = np.lexsort((ts, cx, cy))
+        cy, cx = cy[order], cx[order]
+        bounds = np.flatnonzero((np.diff(cy) != 0) | (np.diff(cx) != 0)) + 1
+        points = np.column_stack((ts[order], lat[order], lon[order]))
+
+        rows = []
+        for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(order)]))):
+            block = points[start:end]
+            rows.append((filename, project, int(cy[start]), int(cx[start]),
+                         float(block[0, 0]), float(block[-1, 0]), block.tobytes()))
+        self.conn.executemany("""
+            INSERT INTO spatial_cells (filename, project, cy, cx, start_ts, end_ts, points)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    def _query_cells(self, project, min_lat, min_lon, max_lat, max_lon, start_ts=None, end_ts=None):
+        sql = """
+            SELECT filename, points FROM spatial_cells
+            WHERE project = ? AND cy BETWEEN ? AND ? AND cx BETWEEN ? AND ?
+        """
+        params = [project, _cell(min_lat), _cell(max_lat), _cell(min_lon), _cell(max_lon)]
+        if start_ts is not None:
+            sql += " AND end_ts >= ?"
+            params.append(start_ts)
+        if end_ts is not None:
+            sql += " AND start_ts <= ?"
+            params.append(end_ts)
+
+        by_session = {}
+        for row in self.conn.execute(sql, params):
+            points = np.frombuffer(row["points"], dtype=np.float64).reshape(-1, 3)
+            by_session.setdefault(session_name(row["filename"]), []).append(points)
+        return {
+            session: np.concatenate(parts) if len(parts) > 1 else parts[0]
+            for session, parts in by_session.items()
+        }
+
+    @staticmethod
+    def _hits(candidates, select, start_ts, end_ts):
+        hits = []
+        for session, points in candidates.items():
+            ts, lat, lon = points[:, 0], points[:, 1], points[:, 2]
+            mask, distance = select(lat, lon)
+            if start_ts is not None:
+                mask &= ts >= start_ts
+            if end_ts is not None:
+                mask &= ts <= end_ts
+            if not mask.any():
+                continue
+            order = np.argsort(ts[mask], kind="stable")
+            hits.append(SpatialHit(
+                session, ts[mask][order], lat[mask][order], lon[mask][order],
+                None if distance is None else distance[mask][order]
+            ))
+        hits.sort(key=lambda hit: hit.start_ts)
+        return hits
+
+    def query_bbox(self, project, min_lat, min_lon, max_lat, max_lon, start_ts=None, end_ts=None):
+        """Sessions with fixes inside the box, each with its matching fixes."""
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("Bounding box minimum must not exceed its maximum.")
+        candidates = self._query_cells(project, min_lat, min_lon, max_lat, max_lon, start_ts, end_ts)
+
+        def select(lat, lon):
+            return (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon), None
+
+        return self._hits(candidates, select, start_ts, end_ts)
+
+    def query_near(self, project, lat, lon, radius_m, start_ts=None, end_ts=None):
+        """Sessions with fixes within ``radius_m`` metres of ``(lat, lon)``."""
+        if radius_m < 0:
+            raise ValueError("Radius must not be negative.")
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        candidates = self._query_cells(project, lat - dlat, lon - dlon, lat + dlat, lon + dlon,
+                                       start_ts, end_ts)
+
+        def select(lats, lons):
+            distance = haversine(lat, lon, lats, lons)
+            return distance <= radius_m, distance
+
+        return self._hits(candidates, select, start_ts, end_ts)
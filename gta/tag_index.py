@@ -0,0 +1,246 @@
+import os
+import re
+
+import numpy as np
+
+from .route_catalog import ROUTE_DIR
+from .route_indexes import RouteFileIndex
+from .route_segments import segment_number, session_name
+
+TAG_PATH = os.path.join("app_data", "tags.db")
+
+_TOKEN_RE = re.compile(r"\s*(\(|\)|\bAND\b|\bOR\b)\s*", re.IGNORECASE)
+
+
+def _encode_rows(rows):
+    # Gaps between tagged rows fit in 32 bits and are decoded for many files at once
+    return np.diff(rows, prepend=0).astype(np.uint32).tobytes()
+
+
+def _decode_rows(blobs):
+    """Decodes several posting lists in one pass; returns the rows and each list's length."""
+    deltas = np.frombuffer(b"".join(blobs), dtype=np.uint32).astype(np.int64)
+    lengths = np.array([len(b) // 4 for b in blobs], dtype=np.int64)
+    rows = np.cumsum(deltas)
+    # Restart the running sum at the start of each list
+    ends = np.cumsum(lengths)
+    base = np.concatenate(([0], rows[ends[:-1] - 1])) if len(rows) else np.empty(0, dtype=np.int64)
+    return rows - np.repeat(base, lengths), lengths
+
+
+class TagMatch:
+    """Tagged ticks of one route file: record positions and their timestamps."""
+
+    def __init__(self, filename, rows, ts):
+        self.filename = filename
+        self.rows = rows
+        self.ts = ts
+
+    @property
+    def session(self):
+        return session_name(self.filename)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def parse_query(text):
+    """Parses ``"Weather=Rainy AND (Traffic=Heavy OR Traffic=Moderate)"``.
+
+    Returns a tree of ``("tag", class, attribute)``, ``("and", a, b)`` and
+    ``("or", a, b)`` tuples; AND binds tighter than OR.
+    """
+    tokens = [t for t in _TOKEN_RE.split(text) if t and t.strip()]
+    pos = 0
+
+    def peek():
+        return tokens[pos].upper() if pos < len(tokens) else None
+
+    def parse_or():
+        nonlocal pos
+        node = parse_and()
+        while peek() == "OR":
+            pos += 1
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and():
+        nonlocal pos
+        node = parse_term()
+        while peek() == "AND":
+            pos += 1
+            node = ("and", node, parse_term())
+        return node
+
+    def parse_term():
+        nonlocal pos
+        if pos >= len(tokens):
+            raise ValueError("Tag query ends unexpectedly.")
+        token = tokens[pos]
+        pos += 1
+        if token == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError("Missing ')' in tag query.")
+            pos += 1
+            return node
+        cls, sep, attr = token.partition("=")
+        if not sep or not cls.strip() or not attr.strip():
+            raise ValueError(f"Expected Class=Attribute, got '{token}'.")
+        return ("tag", cls.strip(), attr.strip())
+
+    tree = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[pos]}' in tag query.")
+    return tree
+
+
+class TagIndex(RouteFileIndex):
+    """Inverted index from ``class=attribute`` tags to the ticks that carry them.
+
+    Each route file stores one compressed posting list of record positions
+    (plus their timestamps) per tag it contains, so a query reads only the
+    postings of the tags it names. The project's taxonomy, recorded with
+    ``set_taxonomy``, decides which tags may be queried.
+    """
+
+    FILES_TABLE = "tag_files"
+
+    def __init__(self, db_path=TAG_PATH, route_dir=ROUTE_DIR):
+        super().__init__(db_path, route_dir)
+
+    def _create_tables(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tag_postings (
+                project TEXT NOT NULL,
+                class_name TEXT NOT NULL,
+                attribute TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                tick_count INTEGER NOT NULL,
+                rows BLOB NOT NULL,
+                ts BLOB NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tag_taxonomy (
+                project TEXT NOT NULL,
+                class_name TEXT NOT NULL,
+                attribute TEXT NOT NULL,
+                PRIMARY KEY (project, class_name, attribute)
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS tag_postings_tag ON tag_postings (project, class_name, attribute)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tag_postings_file ON tag_postings (filename)")
+
+    def _delete(self, filename):
+        self.conn.execute("DELETE FROM tag_postings WHERE filename = ?", (filename,))
+
+    def _insert(self, filename, project, arrays):
+        postings = {}
+        for row, meta in zip(np.asarray(arrays.tag_rows).tolist(), arrays.tags):
+            for cls, attr in meta.items():
+                postings.setdefault((str(cls), str(attr)), []).append(row)
+
+        rows = []
+        for (cls, attr), positions in postings.items():
+            positions = np.unique(np.array(positions, dtype=np.int64))
+            ts = np.ascontiguousarray(arrays.ts[positions], dtype=np.float64)
+            rows.append((project, cls, attr, filename, len(positions),
+                         _encode_rows(positions), ts.tobytes()))
+        self.conn.executemany("""
+            INSERT INTO tag_postings (project, class_name, attribute, filename, tick_count, rows, ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    def set_taxonomy(self, project, taxonomy):
+        """Records the project's current taxonomy; postings are kept for every tag either way."""
+        pairs = [
+            (project, entry["className"], attr)
+            for entry in taxonomy
+            for attr in entry.get("attributes", [])
+        ]
+        with self.conn:
+            self.conn.execute("DELETE FROM tag_taxonomy WHERE project = ?", (project,))
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tag_taxonomy (project, class_name, attribute) VALUES (?, ?, ?)",
+                pairs
+            )
+
+    def taxonomy_tags(self, project):
+        return {
+            (row["class_name"], row["attribute"])
+            for row in self.conn.execute(
+                "SELECT class_name, attribute FROM tag_taxonomy WHERE project = ?", (project,)
+            )
+        }
+
+    def tag_counts(self, project):
+        """``{(class, attribute): tagged ticks}`` over the whole project."""
+        return {
+            (row["class_name"], row["attribute"]): row["ticks"]
+            for row in self.conn.execute("""
+                SELECT class_name, attribute, SUM(tick_count) AS ticks FROM tag_postings
+                WHERE project = ? GROUP BY class_name, attribute
+            """, (project,))
+        }
+
+    def query(self, project, text):
+        """Ticks matching a tag query (see ``parse_query``), one ``TagMatch`` per route file.
+
+        AND and OR combine tags carried by the same tick. Raises ``ValueError``
+        for malformed queries or tags missing from the project's taxonomy.
+        """
+        tree = parse_query(text)
+        allowed = self.taxonomy_tags(project)
+        file_ids = {}
+        keys, stamps = [], []
+
+        def leaf(cls, attr):
+            # Positions become (file id << 32 | row) keys so AND/OR are single array operations
+            if allowed and (cls, attr) not in allowed:
+                raise ValueError(f"'{cls}={attr}' is not in the project taxonomy.")
+            cursor = self.conn.cursor()
+            cursor.row_factory = None
+            found = cursor.execute("""
+                SELECT filename, rows, ts FROM tag_postings
+                WHERE project = ? AND class_name = ? AND attribute = ?
+            """, (project, cls, attr)).fetchall()
+            if not found:
+                return np.empty(0, dtype=np.int64)
+            names, blobs, ts_blobs = zip(*found)
+            rows, lengths = _decode_rows(blobs)
+            ids = np.array([file_ids.setdefault(name, len(file_ids)) for name in names], dtype=np.int64)
+            leaf_keys = (np.repeat(ids, lengths) << 32) | rows
+            keys.append(leaf_keys)
+            stamps.extend(ts_blobs)
+            return np.sort(leaf_keys)  # one posting list per file and tag, so already unique
+
+        def evaluate(node):
+            if node[0] == "tag":
+                return leaf(node[1], node[2])
+            left, right = evaluate(node[1]), evaluate(node[2])
+            if node[0] == "and":
+                return np.intersect1d(left, right, assume_unique=True)
+            return np.union1d(left, right)
+
+        matched = evaluate(tree)
+        if not len(matched):
+            return []
+
+        # Every matched key comes from one of the postings read above
+        all_keys = np.concatenate(keys)
+        all_ts = np.frombuffer(b"".join(stamps), dtype=np.float64)
+        order = np.argsort(all_keys, kind="stable")
+        ts = all_ts[order][np.searchsorted(all_keys[order], matched)]
+
+        names = sorted(file_ids, key=file_ids.get)
+        ids = matched >> 32
+        bounds = np.flatnonzero(np.diff(ids)) + 1
+        matches = [
+            TagMatch(names[int(ids[start])], matched[start:end] & 0xFFFFFFFF, ts[start:end])
+            for start, end in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(ids)])))
+        ]
+        matches.sort(key=lambda m: (m.session, segment_number(m.filename)))
+        return matches
@@ -0,0 +1,170 @@
+import time
+
+
+class TaxonomyMigration:
+    """One step in a taxonomy's history: classes and attributes renamed, merged or dropped.
+
+    ``classes`` maps old class names to new ones, or to ``None`` to drop the
+    class; classes mapped to the same name are merged. ``attributes`` maps,
+    per old class name, old attributes to new ones (or ``None``) the same
+    way. Anything not mentioned is kept.
+    """
+
+    def __init__(self, classes=None, attributes=None):
+        self.classes = {cls: new for cls, new in (classes or {}).items() if new != cls}
+        self.attributes = {}
+        for cls, attrs in (attributes or {}).items():
+            attrs = {attr: new for attr, new in attrs.items() if new != attr}
+            if attrs:
+                self.attributes[cls] = attrs
+
+    def __bool__(self):
+        return bool(self.classes or self.attributes)
+
+    def map_pair(self, cls, attr):
+        """``(class, attribute)`` after this step, or ``None`` if it is dropped."""
+        new_cls = self.classes.get(cls, cls)
+        new_attr = self.attributes.get(cls, {}).get(attr, attr)
+        if new_cls is None or new_attr is None:
+            return None
+        return new_cls, new_attr
+
+    def apply_taxonomy(self, taxonomy):
+        merged = {}
+        for entry in taxonomy:
+            for attr in entry["attributes"]:
+                pair = self.map_pair(entry["className"], attr)
+                if pair is None:
+                    continue
+                attrs = merged.setdefault(pair[0], [])
+                if pair[1] not in attrs:
+                    attrs.append(pair[1])
+        return [{"className": cls, "attributes": attrs} for cls, attrs in merged.items()]
+
+    def describe(self):
+        lines = []
+        for cls, new in self.classes.items():
+            lines.append(f"drop class {cls}" if new is None else f"{cls} -> {new}")
+        for cls, attrs in self.attributes.items():
+            for attr, new in attrs.items():
+                lines.append(f"drop {cls}={attr}" if new is None else f"{cls}={attr} -> {new}")
+        return lines
+
+    def to_dict(self):
+        return {"classes": self.classes, "attributes": self.attributes}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("classes"), data.get("attributes"))
+
+
+class MigrationPlan:
+    """Consecutive ``TaxonomyMigration`` steps, applied to metadata one after the other."""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+    def __bool__(self):
+        return any(self.steps)
+
+    def map_pair(self, cls, attr):
+        pair = (cls, attr)
+        for step in self.steps:
+            pair = step.map_pair(*pair)
+            if pair is None:
+                return None
+        return pair
+
+    def apply_meta(self, meta):
+        """``meta`` itself if no step touches it, otherwise the rewritten dict.
+
+        Where merged classes both appear, the attribute of the first is kept.
+        """
+        out = {}
+        changed = False
+        for cls, attr in meta.items():
+            pair = self.map_pair(cls, attr) if isinstance(attr, str) else (cls, attr)
+            if pair is None or pair[0] in out:
+                changed = True
+                continue
+            out[pair[0]] = pair[1]
+            changed = changed or pair != (cls, attr)
+        return out if changed else meta
+
+
+def normalize_taxonomy(taxonomy):
+    """Merges classes that share a name and drops repeated attributes, keeping the order."""
+    return TaxonomyMigration().apply_taxonomy(taxonomy)
+
+
+def taxonomy_version(project):
+    return project.get("taxonomyVersion", 1)
+
+
+def record_migration(project, migration, taxonomy=None, now=None):
+    """Adds ``migration`` to a project's taxonomy history, in place; returns the new version.
+
+    The project's taxonomy becomes ``taxonomy``, or the migration applied to
+    the current one. Routes logged from ``now`` on are at the new version.
+    """
+    version = taxonomy_version(project) + 1
+    project["taxonomy"] = migration.apply_taxonomy(project.get("taxonomy", [])) if taxonomy is None else taxonomy
+    project["taxonomyVersion"] = version
+    project.setdefault("taxonomyMigrations", []).append({
+        "version": version,
+        "created_at": time.time() if now is None else now,
+        **migration.to_dict(),
+    })
+    return version
+
+
+def version_at(project, ts):
+    """The taxonomy version in effect at time ``ts``, i.e. the one a session started then was logged with."""
+    history = project.get("taxonomyMigrations", [])
+    version = taxonomy_version(project) - len(history)
+    for step in history:
+        if step["created_at"] <= ts:
+            version = step["version"]
+    return version
+
+
+def migration_plan(project, since):
+    """The steps that bring data at version ``since`` up to the project's current taxonomy."""
+    return MigrationPlan(TaxonomyMigration.from_dict(step) for step in project.get("taxonomyMigrations", [])
+                         if step["version"] > since)
+
+
+def migration_from_edits(old, new, origins):
+    """The migration implied by editing taxonomy ``old`` into ``new``.
+
+    ``origins[i]`` is the index in ``old`` that ``new[i]`` was edited from,
+    or ``None`` for an added class. Classes that are gone are dropped.
+    Attributes are matched by name, so reordering a class's attributes
+    changes nothing. An attribute that is gone counts as renamed only if
+    the list kept its length and its place now holds a name the class did
+    not have, or one that now appears twice (a merge); otherwise it is
+    dropped.
+    """
+    classes, attributes = {}, {}
+    kept = set()
+    for entry, origin in zip(new, origins):
+        if origin is None:
+            continue
+        kept.add(origin)
+        before = old[origin]
+        cls = before["className"]
+        classes[cls] = entry["className"]
+        old_attrs, new_attrs = before["attributes"], entry["attributes"]
+        changes = {}
+        for i, attr in enumerate(old_attrs):
+            if attr in new_attrs:
+                continue
+            renamed = new_attrs[i] if len(old_attrs) == len(new_attrs) else None
+            if renamed in old_attrs and new_attrs.count(renamed) == 1:
+                renamed = None  # a neighbour moved into its place
+            changes[attr] = renamed
+        attributes[cls] = changes
+    for i, entry in enumerate(old):
+        if i not in kept:
+            classes[entry["className"]] = None
+    return TaxonomyMigration(classes, attributes)
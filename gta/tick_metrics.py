@@ -0,0 +1,188 @@
+import math
+import time
+from array import array
+
+from .projects import write_json_atomic
+from .route_segments import METRICS_SUFFIX, sidecar_path
+
+
+def metrics_path(route_file):
+    """Metrics file of a logging session: ``route_P_123.metrics.json``."""
+    return sidecar_path(route_file, METRICS_SUFFIX)
+
+
+class Histogram:
+    """Counts of values in ``buckets`` log-spaced buckets between ``low`` and ``high``.
+
+    Recording is O(1) and memory is fixed however many values are seen.
+    Each bucket spans the same ratio, so percentiles are accurate to a few
+    percent; values outside the range fall into the end buckets. Min, max
+    and mean are exact.
+    """
+
+    def __init__(self, low=0.01, high=100000.0, buckets=256):
+        self.low = low
+        self.high = high
+        self.counts = array("q", bytes(8 * buckets))
+        self._scale = buckets / math.log(high / low)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if value <= self.low:
+            i = 0
+        else:
+            i = min(int(math.log(value / self.low) * self._scale), len(self.counts) - 1)
+        self.counts[i] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def _upper(self, i):
+        return self.low * math.exp((i + 1) / self._scale)
+
+    def _middle(self, i):
+        return self.low * math.exp((i + 0.5) / self._scale)
+
+    def percentile(self, p):
+        """Middle of the bucket holding the ``p``-th percentile, clamped to the observed range."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(max(self._middle(i), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 3),
+            "min": round(self.min, 3),
+            "p50": round(self.percentile(50), 3),
+            "p90": round(self.percentile(90), 3),
+            "p99": round(self.percentile(99), 3),
+            "max": round(self.max, 3),
+            # [bucket upper bound, count] of the non-empty buckets
+            "buckets": [[round(self._upper(i), 4), n] for i, n in enumerate(self.counts) if n],
+        }
+
+
+class TickMetrics:
+    """Timings of a logging session: when ticks fire and how long writing takes.
+
+    Ticks are measured against the ideal schedule of one every ``interval``
+    seconds from ``start``. A tick that fires more than a whole interval late
+    stands in for the ticks that were due meanwhile (the timer coalesced
+    them); those are counted as missed. ``record_write`` and
+    ``record_flush`` are called from the writer thread. Durations are kept
+    in milliseconds.
+    """
+
+    def __init__(self, interval):
+        self.interval = float(interval)
+        self.lag = Histogram()  # how late each tick fired
+        self.period = Histogram()  # time between consecutive ticks
+        self.tick = Histogram()  # time spent in RouteSession.tick
+        self.ui = Histogram()  # time spent showing a tick, if the caller reports it
+        self.encode = Histogram()  # per written batch
+        self.write = Histogram()
+        self.flush = Histogram()
+        self.queue_depth = Histogram(1.0, 1e7, 128)  # writer queue when a tick is queued
+        self.batch_records = Histogram(1.0, 1e6, 128)
+        self.ticks = 0
+        self.coalesced = 0
+        self.missed = 0
+        self.no_fix = 0
+        self.records_written = 0
+        self.drift = None  # seconds the latest tick_timestamp is off the ideal schedule
+        self.started_at = None
+        self._due = None
+        self._last_fired = None
+        self._first_ts = None
+        self._first_slot = 0
+
+    def start(self, now=None):
+        """Starts (or restarts, after a pause) the tick schedule."""
+        now = time.monotonic() if now is None else now
+        if self.started_at is None:
+            self.started_at = time.time()
+        self._due = now + self.interval
+        self._last_fired = None
+        self._first_ts = None
+
+    def record_tick(self, fired, duration, queue_depth=0, tick_ts=None):
+        """One tick that fired at monotonic time ``fired`` and took ``duration`` seconds."""
+        if self._due is None:
+            self.start(fired - self.interval)
+        late = fired - self._due
+        self.lag.record(max(0.0, late) * 1000.0)
+        behind = int(late // self.interval) if late >= self.interval else 0
+        if behind:
+            self.coalesced += 1
+            self.missed += behind
+        self._due += (behind + 1) * self.interval
+        if self._last_fired is not None:
+            self.period.record((fired - self._last_fired) * 1000.0)
+        self._last_fired = fired
+
+        self.ticks += 1
+        self.tick.record(duration * 1000.0)
+        self.queue_depth.record(queue_depth)
+        slot = self.ticks + self.missed
+        if tick_ts is None:
+            self.no_fix += 1
+        elif self._first_ts is None:
+            self._first_ts, self._first_slot = tick_ts, slot
+            self.drift = 0.0
+        else:
+            self.drift = tick_ts - (self._first_ts + (slot - self._first_slot) * self.interval)
+
+    def record_ui(self, duration):
+        self.ui.record(duration * 1000.0)
+
+    def record_write(self, records, encode, write):
+        self.batch_records.record(records)
+        self.encode.record(encode * 1000.0)
+        self.write.record(write * 1000.0)
+        self.records_written += records
+
+    def record_flush(self, duration):
+        self.flush.record(duration * 1000.0)
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "interval_s": self.interval,
+            "ticks": self.ticks,
+            "missed_ticks": self.missed,
+            "coalesced_ticks": self.coalesced,
+            "ticks_without_fix": self.no_fix,
+            "drift_s": None if self.drift is None else round(self.drift, 3),
+            "records_written": self.records_written,
+            "lag_ms": self.lag.to_dict(),
+            "period_ms": self.period.to_dict(),
+            "tick_ms": self.tick.to_dict(),
+            "ui_ms": self.ui.to_dict(),
+            "encode_ms": self.encode.to_dict(),
+            "write_ms": self.write.to_dict(),
+            "flush_ms": self.flush.to_dict(),
+            "queue_depth": self.queue_depth.to_dict(),
+            "batch_records": self.batch_records.to_dict(),
+        }
+
+    def save(self, path):
+        write_json_atomic(path, self.to_dict())
@@ -0,0 +1,277 @@
+import os
+import heapq
+from array import array
+from itertools import islice
+
+import numpy as np
+
+from .analytics import RouteArrays, concat_arrays
+from .route_binary import BinaryRouteReader, is_binary_route
+from .route_catalog import ROUTE_DIR, parse_route_name
+from .records import loads, reversed_lines
+from .route_index import open_route_index
+from .route_segments import drop_converted, is_compressed, open_segment
+
+PAGE_ROWS = 10000
+ARRAY_CHUNK = 65536
+
+
+def _timestamp(rec):
+    ts = rec.get("tick_timestamp") if isinstance(rec, dict) else None
+    return ts if isinstance(ts, (int, float)) else None
+
+
+def _line_timestamp(line):
+    try:
+        return _timestamp(loads(line))
+    except ValueError:
+        return None
+
+
+def route_time_range(path):
+    """``(first, last)`` tick timestamps of a route file, or ``None`` if it has no fixes.
+
+    Plain JSONL is read from both ends and binary routes from their first and
+    last blocks; compressed JSONL has to be streamed through.
+    """
+    if is_binary_route(path):
+        with BinaryRouteReader(path) as reader:
+            blocks = [b for b in reader.blocks if b.count]
+            if not blocks:
+                return None
+            return float(reader.columns(blocks[0])[0][0]), float(reader.columns(blocks[-1])[0][-1])
+
+    if is_compressed(path):
+        first = last = None
+        with open_segment(path) as f:
+            for line in f:
+                ts = _line_timestamp(line)
+                if ts is not None:
+                    first = ts if first is None else first
+                    last = ts
+        return None if first is None else (first, last)
+
+    with open(path, "rb") as f:
+        first = None
+        for line in f:
+            first = _line_timestamp(line)
+            if first is not None:
+                break
+        if first is None:
+            return None
+        # Walk back from the end; a torn last line is skipped
+        for line in reversed_lines(f, f.seek(0, os.SEEK_END)):
+            ts = _line_timestamp(line)
+            if ts is not None:
+                return first, ts
+        return first, first
+
+
+def _iter_file(path, start_ts=None, end_ts=None):
+    """Yields ``(ts, row, record)`` for one file's fixes within the bounds.
+
+    Rows number every line (or binary record) of the file, as its route index
+    does. Files are in tick order as written, so reading stops past ``end_ts``.
+    """
+    if is_binary_route(path):
+        with BinaryRouteReader(path) as reader:
+            row = reader.row_at(start_ts) if start_ts is not None else 0
+            for row, rec in enumerate(reader.iter_records(row), row):
+                ts = rec["tick_timestamp"]
+                if end_ts is not None and ts > end_ts:
+                    return
+                yield ts, row, rec
+        return
+
+    with open_segment(path) as f:
+        for row, line in enumerate(f):
+            try:
+                rec = loads(line)
+            except ValueError:
+                continue  # torn or corrupt line
+            ts = _timestamp(rec)
+            if ts is None or (start_ts is not None and ts < start_ts):
+                continue
+            if end_ts is not None and ts > end_ts:
+                return
+            yield ts, row, rec
+
+
+def iter_route_records(route):
+    """Streams the timestamped records of a route file, a list of session segments or a ``Timeline``."""
+    if isinstance(route, Timeline):
+        yield from route
+        return
+    for path in [route] if isinstance(route, str) else route:
+        for _, _, rec in _iter_file(path):
+            yield rec
+
+
+class Timeline:
+    """Time-ordered stream over many route files, merged by ``tick_timestamp``.
+
+    Files whose first and last fixes fall outside ``start_ts``..``end_ts``
+    (both inclusive) are never opened. The rest are merged through a heap
+    holding one pending record per open file, and a file is only opened once
+    the merge reaches its first fix, so memory stays constant however long
+    the timeline is. Iterating yields records; it can be done any number of times.
+    """
+
+    def __init__(self, paths, start_ts=None, end_ts=None, ranges=None, title=None):
+        self.start_ts = start_ts
+        self.end_ts = end_ts
+        self.title = title or "Timeline"
+        ranges = ranges or {}
+        sources = []
+        for path in paths:
+            span = ranges.get(path) or route_time_range(path)
+            if span is None:
+                continue
+            first, last = span
+            if (end_ts is not None and first > end_ts) or (start_ts is not None and last < start_ts):
+                continue
+            sources.append((first, last, path))
+        sources.sort()
+        self.ranges = [(first, last) for first, last, _ in sources]
+        self.paths = [path for _, _, path in sources]
+
+    @classmethod
+    def for_project(cls, project, route_dir=ROUTE_DIR, start_ts=None, end_ts=None, catalog=None):
+        """Timeline over every route file of ``project`` in ``route_dir``.
+
+        Sessions that started after ``end_ts`` are skipped by name. With a
+        ``catalog``, the cataloged time spans of compressed segments are used
+        instead of decompressing them.
+        """
+        paths, ranges = [], {}
+        for name in drop_converted(sorted(os.listdir(route_dir))):
+            parsed = parse_route_name(name)
+            if parsed is None or parsed[0] != project:
+                continue
+            if end_ts is not None and parsed[1] > end_ts:
+                continue
+            path = os.path.join(route_dir, name)
+            paths.append(path)
+            if catalog is not None and is_compressed(path):
+                row = catalog.get(name)
+                if row is not None and row["start_ts"] is not None:
+                    ranges[path] = (row["start_ts"], row["end_ts"])
+        return cls(paths, start_ts, end_ts, ranges, title=f"{project} timeline")
+
+    def entries(self):
+        """Yields ``(source, row, record)`` in tick order; ``source`` indexes ``paths``."""
+        heap = []
+        pending = 0
+        try:
+            while heap or pending < len(self.paths):
+                while pending < len(self.paths) and (not heap or self.ranges[pending][0] <= heap[0][0]):
+                    source = _iter_file(self.paths[pending], self.start_ts, self.end_ts)
+                    entry = next(source, None)
+                    if entry is not None:
+                        heapq.heappush(heap, (entry[0], pending, entry[1], entry[2], source))
+                    pending += 1
+                if not heap:
+                    continue
+                ts, index, row, rec, source = heap[0]
+                yield index, row, rec
+                entry = next(source, None)
+                if entry is None:
+                    heapq.heappop(heap)
+                else:
+                    heapq.heapreplace(heap, (entry[0], index, entry[1], entry[2], source))
+        finally:
+            for entry in heap:
+                entry[4].close()
+
+    def __iter__(self):
+        for _, _, rec in self.entries():
+            yield rec
+
+    def iter_arrays(self, chunk_size=ARRAY_CHUNK):
+        """Yields the timeline as ``RouteArrays`` of up to ``chunk_size`` fixes each."""
+        records = self.__iter__()
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                return
+            tag_rows, tags = [], []
+            for i, rec in enumerate(chunk):
+                if rec.get("meta_data"):
+                    tag_rows.append(i)
+                    tags.append(rec["meta_data"])
+            yield RouteArrays(
+                np.array([rec["tick_timestamp"] for rec in chunk], dtype=np.float64),
+                np.array([rec.get("latitude") for rec in chunk], dtype=np.float64),
+                np.array([rec.get("longitude") for rec in chunk], dtype=np.float64),
+                np.array(tag_rows, dtype=np.int64),
+                tags,
+            )
+
+    def arrays(self):
+        return concat_arrays(list(self.iter_arrays()))
+
+
+class TimelineIndex:
+    """Row access to a ``Timeline`` for the log viewer, merged a page at a time.
+
+    Only each row's file and position are kept; records are read back through
+    the files' own indexes, which are opened when a row of theirs is shown.
+    """
+
+    def __init__(self, timeline, page_rows=PAGE_ROWS, cache_size=4096):
+        self.timeline = timeline
+        self.paths = timeline.paths
+        self.page_rows = page_rows
+        self.cache_size = cache_size
+        self.positions = array("q")
+        self._entries = timeline.entries()
+        self._page = None
+        self._exhausted = False
+        self._indexes = {}
+        self.load_next()
+        self.commit_next()
+
+    def can_load_more(self):
+        return self._page is not None or not self._exhausted
+
+    def load_next(self):
+        """Merges the next page of rows and returns its size, without exposing it yet."""
+        if self._page is None:
+            self._page = array("q", (
+                source << 32 | row for source, row, _ in islice(self._entries, self.page_rows)
+            ))
+            if len(self._page) < self.page_rows:
+                self._exhausted = True
+        return len(self._page)
+
+    def commit_next(self):
+        self.positions.extend(self._page)
+        self._page = None
+
+    def refresh(self):
+        return len(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _locate(self, row):
+        key = self.positions[row]
+        source = key >> 32
+        index = self._indexes.get(source)
+        if index is None:
+            index = self._indexes[source] = open_route_index(self.paths[source], self.cache_size)
+        return index, key & 0xFFFFFFFF
+
+    def record(self, row):
+        index, local = self._locate(row)
+        return index.record(local)
+
+    def line(self, row):
+        index, local = self._locate(row)
+        return index.line(local)
+
+    def close(self):
+        self._entries.close()
+        for index in self._indexes.values():
+            index.close()
+        self._indexes = {}
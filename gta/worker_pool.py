@@ -0,0 +1,22 @@
+from concurrent.futures import ProcessPoolExecutor
+
+_cancel_event = None
+
+
+def _init_worker(cancel_event):
+    global _cancel_event
+    _cancel_event = cancel_event
+
+
+def cancellable_pool(workers, cancel_event):
+    """A process pool whose workers can see ``cancel_event`` through ``worker_cancel_event``.
+
+    The event (a ``multiprocessing.Event``) is handed over when each worker
+    starts, since it cannot be passed along with the jobs themselves.
+    """
+    return ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cancel_event,))
+
+
+def worker_cancel_event():
+    """The cancel event of the pool this process works for, or ``None`` outside one."""
+    return _cancel_event
@@ -1,14 +1,28 @@
 import sys
 import os
-import glob
-import json
 
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QDialog, QVBoxLayout, QLabel, QListWidget, QPushButton,
-    QHBoxLayout, QMessageBox, QWidget, QListWidgetItem, QTextEdit
+    QApplication, QMainWindow, QVBoxLayout, QLabel, QListWidget, QPushButton,
+    QHBoxLayout, QMessageBox, QWidget, QListWidgetItem
 )
+from PyQt5.QtCore import Qt, QTimer
 
 from dialog import ProjectDialog, EditProjectDialog, RouteLoggerDialog
+from route_viewer import RouteViewerDialog
+from route_browser import RouteBrowserDialog
+from route_map import RouteMapDialog
+from export_dialog import ExportDialog
+from archive_dialog import ArchiveDialog
+from retag_dialog import RetagDialog
+from gta.recovery import recover_sessions
+from gta.route_catalog import RouteCatalog, latest_session
+from gta.route_segments import session_segments
+from gta.spatial_index import SpatialIndex
+from gta.tag_index import TagIndex
+from spatial_search import SpatialSearchDialog
+from tag_search import TagSearchDialog
+from project_repository import ProjectRepository
+from gta.projects import ProjectError
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -22,6 +36,20 @@ class MainWindow(QMainWindow):
         self.project_list.itemClicked.connect(self.load_project_details)
         
         self.route_list = []
+        self.catalog = RouteCatalog()
+        # Sessions cut short by a crash are repaired before the catalog reads their files
+        try:
+            recovered = recover_sessions(self.catalog.route_dir)
+        except OSError as e:
+            recovered = [f"Recovery failed: {e}"]
+        self.catalog.revalidate()
+        self.spatial = SpatialIndex(route_dir=self.catalog.route_dir)
+        self.tags = TagIndex(route_dir=self.catalog.route_dir)
+
+        self.current_project_path = None
+        self.projects = ProjectRepository(self)
+        self.projects.projects_changed.connect(self.load_projects)
+        self.projects.project_changed.connect(self.on_project_changed)
 
         create_btn = QPushButton("Create New Project")
         create_btn.clicked.connect(self.create_project)
@@ -41,6 +69,34 @@ class MainWindow(QMainWindow):
         right_panel.addWidget(QLabel("Taxonomy"))
         right_panel.addWidget(self.taxonomy_list)
 
+        self.edit_btn = QPushButton("Edit This Project")
+        self.edit_btn.clicked.connect(lambda: self.edit_project(self.current_project_path))
+        right_panel.addWidget(self.edit_btn)
+
+        self.log_btn = QPushButton("Start Route Logging")
+        self.log_btn.clicked.connect(lambda: self.open_route_logger(*self.current_project()))
+        right_panel.addWidget(self.log_btn)
+
+        self.log_view_btn = QPushButton("Check Route Logs")
+        self.log_view_btn.clicked.connect(lambda: self.open_route_logs(*self.current_project()))
+        right_panel.addWidget(self.log_view_btn)
+
+        self.follow_btn = QPushButton("Follow Latest Route")
+        self.follow_btn.clicked.connect(lambda: self.follow_latest_route(*self.current_project()))
+        right_panel.addWidget(self.follow_btn)
+
+        self.search_btn = QPushButton("Find Routes by Location")
+        self.search_btn.clicked.connect(lambda: self.search_routes(*self.current_project()))
+        right_panel.addWidget(self.search_btn)
+
+        self.tag_search_btn = QPushButton("Find Routes by Tags")
+        self.tag_search_btn.clicked.connect(lambda: self.search_tags(*self.current_project()))
+        right_panel.addWidget(self.tag_search_btn)
+
+        self.archive_btn = QPushButton("Archive Old Routes")
+        self.archive_btn.clicked.connect(lambda: self.archive_routes(*self.current_project()))
+        right_panel.addWidget(self.archive_btn)
+
         layout.addLayout(left_panel, 1)
         layout.addLayout(right_panel, 2)
 
@@ -49,6 +105,10 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(container)
 
         self.load_projects()
+        self.show_project(None)
+        if recovered:
+            QTimer.singleShot(0, lambda: QMessageBox.information(
+                self, "Sessions Recovered", "\n".join(str(r) for r in recovered)))
 
         container = QWidget()
         container.setLayout(layout)
@@ -65,140 +125,167 @@ class MainWindow(QMainWindow):
                     "taxonomy": taxonomy
                 }
 
-                os.makedirs("app_data/projects", exist_ok=True)
-                project_path = os.path.join("app_data", "projects", f"{name}.json")
-
-                with open(project_path, "w") as f:
-                    json.dump(project_data, f, indent=2)
+                try:
+                    self.projects.save(project_data)
+                except (OSError, ProjectError) as e:
+                    QMessageBox.warning(self, "Invalid Input", f"Failed to create project: {e}")
+                    return
                     
                 QMessageBox.information(self, "Project Created", f"Name: {name}\nGPS Frequency: {freq}s")
-                self.refresh_project_list()
             else:
                 QMessageBox.warning(self, "Invalid Input", "Project name cannot be empty.")
                 
     def load_projects(self):
+        # Served from the repository cache; no disk access
         self.project_list.clear()
-        project_dir = os.path.join("app_data", "projects")
-        os.makedirs(project_dir, exist_ok=True)
-        for filename in os.listdir(project_dir):
-            if filename.endswith(".json"):
-                item = QListWidgetItem(filename)
-                item.setData(1000, os.path.join(project_dir, filename))
-                self.project_list.addItem(item)
+        for path in self.projects.paths():
+            self.update_tag_taxonomy(path)
+            item = QListWidgetItem(os.path.basename(path))
+            item.setData(1000, path)
+            self.project_list.addItem(item)
+            if path == self.current_project_path:
+                self.project_list.setCurrentItem(item)
+
+        if self.current_project_path and self.projects.get(self.current_project_path) is None:
+            self.show_project(None)
 
     def load_project_details(self, item):
-        project_file = item.data(1000)
-        try:
-            with open(project_file, "r") as f:
-                data = json.load(f)
-
-            name = data.get("projectName", "N/A")
-            freq = data.get("gpsFrequency", "N/A")
-            taxonomy = data.get("taxonomy", [])
-
-            self.project_info.setText(f"Name: {name}\nGPS Frequency: {freq}s")
-
-            self.taxonomy_list.clear()
-            for entry in taxonomy:
-                class_name = entry.get("className", "Unknown")
-                attrs = ", ".join(entry.get("attributes", []))
-                self.taxonomy_list.addItem(f"{class_name} → {attrs}")
-
-            if hasattr(self, "edit_btn"):
-                self.edit_btn.deleteLater()
-            if hasattr(self, "log_btn"):
-                self.log_btn.deleteLater()
-            if hasattr(self, "log_view_btn"):
-                self.log_view_btn.deleteLater()
-
-            self.edit_btn = QPushButton("Edit This Project")
-            self.edit_btn.clicked.connect(lambda: self.edit_project(project_file))
-            self.centralWidget().layout().itemAt(1).layout().addWidget(self.edit_btn)
-            
-            self.log_btn = QPushButton("Start Route Logging")
-            self.log_btn.clicked.connect(lambda: self.open_route_logger(data, project_file))
-            self.centralWidget().layout().itemAt(1).layout().addWidget(self.log_btn)
-            
-            self.log_view_btn = QPushButton("Check Route Logs")
-            self.log_view_btn.clicked.connect(lambda: self.open_route_logs(data, project_file))
-            self.centralWidget().layout().itemAt(1).layout().addWidget(self.log_view_btn)
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Failed to load project: {e}")
+        self.show_project(item.data(1000))
+
+    def show_project(self, project_file):
+        data = self.projects.get(project_file) if project_file else None
+        self.current_project_path = project_file if data is not None else None
+        for btn in (self.edit_btn, self.log_btn, self.log_view_btn, self.follow_btn,
+                    self.search_btn, self.tag_search_btn, self.archive_btn):
+            btn.setEnabled(data is not None)
+
+        self.taxonomy_list.clear()
+        if data is None:
+            self.project_info.setText("Select a project to view details")
+            return
+
+        name = data.get("projectName", "N/A")
+        freq = data.get("gpsFrequency", "N/A")
+        self.project_info.setText(f"Name: {name}\nGPS Frequency: {freq}s")
+
+        for entry in data.get("taxonomy", []):
+            class_name = entry.get("className", "Unknown")
+            attrs = ", ".join(entry.get("attributes", []))
+            self.taxonomy_list.addItem(f"{class_name} → {attrs}")
+
+    def update_tag_taxonomy(self, project_file):
+        data = self.projects.get(project_file)
+        if data is not None:
+            self.tags.set_taxonomy(data["projectName"], data.get("taxonomy", []))
+
+    def on_project_changed(self, project_file):
+        # Taxonomy edits change which tags can be queried
+        self.update_tag_taxonomy(project_file)
+        if project_file == self.current_project_path:
+            self.show_project(project_file)
+
+    def current_project(self):
+        return self.projects.get(self.current_project_path), self.current_project_path
 
     def open_route_logs(self, project_data, project_path):
         project_name = project_data['projectName']
-        route_dir = os.path.join("app_data", "routes")
-        route_files = glob.glob(os.path.join(route_dir, f"route_{project_name}_*.jsonl"))
 
-        if not route_files:
+        if not self.catalog.routes(project_name):
             QMessageBox.information(self, "No Routes", f"No route logs found for project: {project_name}")
             return
 
-        dialog = QDialog(self)
-        dialog.setWindowTitle(f"Routes for {project_name}")
-        layout = QVBoxLayout()
-
-        layout.addWidget(QLabel("Click a route to view logs:"))
-
-        for route_file in sorted(route_files, reverse=True):  # Show latest first
-            filename = os.path.basename(route_file)
-            btn = QPushButton(filename)
-            btn.clicked.connect(lambda _, f=route_file: self.show_route_logs(f))
-            layout.addWidget(btn)
+        taxonomy = project_data.get("taxonomy", [])
+        dialog = RouteBrowserDialog(self, project_name, self.catalog,
+                                    lambda f: self.show_route_logs(f, taxonomy),
+                                    lambda routes: self.show_route_map(routes, taxonomy),
+                                    lambda routes: self.export_routes(routes, taxonomy))
+        dialog.exec_()
 
-        dialog.setLayout(layout)
+    def show_route_map(self, routes, taxonomy=None):
+        dialog = RouteMapDialog(self, routes, taxonomy)
         dialog.exec_()
-        
-    def show_route_logs(self, filepath):
-        viewer = QDialog(self)
-        viewer.setWindowTitle(f"Log View – {os.path.basename(filepath)}")
-        layout = QVBoxLayout()
-
-        text_edit = QTextEdit()
-        text_edit.setReadOnly(True)
-
-        # Load and pretty print first 50 lines
-        lines = []
-        with open(filepath, "r") as f:
-            for i, line in enumerate(f):
-                if i >= 50:
-                    lines.append("...\n(Only showing first 50 logs)")
-                    break
-                try:
-                    lines.append(json.dumps(json.loads(line), indent=2))
-                except json.JSONDecodeError:
-                    lines.append(line)
 
-        text_edit.setText("\n\n".join(lines))
-        layout.addWidget(text_edit)
+    def export_routes(self, routes, taxonomy=None):
+        dialog = ExportDialog(self, routes, taxonomy)
+        dialog.exec_()
 
-        viewer.setLayout(layout)
-        viewer.resize(600, 500)
+    def show_route_logs(self, filepath, taxonomy=None):
+        try:
+            viewer = RouteViewerDialog(self, filepath, taxonomy)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to open route log: {e}")
+            return
         viewer.exec_()
     
+    def follow_latest_route(self, project_data, project_path):
+        # Picks up sessions that are still being logged, which the catalog only sees once stopped
+        paths = latest_session(project_data["projectName"], self.catalog.route_dir)
+        if not paths:
+            QMessageBox.information(self, "No Routes",
+                                    f"No route logs found for project: {project_data['projectName']}")
+            return
+        try:
+            viewer = RouteViewerDialog(self, paths, project_data.get("taxonomy", []), follow=True)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", f"Failed to open route log: {e}")
+            return
+        viewer.setAttribute(Qt.WA_DeleteOnClose)
+        viewer.show()
+
+    def open_session(self, session, taxonomy=None):
+        paths = session_segments(self.catalog.route_dir, session)
+        if paths:
+            self.show_route_logs(paths[0] if len(paths) == 1 else paths, taxonomy)
+
+    def search_routes(self, project_data, project_path):
+        taxonomy = project_data.get("taxonomy", [])
+        dialog = SpatialSearchDialog(self, project_data["projectName"], self.spatial,
+                                     lambda session: self.open_session(session, taxonomy))
+        dialog.exec_()
+
+    def search_tags(self, project_data, project_path):
+        taxonomy = project_data.get("taxonomy", [])
+        dialog = TagSearchDialog(self, project_data["projectName"], taxonomy, self.tags,
+                                 lambda session: self.open_session(session, taxonomy))
+        dialog.exec_()
+
+    def archive_routes(self, project_data, project_path):
+        # The job runs on a worker thread, which needs connections of its own
+        route_dir = self.catalog.route_dir
+        dialog = ArchiveDialog(self, project_data["projectName"], project_data.get("taxonomy", []),
+                               lambda: RouteCatalog(self.catalog.db_path, route_dir),
+                               [lambda: SpatialIndex(self.spatial.db_path, route_dir),
+                                lambda: TagIndex(self.tags.db_path, route_dir)])
+        dialog.exec_()
+
     def open_route_logger(self, project_data, project_path):
-        dlg = RouteLoggerDialog(self, project_data, project_path)
-        dlg.exec_()
+        # Modeless, so the session can be followed from the main window while it runs
+        dlg = RouteLoggerDialog(self, project_data, project_path, catalog=self.catalog,
+                                indexes=[self.spatial, self.tags])
+        dlg.setAttribute(Qt.WA_DeleteOnClose)
+        dlg.show()
         
+    def closeEvent(self, event):
+        # Running loggers drain their writers before the app exits
+        for dlg in self.findChildren(RouteLoggerDialog):
+            dlg.close()
+        super().closeEvent(event)
+
     def edit_project(self, project_path):
-        dialog = EditProjectDialog(self, project_path=project_path)
+        dialog = EditProjectDialog(self, project_path=project_path, repository=self.projects)
         if dialog.exec_():
+            # The repository signals the change, which refreshes the details panel
             QMessageBox.information(self, "Updated", "Project updated successfully.")
-            self.refresh_project_list()
-
-            # Find and re-select the edited item to reload its details
-            for i in range(self.project_list.count()):
-                item = self.project_list.item(i)
-                if item.data(1000) == project_path:
-                    self.project_list.setCurrentItem(item)  # triggers load_project_details
-                    self.load_project_details(item)         # explicitly reloads UI
-                    break
-            
-    def refresh_project_list(self):
-        self.load_projects()
-        self.project_info.setText("Select a project to view details")
-        self.taxonomy_list.clear()
+            if dialog.retag_requested:
+                self.retag_routes(dialog.project_data)
+
+    def retag_routes(self, project_data):
+        route_dir = self.catalog.route_dir
+        dialog = RetagDialog(self, project_data, route_dir,
+                             lambda: RouteCatalog(self.catalog.db_path, route_dir),
+                             [lambda: SpatialIndex(self.spatial.db_path, route_dir),
+                              lambda: TagIndex(self.tags.db_path, route_dir)])
+        dialog.exec_()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
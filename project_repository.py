@@ -0,0 +1,85 @@
+import os
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, pyqtSignal
+
+from gta.projects import PROJECT_DIR, ProjectStore
+
+
+class ProjectRepository(QObject):
+    """Cached project files, kept in sync with disk through a QFileSystemWatcher.
+
+    Only files reported as changed are re-read. ``project_changed`` is
+    emitted with the path of a project whose contents changed, and
+    ``projects_changed`` whenever the set of projects changes.
+    """
+
+    project_changed = pyqtSignal(str)
+    projects_changed = pyqtSignal()
+
+    def __init__(self, parent=None, project_dir=PROJECT_DIR):
+        super().__init__(parent)
+        self.store = ProjectStore(project_dir)
+        self.store.load_all()
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(project_dir)
+        self._watch_files()
+        self.watcher.fileChanged.connect(self._on_file_changed)
+        self.watcher.directoryChanged.connect(self._on_dir_changed)
+
+    @property
+    def project_dir(self):
+        return self.store.project_dir
+
+    @property
+    def errors(self):
+        return self.store.errors
+
+    def _watch_files(self):
+        watched = set(self.watcher.files())
+        wanted = [p for p in list(self.store.projects) + list(self.store.errors) if p not in watched]
+        if wanted:
+            self.watcher.addPaths(wanted)
+
+    def _on_file_changed(self, path):
+        existed = path in self.store.projects
+        if not self.store.reload(path):
+            return
+        # Atomic replaces drop the watch on the old inode
+        if os.path.exists(path):
+            self.watcher.addPath(path)
+        if existed and path in self.store.projects:
+            self.project_changed.emit(path)
+        else:
+            self.projects_changed.emit()
+
+    def _on_dir_changed(self, _path):
+        changed = self.store.sync_dir()
+        if not changed:
+            return
+        self._watch_files()
+        self.projects_changed.emit()
+        for path in changed:
+            if path in self.store.projects:
+                self.project_changed.emit(path)
+
+    def get(self, path):
+        return self.store.get(path)
+
+    def paths(self):
+        return self.store.paths()
+
+    def path_for(self, name):
+        return self.store.path_for(name)
+
+    def exists(self, name):
+        return self.path_for(name) in self.store.projects
+
+    def save(self, data, path=None):
+        is_new = (path or self.path_for(data["projectName"])) not in self.store.projects
+        path = self.store.save(data, path)
+        self.watcher.addPath(path)
+        if is_new:
+            self.projects_changed.emit()
+        self.project_changed.emit(path)
+        return path
@@ -0,0 +1,130 @@
+import os
+
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QPushButton, QSpinBox, QProgressBar, QListWidget
+)
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from gta.retag import RetagJob
+from gta.taxonomy import taxonomy_version
+
+
+class RetagWorker(QThread):
+    """Drives a ``RetagJob`` off the GUI thread and reports each finished file."""
+
+    file_done = pyqtSignal(str, int, int, str, int)  # file, records changed, tags dropped, error, files in the run
+    retag_failed = pyqtSignal(str)
+
+    def __init__(self, job, parent=None):
+        super().__init__(parent)
+        self.job = job
+
+    def run(self):
+        try:
+            for result in self.job.run():
+                self.file_done.emit(result.filename, result.changed, result.dropped, result.error or "",
+                                    self.job.total)
+        except Exception as e:
+            self.retag_failed.emit(str(e))
+
+
+class RetagDialog(QDialog):
+    def __init__(self, parent, project_data, route_dir, catalog_factory, index_factories=()):
+        super().__init__(parent)
+        self.setWindowTitle(f"Update Routes - {project_data['projectName']}")
+        self.project_data = project_data
+        self.route_dir = route_dir
+        self.catalog_factory = catalog_factory
+        self.index_factories = index_factories
+        self.worker = None
+        self.job = None
+
+        self.workers_input = QSpinBox()
+        self.workers_input.setRange(1, max(1, os.cpu_count() or 1) * 2)
+        self.workers_input.setValue(os.cpu_count() or 1)
+        form = QFormLayout()
+        form.addRow("Worker processes:", self.workers_input)
+
+        self.progress = QProgressBar()
+        self.progress.setValue(0)
+        self.status_label = QLabel(f"Rewrite the project's routes to taxonomy version {taxonomy_version(project_data)}. "
+                                   "An interrupted run resumes where it stopped.")
+        self.status_label.setWordWrap(True)
+        self.results = QListWidget()
+
+        self.start_btn = QPushButton("Rewrite Routes")
+        self.start_btn.clicked.connect(self.start_retag)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_retag)
+        self.cancel_btn.setEnabled(False)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.reject)
+        buttons = QHBoxLayout()
+        buttons.addStretch(1)
+        buttons.addWidget(self.start_btn)
+        buttons.addWidget(self.cancel_btn)
+        buttons.addWidget(close_btn)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.results)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.resize(600, 400)
+
+    def start_retag(self):
+        self.results.clear()
+        self.progress.setRange(0, 0)  # busy until the first file reports the run's size
+        self.rewritten = 0
+        self.failed = 0
+        self.job = RetagJob(self.project_data, self.catalog_factory, self.route_dir,
+                            index_factories=self.index_factories, workers=self.workers_input.value())
+        self.worker = RetagWorker(self.job, self)
+        self.worker.file_done.connect(self.on_file_done)
+        self.worker.retag_failed.connect(lambda msg: self.status_label.setText(f"Update failed: {msg}"))
+        self.worker.finished.connect(self.on_finished)
+        self.start_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        self.status_label.setText("Rewriting routes…")
+        self.worker.start()
+
+    def cancel_retag(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("Cancelling…")
+
+    def on_file_done(self, name, changed, dropped, error, total):
+        if self.progress.maximum() == 0:
+            self.progress.setRange(0, total)
+        self.progress.setValue(self.progress.value() + 1)
+        if error:
+            self.failed += 1
+            self.results.addItem(f"{name}: {error}")
+        elif changed:
+            self.rewritten += 1
+            dropped = f", {dropped} tags dropped" if dropped else ""
+            self.results.addItem(f"{name}: {changed} records rewritten{dropped}")
+        self.results.scrollToBottom()
+
+    def on_finished(self):
+        self.start_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        if self.progress.maximum() == 0:
+            self.progress.setRange(0, 1)
+            self.progress.setValue(1)
+        if self.status_label.text().startswith("Update failed"):
+            return
+        if self.job.cancelled:
+            self.status_label.setText("Update cancelled; run it again to resume.")
+            return
+        failed = f", {self.failed} failed" if self.failed else ""
+        self.status_label.setText(f"{self.rewritten} files rewritten to taxonomy version {self.job.version}{failed}")
+
+    def done(self, result):
+        if self.worker is not None and self.worker.isRunning():
+            self.cancel_retag()
+            self.worker.wait()
+        super().done(result)
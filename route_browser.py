@@ -0,0 +1,192 @@
+import time
+
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QTableView,
+    QHeaderView, QAbstractItemView, QDateTimeEdit
+)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, QDateTime
+
+from gta.timeline import Timeline
+
+COLUMNS = ["Route", "Start", "End", "Points", "Size", "Bounding Box"]
+COLUMN_KEYS = ["filename", "start_ts", "end_ts", "point_count", "byte_size", None]
+
+
+def _fmt_time(ts):
+    if ts is None:
+        return ""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+
+
+def _fmt_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024.0
+
+
+def _fmt_bbox(row):
+    if row["min_lat"] is None:
+        return ""
+    return (f"{row['min_lat']:.5f}, {row['min_lon']:.5f} – "
+            f"{row['max_lat']:.5f}, {row['max_lon']:.5f}")
+
+
+class RouteListModel(QAbstractTableModel):
+    def __init__(self, rows, parent=None):
+        super().__init__(parent)
+        self.rows = rows
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        col = index.column()
+        key = COLUMN_KEYS[col]
+
+        if role == Qt.UserRole:
+            # Raw value used for sorting
+            return row[key] if key else row["min_lat"]
+        if role != Qt.DisplayRole:
+            return None
+
+        if col == 0:
+            if row["segment_count"] > 1:
+                return f"{row['session']} ({row['segment_count']} segments)"
+            return row["filename"]
+        if col in (1, 2):
+            return _fmt_time(row[key])
+        if col == 3:
+            return str(row["point_count"])
+        if col == 4:
+            return _fmt_size(row["byte_size"])
+        return _fmt_bbox(row)
+
+
+class RouteBrowserDialog(QDialog):
+    def __init__(self, parent, project_name, catalog, on_open, on_map=None, on_export=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Routes for {project_name}")
+        self.project_name = project_name
+        self.catalog = catalog
+        self.on_open = on_open
+        self.on_map = on_map
+        self.on_export = on_export
+
+        self.model = RouteListModel(catalog.routes(project_name), self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.model)
+        self.proxy.setSortRole(Qt.UserRole)
+        self.proxy.setFilterKeyColumn(0)
+        self.proxy.setFilterCaseSensitivity(Qt.CaseInsensitive)
+
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter by route name")
+        self.filter_input.textChanged.connect(self.proxy.setFilterFixedString)
+
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(1, Qt.DescendingOrder)  # latest first
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        # Interactive sizing: ResizeToContents would measure every row on open
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 260)
+        self.table.setColumnWidth(1, 140)
+        self.table.setColumnWidth(2, 140)
+        self.table.doubleClicked.connect(self.open_index)
+
+        open_btn = QPushButton("Open Route")
+        open_btn.clicked.connect(lambda: self.open_index(self.table.currentIndex()))
+        buttons = QHBoxLayout()
+        buttons.addWidget(open_btn)
+        if on_map is not None:
+            map_btn = QPushButton("Show on Map")
+            map_btn.clicked.connect(self.show_selected_on_map)
+            buttons.addWidget(map_btn)
+        if on_export is not None:
+            export_btn = QPushButton("Export…")
+            export_btn.setToolTip("Export the selected routes, or every route if none is selected")
+            export_btn.clicked.connect(self.export_selected)
+            buttons.addWidget(export_btn)
+
+        # Defaults to the whole project; narrowing the range skips files outside it
+        starts = [row["start_ts"] for row in self.model.rows if row["start_ts"] is not None]
+        ends = [row["end_ts"] for row in self.model.rows if row["end_ts"] is not None]
+        self.from_edit = self._time_edit(min(starts) if starts else None)
+        self.to_edit = self._time_edit(max(ends) + 1 if ends else None)
+        timeline_btn = QPushButton("Open Timeline")
+        timeline_btn.clicked.connect(self.open_timeline)
+        timeline = QHBoxLayout()
+        timeline.addWidget(QLabel("Timeline from"))
+        timeline.addWidget(self.from_edit)
+        timeline.addWidget(QLabel("to"))
+        timeline.addWidget(self.to_edit)
+        timeline.addWidget(timeline_btn)
+        timeline.addStretch(1)
+
+        top = QHBoxLayout()
+        top.addWidget(QLabel(f"{self.model.rowCount()} routes"))
+        top.addWidget(self.filter_input, 1)
+
+        layout = QVBoxLayout()
+        layout.addLayout(top)
+        layout.addWidget(QLabel("Double-click a route to view logs:"))
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        layout.addLayout(timeline)
+        self.setLayout(layout)
+        self.resize(800, 400)
+
+    @staticmethod
+    def _time_edit(ts):
+        edit = QDateTimeEdit()
+        edit.setCalendarPopup(True)
+        edit.setDisplayFormat("yyyy-MM-dd HH:mm:ss")
+        edit.setDateTime(QDateTime.fromSecsSinceEpoch(int(ts)) if ts is not None
+                         else QDateTime.currentDateTime())
+        return edit
+
+    def _route_paths(self, index):
+        row = self.model.rows[self.proxy.mapToSource(index).row()]
+        paths = self.catalog.session_paths(row["session"])
+        return paths[0] if len(paths) == 1 else paths
+
+    def open_index(self, index):
+        if index.isValid():
+            self.on_open(self._route_paths(index))
+
+    def show_selected_on_map(self):
+        rows = self.table.selectionModel().selectedRows()
+        if rows:
+            self.on_map([self._route_paths(index) for index in rows])
+
+    def export_selected(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            rows = [self.proxy.index(i, 0) for i in range(self.proxy.rowCount())]
+        if rows:
+            self.on_export([self._route_paths(index) for index in rows])
+
+    def open_timeline(self):
+        timeline = Timeline.for_project(
+            self.project_name, self.catalog.route_dir,
+            self.from_edit.dateTime().toSecsSinceEpoch(), self.to_edit.dateTime().toSecsSinceEpoch(),
+            self.catalog
+        )
+        self.on_open(timeline)
@@ -0,0 +1,252 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QGraphicsView, QGraphicsScene,
+    QGraphicsItem, QStyleOptionGraphicsItem
+)
+from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QPolygonF
+from PyQt5.QtCore import Qt, QRectF, QPointF, QThread, pyqtSignal
+
+from gta.analytics import read_route_arrays
+from gta.route_geometry import RoutePyramid, unproject
+from gta.route_segments import session_name
+from gta.timeline import Timeline
+
+ROUTE_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+                "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+CLASS_COLORS = ["#e6194b", "#3cb44b", "#4363d8", "#f58231", "#911eb4",
+                "#42d4f4", "#f032e6", "#bfef45", "#469990", "#9a6324"]
+UNCLASSED_COLOR = "#000000"
+MARKER_RADIUS_PX = 4.0
+CHUNK_CACHE_SIZE = 4096
+
+
+def _polygon(x, y):
+    # Fills the QPolygonF's point buffer directly instead of building QPointFs one by one
+    poly = QPolygonF(len(x))
+    ptr = poly.data()
+    ptr.setsize(16 * len(x))
+    buf = np.frombuffer(ptr, dtype=np.float64)
+    buf[0::2] = x
+    buf[1::2] = y
+    return poly
+
+
+def class_color(index):
+    return QColor(UNCLASSED_COLOR if index < 0 else CLASS_COLORS[index % len(CLASS_COLORS)])
+
+
+def route_label(route):
+    if isinstance(route, Timeline):
+        return route.title
+    if isinstance(route, str):
+        return os.path.basename(route)
+    return session_name(route[0]) or os.path.basename(route[0])
+
+
+class RouteItem(QGraphicsItem):
+    """Draws one route from its pyramid, at the detail the current zoom needs.
+
+    Only chunks that intersect the exposed rect are painted, and the polygons
+    built for them are kept in a bounded LRU cache.
+    """
+
+    def __init__(self, pyramid, color, parent=None):
+        super().__init__(parent)
+        self.pyramid = pyramid
+        self.pen = QPen(QColor(color), 2)
+        self.pen.setCosmetic(True)  # width in pixels at every zoom
+        self.marker_brushes = {}
+        self._cache = OrderedDict()
+        min_x, min_y, max_x, max_y = pyramid.bounds
+        self._rect = QRectF(min_x, min_y, max_x - min_x, max_y - min_y)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+
+    def boundingRect(self):
+        # Markers are drawn at a fixed pixel size, so allow a little room around the track
+        pad = max(self._rect.width(), self._rect.height(), 1.0) * 0.01
+        return self._rect.adjusted(-pad, -pad, pad, pad)
+
+    def _chunk_polygon(self, level_no, level, chunk_no):
+        key = (level_no, chunk_no)
+        poly = self._cache.get(key)
+        if poly is not None:
+            self._cache.move_to_end(key)
+            return poly
+        start, end = level.chunks[chunk_no]
+        idx = level.indices[start:end]
+        poly = _polygon(self.pyramid.x[idx], self.pyramid.y[idx])
+        self._cache[key] = poly
+        if len(self._cache) > CHUNK_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return poly
+
+    def paint(self, painter, option, widget=None):
+        scale = painter.worldTransform().m11() or 1.0
+        # Half a pixel of simplification error is invisible
+        level = self.pyramid.level_for(0.5 / scale)
+        level_no = self.pyramid.levels.index(level)
+        exposed = option.exposedRect if isinstance(option, QStyleOptionGraphicsItem) else self.boundingRect()
+        min_x, min_y = exposed.left(), exposed.top()
+        max_x, max_y = exposed.right(), exposed.bottom()
+
+        painter.setPen(self.pen)
+        for chunk_no in level.visible_chunks(min_x, min_y, max_x, max_y).tolist():
+            painter.drawPolyline(self._chunk_polygon(level_no, level, chunk_no))
+
+        rows = self.pyramid.marker_rows
+        if not len(rows):
+            return
+        mx, my = self.pyramid.x[rows], self.pyramid.y[rows]
+        visible = np.flatnonzero((mx >= min_x) & (mx <= max_x) & (my >= min_y) & (my <= max_y))
+        if not len(visible):
+            return
+        radius = MARKER_RADIUS_PX / scale
+        painter.setPen(Qt.NoPen)
+        classes = self.pyramid.marker_classes
+        for i in visible.tolist():
+            cls = int(classes[i])
+            brush = self.marker_brushes.get(cls)
+            if brush is None:
+                brush = self.marker_brushes[cls] = QBrush(class_color(cls))
+            painter.setBrush(brush)
+            painter.drawEllipse(QPointF(mx[i], my[i]), radius, radius)
+
+
+class MapLoadWorker(QThread):
+    """Reads routes and builds their pyramids off the GUI thread."""
+
+    route_loaded = pyqtSignal(str, object)
+    route_failed = pyqtSignal(str, str)
+
+    def __init__(self, routes, taxonomy, parent=None):
+        super().__init__(parent)
+        self.routes = routes
+        self.taxonomy = taxonomy
+        self.origin = None
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def run(self):
+        for route in self.routes:
+            if self._cancelled:
+                return
+            label = route_label(route)
+            try:
+                arrays = read_route_arrays(route)
+                if self.origin is None:
+                    ok = np.isfinite(arrays.lat) & np.isfinite(arrays.lon)
+                    if not ok.any():
+                        continue
+                    # Every route shares the projection of the first one
+                    self.origin = (float(np.median(arrays.lat[ok])), float(np.median(arrays.lon[ok])))
+                pyramid = RoutePyramid(arrays, self.origin, self.taxonomy)
+            except (OSError, ValueError) as e:
+                self.route_failed.emit(label, str(e))
+                continue
+            if len(pyramid):
+                self.route_loaded.emit(label, pyramid)
+
+
+class RouteMapView(QGraphicsView):
+    cursor_moved = pyqtSignal(float, float)
+
+    def __init__(self, scene, parent=None):
+        super().__init__(scene, parent)
+        self.origin = None
+        self.setRenderHint(QPainter.Antialiasing)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setResizeAnchor(QGraphicsView.AnchorViewCenter)
+        self.setOptimizationFlag(QGraphicsView.DontSavePainterState)
+        self.setBackgroundBrush(QColor("#f4f4f0"))
+        self.setMouseTracking(True)
+
+    def wheelEvent(self, event):
+        factor = 1.25 ** (event.angleDelta().y() / 120.0)
+        self.scale(factor, factor)
+
+    def mouseMoveEvent(self, event):
+        super().mouseMoveEvent(event)
+        if self.origin is not None:
+            pos = self.mapToScene(event.pos())
+            lat, lon = unproject(pos.x(), pos.y(), self.origin)
+            self.cursor_moved.emit(float(lat), float(lon))
+
+    def fit_all(self):
+        rect = self.scene().itemsBoundingRect()
+        if not rect.isEmpty():
+            self.fitInView(rect, Qt.KeepAspectRatio)
+
+
+class RouteMapDialog(QDialog):
+    def __init__(self, parent, routes, taxonomy=None):
+        # routes: route files and/or lists of session segments, overlaid on one map
+        super().__init__(parent)
+        self.setWindowTitle(f"Route Map – {route_label(routes[0]) if len(routes) == 1 else f'{len(routes)} routes'}")
+        self.taxonomy = taxonomy or []
+        self.total = len(routes)
+        self.loaded = 0
+        self.points = 0
+
+        self.scene = QGraphicsScene(self)
+        self.scene.setItemIndexMethod(QGraphicsScene.NoIndex)  # a few dozen large items
+        self.view = RouteMapView(self.scene, self)
+        self.view.cursor_moved.connect(
+            lambda lat, lon: self.position_label.setText(f"{lat:.6f}, {lon:.6f}")
+        )
+
+        fit_btn = QPushButton("Fit All")
+        fit_btn.clicked.connect(self.view.fit_all)
+        self.status_label = QLabel(f"Loading 0/{self.total} routes…")
+        self.position_label = QLabel()
+
+        legend = " ".join(
+            f'<span style="color:{class_color(i).name()}">●</span> {entry["className"]}'
+            for i, entry in enumerate(self.taxonomy)
+        )
+        top = QHBoxLayout()
+        top.addWidget(self.status_label)
+        top.addStretch(1)
+        top.addWidget(QLabel(legend))
+        top.addWidget(fit_btn)
+
+        layout = QVBoxLayout()
+        layout.addLayout(top)
+        layout.addWidget(self.view)
+        layout.addWidget(self.position_label)
+        self.setLayout(layout)
+        self.resize(900, 650)
+
+        self.worker = MapLoadWorker(list(routes), self.taxonomy, self)
+        self.worker.route_loaded.connect(self.add_route)
+        self.worker.route_failed.connect(
+            lambda label, msg: self.status_label.setText(f"Failed to load {label}: {msg}")
+        )
+        self.worker.finished.connect(self.on_loaded)
+        self.worker.start()
+
+    def add_route(self, label, pyramid):
+        item = RouteItem(pyramid, ROUTE_COLORS[self.loaded % len(ROUTE_COLORS)])
+        item.setToolTip(label)
+        self.scene.addItem(item)
+        self.view.origin = self.worker.origin
+        self.loaded += 1
+        self.points += len(pyramid)
+        self.status_label.setText(f"Loading {self.loaded}/{self.total} routes…")
+        if self.loaded == 1:
+            self.view.fit_all()
+
+    def on_loaded(self):
+        self.status_label.setText(f"{self.loaded} routes, {self.points} points")
+        self.view.fit_all()
+
+    def done(self, result):
+        self.worker.cancel()
+        self.worker.wait()
+        super().done(result)
@@ -0,0 +1,354 @@
+import os
+import time
+
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QSpinBox, QTableView,
+    QHeaderView, QAbstractItemView, QTextEdit, QSplitter, QCheckBox
+)
+from PyQt5.QtCore import (
+    Qt, QAbstractTableModel, QModelIndex, QThread, QFileSystemWatcher, pyqtSignal
+)
+
+from gta.records import dumps_pretty
+from gta.route_index import RouteIndex, SessionIndex, open_route_index
+from gta.route_segments import session_name, session_segments, strip_compression
+from gta.analytics import analyze_route, format_analysis
+from gta.timeline import Timeline, TimelineIndex
+from route_map import RouteMapDialog, route_label
+
+COLUMNS = ["#", "Tick", "Time", "Latitude", "Longitude", "Meta Data"]
+
+
+class RouteTableModel(QAbstractTableModel):
+    def __init__(self, route_index, parent=None):
+        super().__init__(parent)
+        self.route_index = route_index
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.route_index)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        # Sessions with several segments index them one at a time
+        can_load_more = getattr(self.route_index, "can_load_more", None)
+        return not parent.isValid() and can_load_more is not None and can_load_more()
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        first = len(self.route_index)
+        added = self.route_index.load_next()
+        if added:
+            self.beginInsertRows(QModelIndex(), first, first + added - 1)
+        self.route_index.commit_next()
+        if added:
+            self.endInsertRows()
+
+    def add_lines(self, offsets, end):
+        """Shows the rows an ``IndexWorker`` found."""
+        first = len(self.route_index)
+        if len(offsets):
+            self.beginInsertRows(QModelIndex(), first, first + len(offsets) - 1)
+        self.route_index.extend(offsets, end)
+        if len(offsets):
+            self.endInsertRows()
+
+    def fetch_all(self):
+        while self.canFetchMore():
+            self.fetchMore()
+
+    def refresh(self):
+        """Picks up rows appended to the route since it was indexed."""
+        old = len(self.route_index)
+        first = self.route_index.refresh()
+        new = len(self.route_index)
+        if new < old:
+            # Truncated or replaced
+            self.beginResetModel()
+            self.endResetModel()
+            return
+        if first < old:
+            # The last line was still being written when it was first shown
+            self.dataChanged.emit(self.index(first, 0), self.index(old - 1, len(COLUMNS) - 1))
+        if new > old:
+            self.beginInsertRows(QModelIndex(), old, new - 1)
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.ToolTipRole):
+            return None
+
+        row, col = index.row(), index.column()
+        if col == 0:
+            return str(row + 1)
+
+        rec = self.route_index.record(row)
+        if not isinstance(rec, dict):
+            # Torn or otherwise unparsable line: show it raw
+            if col == len(COLUMNS) - 1:
+                return self.route_index.line(row).decode("utf-8", errors="replace")
+            return None
+
+        if role == Qt.ToolTipRole:
+            return dumps_pretty(rec)
+
+        if col == 1:
+            return str(rec.get("tick_timestamp", ""))
+        if col == 2:
+            ts = rec.get("tick_timestamp")
+            if isinstance(ts, (int, float)):
+                return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+            return ""
+        if col == 3:
+            return _fmt_coord(rec.get("latitude"))
+        if col == 4:
+            return _fmt_coord(rec.get("longitude"))
+        meta = rec.get("meta_data") or {}
+        return ", ".join(f"{k}={v}" for k, v in meta.items())
+
+
+def _fmt_coord(value):
+    if isinstance(value, (int, float)):
+        return f"{value:.6f}"
+    return ""
+
+
+class IndexWorker(QThread):
+    """Finds the line starts of a route file off the GUI thread, a chunk at a time."""
+
+    lines_found = pyqtSignal(object, int)  # line starts, end of the bytes they cover
+
+    def __init__(self, route_index, parent=None):
+        super().__init__(parent)
+        self.route_index = route_index
+
+    def run(self):
+        start, end = self.route_index.size, self.route_index.mapped_size
+        while start < end and not self.isInterruptionRequested():
+            offsets, start = self.route_index.scan(start)
+            self.lines_found.emit(offsets, start)
+
+
+class AnalysisWorker(QThread):
+    analysis_ready = pyqtSignal(object)
+    analysis_failed = pyqtSignal(str)
+
+    def __init__(self, filepath, taxonomy, parent=None):
+        super().__init__(parent)
+        self.filepath = filepath
+        self.taxonomy = taxonomy
+
+    def run(self):
+        try:
+            result = analyze_route(self.filepath, self.taxonomy)
+        except Exception as e:
+            self.analysis_failed.emit(str(e))
+            return
+        self.analysis_ready.emit(result)
+
+
+class RouteViewerDialog(QDialog):
+    def __init__(self, parent, filepath, taxonomy=None, follow=False):
+        # filepath is a route file, the list of a session's segments or a Timeline
+        super().__init__(parent)
+        self.setWindowTitle(f"Log View – {route_label(filepath)}")
+        self.filepath = filepath
+        self.taxonomy = taxonomy
+        self.worker = None
+        self.index_worker = None
+        self.watcher = None
+
+        if isinstance(filepath, Timeline):
+            self.route_index = TimelineIndex(filepath)
+        elif follow:
+            # A live session may still roll over into new segments
+            self.route_index = SessionIndex([filepath] if isinstance(filepath, str) else filepath)
+        else:
+            # Large JSONL files are indexed in the background, rows appearing as they are found
+            self.route_index = open_route_index(filepath, build=False)
+        self.model = RouteTableModel(self.route_index, self)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setAlternatingRowColors(True)
+        self.table.verticalHeader().setVisible(False)
+        # Fixed row heights and no content-based sizing, so only visible rows are ever parsed
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+
+        self.row_input = QSpinBox()
+        self.row_input.setRange(1, max(1, len(self.route_index)))
+        jump_btn = QPushButton("Go to Row")
+        jump_btn.clicked.connect(lambda: self.jump_to(self.row_input.value() - 1))
+        first_btn = QPushButton("First")
+        first_btn.clicked.connect(lambda: self.jump_to(0))
+        last_btn = QPushButton("Last")
+        last_btn.clicked.connect(self.jump_to_last)
+
+        nav = QHBoxLayout()
+        self.count_label = QLabel()
+        self.update_row_count()
+        self.model.rowsInserted.connect(self.update_row_count)
+        nav.addWidget(self.count_label)
+        nav.addStretch(1)
+        nav.addWidget(first_btn)
+        nav.addWidget(last_btn)
+        nav.addWidget(self.row_input)
+        nav.addWidget(jump_btn)
+
+        self.analyze_btn = QPushButton("Analyze Route")
+        self.analyze_btn.clicked.connect(self.run_analysis)
+        nav.addWidget(self.analyze_btn)
+
+        map_btn = QPushButton("Show Map")
+        map_btn.clicked.connect(self.show_map)
+        nav.addWidget(map_btn)
+
+        self.follow_box = QCheckBox("Follow")
+        self.follow_box.toggled.connect(self.set_following)
+        nav.addWidget(self.follow_box)
+        if isinstance(filepath, Timeline):
+            self.follow_box.setEnabled(False)
+
+        self.analysis_view = QTextEdit()
+        self.analysis_view.setReadOnly(True)
+        self.analysis_view.hide()
+
+        splitter = QSplitter(Qt.Vertical)
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.analysis_view)
+
+        layout = QVBoxLayout()
+        layout.addLayout(nav)
+        layout.addWidget(splitter)
+        self.setLayout(layout)
+        self.resize(800, 500)
+
+        if isinstance(self.route_index, RouteIndex) and not self.route_index.complete:
+            self.follow_box.setEnabled(False)  # until the whole file is indexed
+            self.index_worker = IndexWorker(self.route_index, self)
+            self.index_worker.lines_found.connect(self.model.add_lines)
+            self.index_worker.finished.connect(self.on_indexed)
+            self.index_worker.start()
+            self.update_row_count()
+
+        if follow:
+            self.follow_box.setChecked(True)
+
+    @property
+    def indexing(self):
+        return self.index_worker is not None and not self.route_index.complete
+
+    def on_indexed(self):
+        self.update_row_count()
+        if self.route_index.complete:
+            self.follow_box.setEnabled(True)
+
+    def update_row_count(self):
+        rows = self.model.rowCount()
+        more = "+" if self.model.canFetchMore() or self.indexing else ""
+        self.count_label.setText(f"{rows}{more} entries")
+        self.row_input.setRange(1, max(1, rows))
+
+    def jump_to_last(self):
+        self.model.fetch_all()
+        self.jump_to(self.model.rowCount() - 1)
+
+    def jump_to(self, row):
+        if 0 <= row < self.model.rowCount():
+            idx = self.model.index(row, 0)
+            self.table.scrollTo(idx, QAbstractItemView.PositionAtCenter)
+            self.table.selectRow(row)
+
+    def set_following(self, enabled):
+        if not enabled:
+            if self.watcher is not None:
+                self.watcher.deleteLater()
+                self.watcher = None
+            return
+
+        self.model.fetch_all()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_route_changed)
+        self.watcher.directoryChanged.connect(self.on_route_dir_changed)
+        self._watch_tail()
+        if isinstance(self.route_index, SessionIndex):
+            self.watcher.addPath(os.path.dirname(self._tail_path()) or ".")
+        self.on_route_changed()
+
+    def _tail_path(self):
+        if isinstance(self.route_index, SessionIndex):
+            return self.route_index.paths[-1]
+        return self.route_index.path
+
+    def _watch_tail(self):
+        files = self.watcher.files()
+        if files:
+            self.watcher.removePaths(files)
+        self.watcher.addPath(self._tail_path())
+
+    def on_route_changed(self, _path=None):
+        # Only the bytes appended since the last notification are indexed
+        self.model.refresh()
+        self.table.scrollToBottom()
+
+    def on_route_dir_changed(self, route_dir):
+        tail = self._tail_path()
+        session = session_name(tail)
+        if session is None:
+            return
+        known = {strip_compression(os.path.basename(p)) for p in self.route_index.paths}
+        added = [p for p in session_segments(route_dir, session)
+                 if strip_compression(os.path.basename(p)) not in known]
+        if not added:
+            return
+        # Collect the closed segment's final bytes before moving on to the new ones
+        self.model.refresh()
+        self.route_index.add_paths(added)
+        self.model.fetch_all()
+        self._watch_tail()
+        self.on_route_changed()
+
+    def run_analysis(self):
+        self.analyze_btn.setEnabled(False)
+        self.analysis_view.setPlainText("Analyzing…")
+        self.analysis_view.show()
+        self.worker = AnalysisWorker(self.filepath, self.taxonomy, self)
+        self.worker.analysis_ready.connect(
+            lambda result: self.analysis_view.setPlainText(format_analysis(result))
+        )
+        self.worker.analysis_failed.connect(
+            lambda msg: self.analysis_view.setPlainText(f"Analysis failed: {msg}")
+        )
+        self.worker.finished.connect(lambda: self.analyze_btn.setEnabled(True))
+        self.worker.start()
+
+    def show_map(self):
+        dialog = RouteMapDialog(self, [self.filepath], self.taxonomy)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show()
+
+    def done(self, result):
+        if self.index_worker is not None:
+            self.index_worker.requestInterruption()
+            self.index_worker.wait()
+        if self.worker is not None:
+            self.worker.wait()
+        self.follow_box.setChecked(False)
+        self.table.setModel(None)
+        self.route_index.close()
+        super().done(result)
@@ -0,0 +1,194 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel, QLineEdit, QPushButton,
+    QTableView, QHeaderView, QAbstractItemView, QMessageBox
+)
+from PyQt5.QtGui import QDoubleValidator
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QThread, pyqtSignal
+
+from route_browser import _fmt_time
+
+COLUMNS = ["Route", "From", "To", "Points", "Nearest"]
+
+
+class SpatialResultModel(QAbstractTableModel):
+    """One row per pass of a session through the search area."""
+
+    def __init__(self, hits, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        for hit in hits:
+            nearest = hit.min_distance
+            for start, end, count in hit.ranges():
+                self.rows.append((hit.session, start, end, count, nearest))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        session, start, end, count, nearest = self.rows[index.row()]
+        col = index.column()
+        if col == 0:
+            return session
+        if col in (1, 2):
+            return _fmt_time(start if col == 1 else end)
+        if col == 3:
+            return str(count)
+        return "" if nearest is None else f"{nearest:.0f} m"
+
+
+class IndexWorker(QThread):
+    """Brings a project's part of a route index up to date off the GUI thread."""
+
+    indexed = pyqtSignal(int)
+    index_failed = pyqtSignal(str)
+
+    def __init__(self, index, project_name, parent=None):
+        super().__init__(parent)
+        self.index_class = type(index)
+        self.db_path = index.db_path
+        self.route_dir = index.route_dir
+        self.project_name = project_name
+
+    def run(self):
+        # SQLite connections stay on the thread that made them
+        try:
+            index = self.index_class(self.db_path, self.route_dir)
+            try:
+                updated, _ = index.sync(self.project_name)
+            finally:
+                index.close()
+        except Exception as e:
+            self.index_failed.emit(str(e))
+            return
+        self.indexed.emit(updated)
+
+
+class SpatialSearchDialog(QDialog):
+    def __init__(self, parent, project_name, spatial_index, on_open):
+        super().__init__(parent)
+        self.setWindowTitle(f"Find Routes by Location – {project_name}")
+        self.project_name = project_name
+        self.spatial_index = spatial_index
+        self.on_open = on_open
+
+        self.lat_input = self._coord_input(-90.0, 90.0)
+        self.lon_input = self._coord_input(-180.0, 180.0)
+        self.radius_input = QLineEdit("100")
+        self.radius_input.setValidator(QDoubleValidator(0.0, 1e7, 1))
+        self.near_btn = QPushButton("Search Near Point")
+        self.near_btn.clicked.connect(self.search_near)
+
+        near_form = QFormLayout()
+        near_form.addRow("Latitude:", self.lat_input)
+        near_form.addRow("Longitude:", self.lon_input)
+        near_form.addRow("Radius (m):", self.radius_input)
+        near_form.addRow(self.near_btn)
+
+        self.min_lat_input = self._coord_input(-90.0, 90.0)
+        self.min_lon_input = self._coord_input(-180.0, 180.0)
+        self.max_lat_input = self._coord_input(-90.0, 90.0)
+        self.max_lon_input = self._coord_input(-180.0, 180.0)
+        self.area_btn = QPushButton("Search Area")
+        self.area_btn.clicked.connect(self.search_area)
+
+        area_form = QFormLayout()
+        area_form.addRow("South latitude:", self.min_lat_input)
+        area_form.addRow("West longitude:", self.min_lon_input)
+        area_form.addRow("North latitude:", self.max_lat_input)
+        area_form.addRow("East longitude:", self.max_lon_input)
+        area_form.addRow(self.area_btn)
+
+        forms = QHBoxLayout()
+        forms.addLayout(near_form)
+        forms.addLayout(area_form)
+
+        self.status_label = QLabel("Indexing routes…")
+        self.model = SpatialResultModel([], self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 260)
+        self.table.setColumnWidth(1, 140)
+        self.table.setColumnWidth(2, 140)
+        self.table.doubleClicked.connect(self.open_index)
+
+        layout = QVBoxLayout()
+        layout.addLayout(forms)
+        layout.addWidget(self.status_label)
+        layout.addWidget(QLabel("Double-click a result to view the route:"))
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+        self.resize(800, 500)
+
+        self.set_searching_enabled(False)
+        self.worker = IndexWorker(spatial_index, project_name, self)
+        self.worker.indexed.connect(self.on_indexed)
+        self.worker.index_failed.connect(
+            lambda msg: self.status_label.setText(f"Indexing failed: {msg}")
+        )
+        self.worker.start()
+
+    @staticmethod
+    def _coord_input(low, high):
+        field = QLineEdit()
+        field.setValidator(QDoubleValidator(low, high, 7))
+        return field
+
+    def set_searching_enabled(self, enabled):
+        self.near_btn.setEnabled(enabled)
+        self.area_btn.setEnabled(enabled)
+
+    def on_indexed(self, updated):
+        self.status_label.setText(f"Index up to date ({updated} files indexed).")
+        self.set_searching_enabled(True)
+
+    def _values(self, *fields):
+        try:
+            return [float(field.text()) for field in fields]
+        except ValueError:
+            QMessageBox.warning(self, "Invalid Input", "Please fill in every coordinate.")
+            return None
+
+    def search_near(self):
+        values = self._values(self.lat_input, self.lon_input, self.radius_input)
+        if values is not None:
+            self.show_hits(lambda: self.spatial_index.query_near(self.project_name, *values))
+
+    def search_area(self):
+        values = self._values(self.min_lat_input, self.min_lon_input,
+                              self.max_lat_input, self.max_lon_input)
+        if values is not None:
+            self.show_hits(lambda: self.spatial_index.query_bbox(self.project_name, *values))
+
+    def show_hits(self, query):
+        try:
+            hits = query()
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Input", str(e))
+            return
+        self.model = SpatialResultModel(hits, self)
+        self.table.setModel(self.model)
+        self.status_label.setText(f"{len(hits)} routes, {self.model.rowCount()} passes")
+
+    def open_index(self, index):
+        if index.isValid():
+            self.on_open(self.model.rows[index.row()][0])
+
+    def done(self, result):
+        self.worker.wait()
+        super().done(result)
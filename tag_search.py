@@ -0,0 +1,155 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox,
+    QTableView, QHeaderView, QAbstractItemView, QMessageBox
+)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from route_browser import _fmt_time
+from spatial_search import IndexWorker
+
+COLUMNS = ["Route", "Tagged Ticks", "First", "Last"]
+
+
+class TagResultModel(QAbstractTableModel):
+    """One row per session with ticks matching the query."""
+
+    def __init__(self, matches, parent=None):
+        super().__init__(parent)
+        sessions = {}
+        for match in matches:
+            count, first, last = sessions.get(match.session, (0, None, None))
+            start, end = float(match.ts.min()), float(match.ts.max())
+            sessions[match.session] = (
+                count + len(match),
+                start if first is None else min(first, start),
+                end if last is None else max(last, end),
+            )
+        self.rows = sorted(((s,) + v for s, v in sessions.items()), key=lambda r: r[2])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        session, count, first, last = self.rows[index.row()]
+        col = index.column()
+        if col == 0:
+            return session
+        if col == 1:
+            return str(count)
+        return _fmt_time(first if col == 2 else last)
+
+
+class TagSearchDialog(QDialog):
+    def __init__(self, parent, project_name, taxonomy, tag_index, on_open):
+        super().__init__(parent)
+        self.setWindowTitle(f"Find Routes by Tags – {project_name}")
+        self.project_name = project_name
+        self.taxonomy = taxonomy
+        self.tag_index = tag_index
+        self.on_open = on_open
+
+        self.class_combo = QComboBox()
+        self.class_combo.addItems([entry["className"] for entry in taxonomy])
+        self.attr_combo = QComboBox()
+        self.class_combo.currentIndexChanged.connect(self.update_attributes)
+        self.update_attributes(0)
+
+        and_btn = QPushButton("AND")
+        and_btn.clicked.connect(lambda: self.add_term("AND"))
+        or_btn = QPushButton("OR")
+        or_btn.clicked.connect(lambda: self.add_term("OR"))
+
+        builder = QHBoxLayout()
+        builder.addWidget(self.class_combo)
+        builder.addWidget(QLabel("="))
+        builder.addWidget(self.attr_combo)
+        builder.addWidget(and_btn)
+        builder.addWidget(or_btn)
+
+        self.query_input = QLineEdit()
+        self.query_input.setPlaceholderText("e.g. Weather=Rainy AND (Traffic=Heavy OR Traffic=Moderate)")
+        self.query_input.returnPressed.connect(self.search)
+        self.search_btn = QPushButton("Search")
+        self.search_btn.clicked.connect(self.search)
+
+        query_row = QHBoxLayout()
+        query_row.addWidget(self.query_input, 1)
+        query_row.addWidget(self.search_btn)
+
+        self.status_label = QLabel("Indexing routes…")
+        self.model = TagResultModel([], self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 260)
+        self.table.setColumnWidth(2, 140)
+        self.table.doubleClicked.connect(self.open_index)
+
+        layout = QVBoxLayout()
+        layout.addLayout(builder)
+        layout.addLayout(query_row)
+        layout.addWidget(self.status_label)
+        layout.addWidget(QLabel("Double-click a result to view the route:"))
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+        self.resize(700, 450)
+
+        self.search_btn.setEnabled(False)
+        self.worker = IndexWorker(tag_index, project_name, self)
+        self.worker.indexed.connect(self.on_indexed)
+        self.worker.index_failed.connect(
+            lambda msg: self.status_label.setText(f"Indexing failed: {msg}")
+        )
+        self.worker.start()
+
+    def update_attributes(self, row):
+        self.attr_combo.clear()
+        if 0 <= row < len(self.taxonomy):
+            self.attr_combo.addItems(self.taxonomy[row]["attributes"])
+
+    def add_term(self, operator):
+        if self.class_combo.currentIndex() < 0:
+            return
+        term = f"{self.class_combo.currentText()}={self.attr_combo.currentText()}"
+        query = self.query_input.text().strip()
+        self.query_input.setText(f"{query} {operator} {term}" if query else term)
+
+    def on_indexed(self, updated):
+        self.status_label.setText(f"Index up to date ({updated} files indexed).")
+        self.search_btn.setEnabled(True)
+
+    def search(self):
+        if not self.search_btn.isEnabled() or not self.query_input.text().strip():
+            return
+        try:
+            matches = self.tag_index.query(self.project_name, self.query_input.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Invalid Query", str(e))
+            return
+        self.model = TagResultModel(matches, self)
+        self.table.setModel(self.model)
+        ticks = sum(len(m) for m in matches)
+        self.status_label.setText(f"{ticks} tagged ticks in {self.model.rowCount()} routes")
+
+    def open_index(self, index):
+        if index.isValid():
+            self.on_open(self.model.rows[index.row()][0])
+
+    def done(self, result):
+        self.worker.wait()
+        super().done(result)
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from gta.archive import ArchiveJob, ArchiveState
+from gta.generate import generate_project, generate_route, make_taxonomy
+from gta.route_catalog import RouteCatalog
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = str(tmp_path / "app_data")
+    _, paths = generate_project(data_dir, "P", routes=3, points=2000, seed=1)
+    # Two fixes in the binary format: an archive of it would be no smaller
+    start = int(os.path.basename(paths[0]).split("_")[2].split(".")[0]) - 7200
+    generate_route(os.path.join(data_dir, "routes", f"route_P_{start}.rbin"), 2, make_taxonomy(3), 0.0, "P",
+                   seed=0, events=False, start_ts=start)
+    return data_dir
+
+
+def _job(data_dir):
+    def catalog():
+        db = RouteCatalog(os.path.join(data_dir, "routes.db"), os.path.join(data_dir, "routes"))
+        db.revalidate()
+        return db
+
+    return ArchiveJob("P", catalog, 0.0, taxonomy=make_taxonomy(3), state_path=os.path.join(data_dir, "archive.json"))
+
+
+def test_kept_sessions_are_counted_apart(data_dir):
+    results = list(_job(data_dir).run())
+
+    assert len(results) == 4 and not any(r.error for r in results)
+    archived, kept, before, after = ArchiveState(os.path.join(data_dir, "archive.json")).totals("P")
+    assert (archived, kept) == (3, 1)
+    assert before - after == sum(r.reclaimed for r in results) > 0
+
+
+def test_interrupted_archive_resumes(data_dir, monkeypatch):
+    job = _job(data_dir)
+    finish = ArchiveJob._finish
+    calls = []
+
+    def killed_once(self, *args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 2:
+            raise KeyboardInterrupt  # after the second archive is written, before it replaces the route
+        return finish(self, *args, **kwargs)
+
+    monkeypatch.setattr(ArchiveJob, "_finish", killed_once)
+    with pytest.raises(KeyboardInterrupt):
+        for _ in job.run():
+            pass
+    monkeypatch.setattr(ArchiveJob, "_finish", finish)
+    state = ArchiveState(os.path.join(data_dir, "archive.json"))
+    assert state.sessions[calls[1]]["state"] == "replacing"
+    assert os.path.exists(os.path.join(data_dir, "routes", calls[1] + ".rbin.tmp"))
+
+    resumed = _job(data_dir)
+    results = list(resumed.run())
+
+    assert results[0].session == calls[1]  # the interrupted session is completed first
+    assert calls[0] not in [r.session for r in results]
+    assert resumed.total == len(results)
+    routes = [name for name in os.listdir(os.path.join(data_dir, "routes")) if not name.endswith(".events.jsonl")]
+    assert sorted(routes) == sorted(name + ".rbin" for name in resumed.state.sessions)
+    assert ArchiveState(os.path.join(data_dir, "archive.json")).totals("P")[:2] == (3, 1)
+    catalog = RouteCatalog(os.path.join(data_dir, "routes.db"), os.path.join(data_dir, "routes"))
+    try:
+        assert {row["session"] for row in catalog.routes("P")} == set(resumed.state.sessions)
+    finally:
+        catalog.close()
+    assert list(_job(data_dir).run()) == []
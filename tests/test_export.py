@@ -0,0 +1,18 @@
+import os
+
+from gta.export import BulkExporter
+from gta.generate import generate_route, make_taxonomy
+
+
+def test_a_failing_route_does_not_stop_the_others(tmp_path):
+    good = str(tmp_path / "route_P_1000.jsonl")
+    generate_route(good, 500, make_taxonomy(2), 0.05, "P", seed=0, events=False, start_ts=1000)
+    bad = str(tmp_path / "route_P_2000.jsonl")
+    with open(bad, "wb") as f:
+        f.write(b'{"tick_timestamp": 2000, "latitude": 50.0, "longitude": 8.0, "meta_data": ["not", "a", "dict"]}\n')
+
+    results = {r.name: r for r in BulkExporter([bad, good], str(tmp_path / "out"), "gpx", workers=1).run()}
+
+    assert results["route_P_2000"].dst is None and "AttributeError" in results["route_P_2000"].error
+    assert results["route_P_1000"].error is None and os.path.exists(results["route_P_1000"].dst)
+    assert not os.path.exists(str(tmp_path / "out" / "route_P_2000.gpx.part"))
@@ -0,0 +1,98 @@
+import os
+import shutil
+
+import pytest
+
+import gta.recovery
+from gta.recovery import SessionManifest, recover_sessions, unfinished_sessions
+from gta.projects import write_json_atomic
+from gta.records import encode_record, loads, read_records
+
+TAXONOMY = [{"className": "W", "attributes": ["a", "b"]}]
+
+
+def _interrupted_session(route_dir, fixes=200):
+    route = os.path.join(route_dir, "route_P_1000.jsonl")
+    with open(route, "wb") as f:
+        for i in range(fixes):
+            f.write(encode_record({"tick_timestamp": 1000.0 + i, "latitude": 50.0 + i * 1e-5,
+                                   "longitude": 8.0, "meta_data": {}}) + b"\n")
+        f.write(b'{"tick_timestamp": 1200.0, "lati')  # torn by the crash
+    manifest = SessionManifest(route)
+    manifest.create("P", TAXONOMY)
+    manifest.update([(1150.2, {"W": "a"}), (1190.7, {"W": "b"})])
+    return route, manifest.path
+
+
+def _tags(route):
+    return [rec for batch in read_records(route) for rec in batch if rec.is_tag]
+
+
+def test_recovery_cuts_torn_tail_and_replays_pending(tmp_path):
+    route, manifest = _interrupted_session(str(tmp_path))
+
+    (result,) = recover_sessions(str(tmp_path))
+
+    assert result.truncated == len(b'{"tick_timestamp": 1200.0, "lati')
+    assert result.replayed == 2
+    assert not os.path.exists(manifest)
+    assert [(t.meta_submitted_at, t.meta_data) for t in _tags(route)] == [(1150.2, {"W": "a"}),
+                                                                          (1190.7, {"W": "b"})]
+    assert [t.tick_timestamp for t in _tags(route)] == [1150.0, 1191.0]
+    times = [rec.tick_timestamp for batch in read_records(route) for rec in batch]
+    assert len(times) == 202 and times == sorted(times)
+    with open(route, "rb") as f:
+        assert f.read().endswith(b"\n")
+
+
+def test_interrupted_recovery_runs_again_without_repeating_tags(tmp_path):
+    route, manifest = _interrupted_session(str(tmp_path))
+    saved = str(tmp_path / "manifest.copy")
+    shutil.copy(manifest, saved)
+    recover_sessions(str(tmp_path))
+    # As if the first recovery had stopped just before removing the manifest
+    shutil.copy(saved, manifest)
+    os.remove(saved)
+
+    assert unfinished_sessions(str(tmp_path)) == [manifest]
+    (result,) = recover_sessions(str(tmp_path))
+
+    assert (result.truncated, result.replayed, result.unplaced) == (0, 0, 0)
+    assert len(_tags(route)) == 2
+    assert unfinished_sessions(str(tmp_path)) == []
+
+
+def test_interrupted_tag_insertion_is_put_back_and_redone(tmp_path, monkeypatch):
+    route, manifest = _interrupted_session(str(tmp_path))
+
+    def killed(rec):
+        raise KeyboardInterrupt  # after the tail was cut off, while writing it back
+
+    monkeypatch.setattr(gta.recovery, "encode_record", killed)
+    with pytest.raises(KeyboardInterrupt):
+        recover_sessions(str(tmp_path))
+    monkeypatch.undo()
+    assert os.path.exists(route + ".tail.tmp") and os.path.exists(manifest)
+
+    (result,) = recover_sessions(str(tmp_path))
+
+    assert result.replayed == 2
+    assert not os.path.exists(route + ".tail.tmp")
+    times = [rec.tick_timestamp for batch in read_records(route) for rec in batch]
+    assert len(times) == 202 and times == sorted(times)
+
+
+def test_manifest_of_a_reused_pid_is_recovered(tmp_path):
+    route, manifest = _interrupted_session(str(tmp_path))
+    data = loads(open(manifest, "rb").read())
+
+    # Written by our parent process: its pid is alive, so only the pid's start time or boot can tell
+    live = dict(data, pid=os.getppid(), pid_started=gta.recovery._process_start(os.getppid()))
+    write_json_atomic(manifest, live)
+    assert unfinished_sessions(str(tmp_path)) == []
+    if data["pid_started"] is not None:
+        write_json_atomic(manifest, dict(live, pid_started=live["pid_started"] + 1))
+        assert unfinished_sessions(str(tmp_path)) == [manifest]
+    if data["boot_id"] is not None:
+        write_json_atomic(manifest, dict(live, boot_id="another-boot"))
+        assert unfinished_sessions(str(tmp_path)) == [manifest]
@@ -0,0 +1,129 @@
+import os
+from collections import Counter
+
+import pytest
+
+from gta.archive import ArchiveJob
+from gta.generate import generate_project
+from gta.projects import ProjectStore
+from gta.retag import RetagJob, RetagState
+from gta.route_catalog import RouteCatalog
+from gta.route_segments import segment_path
+from gta.taxonomy import TaxonomyMigration, record_migration
+from gta.timeline import iter_route_records
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = str(tmp_path / "app_data")
+    generate_project(data_dir, "P", routes=3, points=2000, classes=2, tag_density=0.05, seed=3)
+    return data_dir
+
+
+def _paths(data_dir):
+    return os.path.join(data_dir, "routes"), os.path.join(data_dir, "routes.db"), os.path.join(data_dir, "retag.json")
+
+
+def _catalog_factory(data_dir):
+    route_dir, db_path, _ = _paths(data_dir)
+
+    def catalog():
+        db = RouteCatalog(db_path, route_dir)
+        db.revalidate()
+        return db
+
+    return catalog
+
+
+def _swap_first_attributes(data_dir):
+    """Records a migration swapping the first two attributes of the first class; returns the project."""
+    store = ProjectStore(os.path.join(data_dir, "projects"))
+    store.load_all()
+    (project,) = store.projects.values()
+    entry = project["taxonomy"][0]
+    first, second = entry["attributes"][:2]
+    record_migration(project, TaxonomyMigration(attributes={entry["className"]: {first: second, second: first}}),
+                     project["taxonomy"])
+    return project
+
+
+def _values(data_dir, project):
+    cls = project["taxonomy"][0]["className"]
+    route_dir = _paths(data_dir)[0]
+    counts = Counter()
+    for name in os.listdir(route_dir):
+        if name.endswith((".jsonl", ".rbin")) and not name.endswith(".events.jsonl"):
+            counts.update(rec["meta_data"][cls] for rec in iter_route_records(os.path.join(route_dir, name))
+                          if cls in (rec.get("meta_data") or {}))
+    return counts
+
+
+def _retag(data_dir, project):
+    route_dir, _, state_path = _paths(data_dir)
+    job = RetagJob(project, _catalog_factory(data_dir), route_dir, state_path=state_path, workers=1)
+    return job, list(job.run())
+
+
+def test_archived_routes_are_not_migrated_twice(data_dir):
+    project = _swap_first_attributes(data_dir)
+    first, second = project["taxonomy"][0]["attributes"][:2]
+    before = _values(data_dir, project)
+    assert before[first] != before[second]
+
+    _, results = _retag(data_dir, project)
+    assert results and not any(r.error for r in results)
+    migrated = _values(data_dir, project)
+    assert (migrated[first], migrated[second]) == (before[second], before[first])
+
+    archived = list(ArchiveJob("P", _catalog_factory(data_dir), 0.0, taxonomy=project["taxonomy"],
+                               state_path=os.path.join(data_dir, "archive.json"),
+                               retag_state_path=_paths(data_dir)[2]).run())
+    assert len(archived) == 3 and all(r.archive for r in archived)
+
+    job, results = _retag(data_dir, project)
+    assert results == [] and job.pending() == []
+    assert _values(data_dir, project) == migrated
+
+
+def test_session_with_files_at_different_versions_is_not_archived(data_dir):
+    project = _swap_first_attributes(data_dir)
+    route_dir, _, state_path = _paths(data_dir)
+    state = RetagState(state_path)
+    route = sorted(name for name in os.listdir(route_dir) if name.endswith(".jsonl")
+                   and not name.endswith(".events.jsonl"))[0]
+    segment = segment_path(route, 1)
+    state.set(segment, {"version": 2, "state": "done", "changed": 0, "dropped": 0})
+    with open(os.path.join(route_dir, segment), "wb"):
+        pass  # a second segment, already rewritten
+
+    results = list(ArchiveJob("P", _catalog_factory(data_dir), 0.0, taxonomy=project["taxonomy"],
+                              state_path=os.path.join(data_dir, "archive.json"), retag_state_path=state_path).run())
+
+    failed = [r for r in results if r.error]
+    assert [r.session for r in failed] == [route[:-len(".jsonl")]]
+    assert os.path.exists(os.path.join(route_dir, route))
+
+
+def test_interrupted_retag_resumes_without_migrating_twice(data_dir, monkeypatch):
+    project = _swap_first_attributes(data_dir)
+    first, second = project["taxonomy"][0]["attributes"][:2]
+    before = _values(data_dir, project)
+    replace = RetagJob._replace
+
+    def killed(self, name, entry, *args):
+        if not name.endswith(".events.jsonl"):
+            raise KeyboardInterrupt  # journaled as replacing, copy not yet renamed over the file
+        return replace(self, name, entry, *args)
+
+    monkeypatch.setattr(RetagJob, "_replace", killed)
+    with pytest.raises(KeyboardInterrupt):
+        _retag(data_dir, project)
+    monkeypatch.setattr(RetagJob, "_replace", replace)
+    assert "replacing" in {entry.get("state") for entry in RetagState(_paths(data_dir)[2]).files.values()}
+
+    _, results = _retag(data_dir, project)
+
+    assert not any(r.error for r in results)
+    after = _values(data_dir, project)
+    assert (after[first], after[second]) == (before[second], before[first])
+    assert not [name for name in os.listdir(_paths(data_dir)[0]) if name.endswith(".tmp")]
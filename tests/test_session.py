@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from gta.location import Fix
+from gta.session import RouteSession
+from gta.timeline import Timeline, iter_route_records
+
+
+@pytest.fixture(params=["jsonl", "binary"])
+def session(tmp_path, request):
+    nmea = tmp_path / "empty.nmea"
+    nmea.write_bytes(b"")  # fixes are fed to on_fix by the tests instead
+    session = RouteSession({"projectName": "P", "gpsFrequency": 5, "routeFormat": request.param,
+                            "taxonomy": [{"className": "W", "attributes": ["a", "b"]}],
+                            "locationSource": {"type": "nmea", "path": str(nmea), "loop": False}},
+                           route_dir=str(tmp_path / "routes"))
+    session.start()
+    yield session
+    session.stop()
+
+
+def _records(session):
+    return list(iter_route_records(session.route_file))
+
+
+def test_tick_writes_no_record_of_its_own(session):
+    session.on_fix(Fix(1000.0, 50.0, 8.0))
+    for _ in range(3):
+        assert session.tick().tick_timestamp == 1000.0
+    assert session.stop() is None
+
+    records = _records(session)
+    assert [(rec["tick_timestamp"], "meta_submitted_at" in rec) for rec in records] == [(1000.0, False)]
+
+
+def test_tag_submitted_between_fixes_is_written_before_the_later_fix(session):
+    session.on_fix(Fix(1000.0, 50.0, 8.0))
+    session.submit_meta({"W": "a"}, submitted_at=1000.4)
+    session.on_fix(Fix(1001.0, 50.001, 8.0))
+    session.on_fix(Fix(1002.0, 50.002, 8.0))
+    session.submit_meta({"W": "b"}, submitted_at=1002.1)
+    session.tick()  # not overdue yet
+    session.aligner.max_wait = 0.0
+    session.tick()  # overdue: goes on the latest fix
+    assert session.stop() is None
+
+    times = [rec["tick_timestamp"] for rec in _records(session)]
+    assert times == sorted(times) == [1000.0, 1000.0, 1001.0, 1002.0, 1002.0]
+    window = list(Timeline([session.route_file], start_ts=1000.0, end_ts=1000.5))
+    assert [rec["meta_data"] for rec in window] == [{}, {"W": "a"}]
+    assert [rec["tick_timestamp"] for rec in Timeline([session.route_file], start_ts=1001.5)] == [1002.0, 1002.0]
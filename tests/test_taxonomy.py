@@ -0,0 +1,31 @@
+from gta.taxonomy import migration_from_edits
+
+
+def _attribute_changes(old_attrs, new_attrs):
+    migration = migration_from_edits([{"className": "W", "attributes": old_attrs}],
+                                     [{"className": "W", "attributes": new_attrs}], [0])
+    return migration.attributes.get("W", {})
+
+
+def test_reordered_attributes_are_unchanged():
+    assert _attribute_changes(["a", "b", "c"], ["c", "a", "b"]) == {}
+
+
+def test_replaced_attribute_is_renamed():
+    assert _attribute_changes(["a", "b", "c"], ["a", "x", "c"]) == {"b": "x"}
+    assert _attribute_changes(["a", "b", "c"], ["c", "x", "a"]) == {"b": "x"}
+
+
+def test_removed_attribute_is_dropped_not_renamed_to_a_neighbour():
+    assert _attribute_changes(["a", "b", "c"], ["a", "c", "d"]) == {"b": None}
+    assert _attribute_changes(["a", "b", "c"], ["a", "c"]) == {"b": None}
+
+
+def test_attribute_renamed_to_an_existing_one_is_merged():
+    assert _attribute_changes(["a", "b", "c"], ["a", "a", "c"]) == {"b": "a"}
+
+
+def test_classes_follow_their_origins():
+    old = [{"className": "W", "attributes": ["a"]}, {"className": "R", "attributes": ["x"]}]
+    migration = migration_from_edits(old, [{"className": "Road", "attributes": ["x"]}], [1])
+    assert migration.classes == {"W": None, "R": "Road"}